@@ -12,6 +12,7 @@
      - 添加 TEMPLATE_{var_name} 定义
        变量名：★ → S，空格 → _（★ 不是合法 Python 标识符）
        例：TEMPLATE_霸瞳_S1
+  4. 重新打包模板图集（见 build_character_atlas.py）
 
 Usage:
     python dev_tools/build_character_assets.py
@@ -162,6 +163,10 @@ def main():
         f.writelines(lines)
     print(f"已重写 {ASSETS_PY}（{copied} 个自动 TEMPLATE + {len(manual_entries)} 个手动 TEMPLATE + UNIT_NAMES）")
 
+    # ── 4. 重新打包图集 ──────────────────────────────────────────────────────
+    import build_character_atlas
+    build_character_atlas.main()
+
 
 if __name__ == "__main__":
     main()
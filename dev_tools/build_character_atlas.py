@@ -0,0 +1,85 @@
+"""
+把 module/character/assets.py 中的所有 TEMPLATE_*.png 打包成一个图集文件。
+
+操作步骤：
+  1. 读取 assets/character/TEMPLATE_*.png，去掉 alpha 通道
+  2. 通过 unit_names.json 反查 uid（与 build_character_assets.py 相同的命名规则），
+     再从 static/pcr_db.json 取角色名、星级、昵称
+  3. 计算每个模板的感知哈希（见 module/character/icon_index.py）
+  4. 写入 ./cache/character.atlas，运行时由 module/base/template_atlas.py 映射读取
+
+模板 PNG 修改后需要重新运行，否则过期的模板会回退到读取 PNG。
+
+Usage:
+    python dev_tools/build_character_atlas.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "."))
+
+from module.base.template_atlas import template_atlas
+from module.base.utils import load_image
+from module.character.icon_index import image_hash
+
+CHAR_DIR   = "./assets/character"
+NAMES_FILE = "./assets/icons/unit_names.json"
+DB_FILE    = "./static/pcr_db.json"
+
+
+def name_to_filename(display_name: str) -> str:
+    """与 build_character_assets.py 相同：空格换成_，★ 改为S"""
+    return display_name.replace(" ", "_").replace("★", "S")
+
+
+def load_metadata():
+    """
+    Returns:
+        dict[str, dict]: 模板文件路径 -> {uid, stars, name, nicknames}
+    """
+    with open(NAMES_FILE, encoding="utf-8") as f:
+        names: dict[str, str] = json.load(f)
+    with open(DB_FILE, encoding="utf-8") as f:
+        db: dict[str, dict] = json.load(f)
+
+    metadata = {}
+    for uid, display in names.items():
+        file = f"{CHAR_DIR}/TEMPLATE_{name_to_filename(display)}.png"
+        # uid 100131 → pcr_db id "1001_3"
+        stars = int(uid[4])
+        info = {"uid": uid, "stars": stars, "name": display}
+        row = db.get(f"{uid[:4]}_{stars}")
+        if row is not None:
+            info["name"] = row["name"]
+            info["nicknames"] = row.get("nicknames", [])
+        metadata[file] = info
+    return metadata
+
+
+def main():
+    metadata = load_metadata()
+    images = {}
+    for fn in sorted(os.listdir(CHAR_DIR)):
+        if not (fn.startswith("TEMPLATE_") and fn.endswith(".png")):
+            continue
+        file = f"{CHAR_DIR}/{fn}"
+        image = load_image(file)
+        if image is None:
+            continue
+        images[file] = image
+        # 感知哈希索引使用的哈希，运行时不用再计算
+        info = metadata.setdefault(file, {})
+        info["dhash_rgb"] = list(image_hash(image, method="dhash", per_channel=True))
+        info["dhash"] = list(image_hash(image, method="dhash", per_channel=False))
+
+    unknown = [file for file in images if "uid" not in metadata[file]]
+    size = template_atlas.build(images, metadata=metadata)
+    print(f"已打包模板: {len(images)} 个，数据 {size / 1024 / 1024:.2f} MB → {template_atlas.file}")
+    if unknown:
+        print(f"无 uid 信息的模板（手动维护）: {len(unknown)} 个")
+
+
+if __name__ == "__main__":
+    main()
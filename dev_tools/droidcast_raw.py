@@ -38,13 +38,17 @@ try:
     # 截图
     print(" 执行DroidCast_raw截图...")
     start_time = time.time()
-    image = device.screenshot_droidcast_raw()
+    arr = device.droidcast_raw_capture()
+    capture_time = time.time()
+    # RGB565 -> RGB888，与 DroidCast 截图共用同一个转换器
+    image = device.rgb565_converter.convert(arr)
     # 计算耗时，单位为秒
     elapsed = time.time() - start_time
+    convert_elapsed = time.time() - capture_time
 
     print(f" 截图成功!")
     # 将耗时格式化为保留三位小数的秒
-    print(f"  - 耗时: {elapsed:.3f}s")
+    print(f"  - 耗时: {elapsed:.3f}s (颜色转换 {convert_elapsed:.3f}s)")
     print(f"  - 图像尺寸: {image.shape[1]}x{image.shape[0]}")
     print(f"  - 颜色格式: RGB" if image.shape[2] == 3 else "  - 颜色格式: 未知")
     print(f"  - 数据类型: {image.dtype}")
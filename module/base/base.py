@@ -1,4 +1,7 @@
-from module.base.button import Button
+import numpy as np
+
+from module.base.button import Button, ButtonSet
+from module.base.match_executor import match_executor
 from module.base.timer import Timer
 from module.base.utils import crop
 from module.logger import logger
@@ -23,6 +26,8 @@ class ModuleBase:
         self.config = config
         self.device = device
         self.interval_timer = {}
+        # appear() 结果缓存，key: (按钮, 检测参数), value: (区域版本号, 结果, 按钮偏移)
+        self.appear_cache = {}
 
     def appear(self, button, offset=0, interval=0, similarity=0.85, threshold=10):
         """
@@ -66,17 +71,178 @@ class ModuleBase:
         if offset:
             if isinstance(offset, bool):
                 offset = self.config.BUTTON_OFFSET # 在 config/config.py 中定义的偏移量
-            # 模版匹配
-            appear = button.match(self.device.image, offset=offset, similarity=similarity)
+            appear = self._appear_match(button, offset, similarity)
         else:
-            # 纯颜色匹配
-            appear = button.appear_on(self.device.image, threshold=threshold)
+            key = (self._appear_key(button), "color", threshold)
+            version = self._appear_version(button)
+            cached = self._appear_cached(key, version)
+            if cached is not None:
+                appear = cached[1]
+            else:
+                # 纯颜色匹配
+                appear = button.appear_on(self.device.image, threshold=threshold)
+                if version is not None:
+                    self._appear_cache_set(key, (version, appear, None))
 
         if appear and interval:
             self.interval_timer[button.name].reset()
 
         return appear
 
+    @staticmethod
+    def _appear_key(button):
+        """
+        Button 的 == 和 hash 只比较名称，缓存需要区分同名但区域、颜色或模板不同的按钮
+        """
+        return button.name, tuple(np.ravel(button.area)), tuple(np.ravel(button.color)), button.file
+
+    def _appear_cached(self, key, version):
+        """
+        Returns:
+            tuple | None: 区域版本没有变化时返回缓存的 (区域版本号, 结果, 按钮偏移)
+        """
+        cached = self.appear_cache.get(key)
+        if version is not None and cached is not None and cached[0] == version:
+            return cached
+        return None
+
+    def _appear_cache_set(self, key, value):
+        # 动态生成的按钮（ButtonGrid、crop 等）会不断产生新的键，超出上限时整体清空
+        if len(self.appear_cache) >= 1024:
+            self.appear_cache.clear()
+        self.appear_cache[key] = value
+
+    def _appear_version(self, button, offset=0):
+        """
+        按钮检测区域在当前截图中的版本号，用作 appear() 结果缓存的校验
+
+        Args:
+            button (Button, Template):
+            offset (int, tuple): 模板匹配的偏移，0 表示颜色匹配
+
+        Returns:
+            int | None: 无法缓存时返回 None
+        """
+        if not isinstance(button, Button):
+            # Template 在整张截图上匹配，不缓存
+            return None
+        area = button.search_area(offset) if offset else button.area
+        return self.device.region_version(area)
+
+    def _appear_match(self, button, offset, similarity, result=None):
+        """
+        appear() 的模板匹配部分
+
+        Args:
+            button (Button, Template):
+            offset (int, tuple): 检测区域偏移量，已经把 True 换成了 BUTTON_OFFSET
+            similarity (int, float): 模板匹配相似度
+            result (tuple): 线程池中 Button.match_shift() 的结果，None 时在这里匹配
+
+        Returns:
+            bool: 按钮是否出现
+        """
+        key = (self._appear_key(button), "match", offset, similarity)
+        version = self._appear_version(button, offset)
+        cached = self._appear_cached(key, version)
+        if cached is not None:
+            # 搜索区域自上次匹配后没有变化
+            button._button_offset = cached[2]
+            return cached[1]
+        if result is None:
+            # 模版匹配
+            appear = button.match(self.device.image, offset=offset, similarity=similarity)
+        else:
+            appear = button.match_apply(*result, similarity=similarity)
+        if version is not None:
+            self._appear_cache_set(key, (version, appear, button._button_offset))
+        return appear
+
+    def appear_batch(self, buttons, threshold=10):
+        """
+        批量颜色匹配，与对每个按钮调用 appear(button, offset=0) 相同，但不支持 interval
+
+        Args:
+            buttons (ButtonSet, list[Button]): 按钮，经常使用的一组按钮应预先创建 ButtonSet
+            threshold (int, float): 颜色匹配阈值
+
+        Returns:
+            np.ndarray: 每个按钮是否出现，bool
+        """
+        if not isinstance(buttons, ButtonSet):
+            buttons = ButtonSet(buttons)
+        for button in buttons:
+            self.device.stuck_record_add(button)
+        return buttons.appear_on(self.device.image, threshold=threshold)
+
+    def appear_any(self, buttons, threshold=10):
+        """
+        Args:
+            buttons (ButtonSet, list[Button]):
+            threshold (int, float): 颜色匹配阈值
+
+        Returns:
+            bool: 是否有任意一个按钮出现
+        """
+        return bool(self.appear_batch(buttons, threshold=threshold).any())
+
+    def appear_all(self, buttons, threshold=10):
+        """
+        Args:
+            buttons (ButtonSet, list[Button]):
+            threshold (int, float): 颜色匹配阈值
+
+        Returns:
+            bool: 是否所有按钮都出现
+        """
+        return bool(self.appear_batch(buttons, threshold=threshold).all())
+
+    def appear_first(self, buttons, offset=0, similarity=0.85, threshold=10):
+        """
+        按顺序返回第一个出现的按钮，与依次调用 appear() 相同，但不支持 interval。
+        Button 的模板匹配交给 match_executor 并行执行，线程池中只有不修改状态的 Button.match_shift()，
+        卡死记录、结果缓存、按钮偏移和位置跟踪都在当前线程按顺序更新，到第一个出现的按钮为止。
+
+        Args:
+            buttons (list[Button, Template]):
+            offset (bool, int, tuple): 检测区域偏移量，见 appear()
+            similarity (int, float): 模板匹配相似度
+            threshold (int, float): 颜色匹配阈值
+
+        Returns:
+            int | None: 第一个出现的按钮的序号，都没有出现时返回 None
+        """
+        if isinstance(offset, bool) and offset:
+            offset = self.config.BUTTON_OFFSET
+        results = {}
+        if offset and match_executor.parallel and len(buttons) > 1:
+            # LazyImage 按分块转换不是线程安全的，先在当前线程整帧转换
+            image = np.asarray(self.device.image)
+            pending = []
+            for index, button in enumerate(buttons):
+                # Template 和缓存命中的按钮留给下面的 appear()
+                if not isinstance(button, Button):
+                    continue
+                key = (self._appear_key(button), "match", offset, similarity)
+                if self._appear_cached(key, self._appear_version(button, offset)) is None:
+                    button.ensure_template()
+                    pending.append(index)
+            shifts = match_executor.map(
+                lambda index: buttons[index].match_shift(image, offset=offset, similarity=similarity),
+                pending,
+            )
+            results = dict(zip(pending, shifts))
+
+        for index, button in enumerate(buttons):
+            if index in results:
+                self.device.stuck_record_add(button)
+                appear = self._appear_match(button, offset, similarity, result=results[index])
+            else:
+                appear = self.appear(button, offset=offset, similarity=similarity, threshold=threshold)
+            if appear:
+                return index
+        return None
+
     def appear_then_click(
         self,
         button,
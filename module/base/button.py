@@ -3,12 +3,16 @@ Button类
 """
 
 import os
+import threading
 import cv2
 import numpy as np
 import traceback
 import imageio
 from PIL import Image, ImageDraw
 
+from module.base.match_executor import match_executor
+from module.base.pyramid import match_template
+from module.base.template_cache import area_variant, template_cache
 from module.base.utils import *
 from module.logger import logger
 
@@ -53,6 +57,8 @@ class Button:
         self.image = None
         self.image_binary = None
         self.image_luma = None
+        # 上次 match() 成功时模板相对 area 左上角的位移，用于下次优先在附近搜索
+        self._track_shift = None
 
         # 解析属性
         self.area = self._parse_property(self.raw_area)
@@ -158,13 +164,14 @@ class Button:
         """
         if not self._match_init:
             if self.is_gif:
-                self.image = []
-                for image in imageio.mimread(self.file):
-                    image = image[:, :, :3].copy() if len(image.shape) == 3 else image
-                    image = crop(image, self.area)
-                    self.image.append(image)
+                # 所有帧堆叠成一个数组缓存
+                self.image = list(template_cache.get(
+                    self.file, area_variant(self.area, "gif"), self._build_gif_template
+                ))
             else:
-                self.image = load_image(self.file, self.area)
+                self.image = template_cache.get(
+                    self.file, area_variant(self.area, "image"), lambda: load_image(self.file, self.area)
+                )
                 logger.debug(
                     f"Loaded template for button '{self.name}' from '{self.file}'"
                 )
@@ -176,35 +183,78 @@ class Button:
         """
         if not self._match_binary_init:
             if self.is_gif:
-                self.image_binary = []
-                for image in self.image:
-                    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                    _, image_binary = cv2.threshold(
-                        image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
-                    )
-                    self.image_binary.append(image_binary)
+                self.image_binary = list(template_cache.get(
+                    self.file, area_variant(self.area, "gif_binary_bgr"),
+                    lambda: np.stack([self._build_binary_template(image) for image in self.image])
+                ))
             else:
-                image_gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-                _, self.image_binary = cv2.threshold(
-                    image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+                self.image_binary = template_cache.get(
+                    self.file, area_variant(self.area, "binary_bgr"), lambda: self._build_binary_template(self.image)
                 )
             self._match_binary_init = True
 
+    def _build_gif_template(self):
+        images = []
+        for image in imageio.mimread(self.file):
+            image = image[:, :, :3].copy() if len(image.shape) == 3 else image
+            images.append(crop(image, self.area))
+        return np.stack(images)
+
+    @staticmethod
+    def _build_binary_template(image):
+        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, image_binary = cv2.threshold(
+            image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+        )
+        return image_binary
+
     def ensure_luma_template(self):
         """
         加载亮度模板
         """
         if not self._match_luma_init:
             if self.is_gif:
-                self.image_luma = []
-                for image in self.image:
-                    luma = rgb2luma(image)
-                    self.image_luma.append(luma)
+                self.image_luma = list(template_cache.get(
+                    self.file, area_variant(self.area, "gif_luma"),
+                    lambda: np.stack([rgb2luma(image) for image in self.image])
+                ))
             else:
-                self.image_luma = rgb2luma(self.image)
+                self.image_luma = template_cache.get(
+                    self.file, area_variant(self.area, "luma"), lambda: rgb2luma(self.image)
+                )
             self._match_luma_init = True
 
-    def match(self, image, offset=30, similarity=0.85):
+    @staticmethod
+    def _parse_offset(offset):
+        """
+        Args:
+            offset (int, tuple): 检测区域偏移
+                - 整数: 上下偏移 offset，左右偏移 3
+                - (x, y): 上下左右对称偏移
+                - (x1, y1, x2, y2): 直接作为偏移
+
+        Returns:
+            np.ndarray: (x1, y1, x2, y2)，与 area 相加得到搜索区域
+        """
+        if isinstance(offset, tuple):
+            if len(offset) == 2:
+                return np.array((-offset[0], -offset[1], offset[0], offset[1]))
+            return np.array(offset)
+        return np.array((-3, -offset, 3, offset))
+
+    def search_area(self, offset=30):
+        """
+        match() 等模板匹配方法的搜索区域
+
+        Args:
+            offset (int, tuple): 检测区域偏移
+
+        Returns:
+            tuple: (x1, y1, x2, y2)
+        """
+        return tuple(int(v) for v in self._parse_offset(offset) + self.area)
+
+    def match(self, image, offset=30, similarity=0.85, pyramid=0, track=True):
         """
         通过彩色模板匹配检测按钮。用于位置可能不固定的按钮。
 
@@ -212,54 +262,126 @@ class Button:
             image: 截图
             offset (int, tuple): 检测区域偏移
             similarity (float): 相似度阈值，0-1之间，默认0.85
+            pyramid (int): 金字塔层数，偏移较大时先在缩小的图像上找候选，0 表示不使用
+            track (bool): 先在上次匹配位置附近搜索，没有匹配时再搜索整个偏移范围，
+                是否匹配的结果与不使用时相同
 
         Returns:
             bool: 是否匹配成功
         """
         self.ensure_template()
 
-        # 处理offset参数
-        if isinstance(offset, tuple):
-            if len(offset) == 2:
-                offset = np.array((-offset[0], -offset[1], offset[0], offset[1]))
-            else:
-                offset = np.array(offset)
-        else:
-            offset = np.array((-3, -offset, 3, offset))
+        if track and not self.is_gif:
+            parsed = self._parse_offset(offset)
+            shift = self._match_tracked(crop(image, parsed + self.area, copy=False), parsed, similarity)
+            if shift is not None:
+                self._button_offset = area_offset(self._button, shift)
+                return True
 
-        # 裁剪搜索区域
+        sim, shift = self.match_shift(image, offset=offset, similarity=similarity, pyramid=pyramid)
+        return self.match_apply(sim, shift, similarity=similarity, track=track)
+
+    def match_shift(self, image, offset=30, similarity=0.85, pyramid=0):
+        """
+        match() 的匹配部分，不使用位置跟踪，也不修改按钮的任何状态，可以在线程池中执行。
+        模板需要事先在调用线程中用 ensure_template() 加载。
+
+        Args:
+            image: 截图
+            offset (int, tuple): 检测区域偏移
+            similarity (float): 相似度阈值
+            pyramid (int): 金字塔层数
+
+        Returns:
+            tuple[float, np.ndarray | None]: (相似度, 模板相对 area 左上角的位移)，
+                GIF 没有匹配的帧时位移为 None
+        """
+        offset = self._parse_offset(offset)
         image = crop(image, offset + self.area, copy=False)
 
         # GIF 支持
         if self.is_gif:
-            for template in self.image:
-                res = cv2.matchTemplate(template, image, cv2.TM_CCOEFF_NORMED)
-                _, sim, _, point = cv2.minMaxLoc(res)
-                self._button_offset = area_offset(
-                    self._button, offset[:2] + np.array(point)
-                )
-                # logger.debug(
-                #     f"[match/gif] {self.name} | "
-                #     f"相似度={sim:.4f} 阈值={similarity} | "
-                #     f"结果={'匹配' if sim > similarity else '不匹配'}"
-                # )
-                if sim > similarity:
-                    return True
-            return False
+            # 各帧互不相关，交给线程池，按顺序取第一个匹配的帧
+            index, found = match_executor.first(
+                lambda template: match_template(image, template, level=pyramid, similarity=similarity, reject=True),
+                self.image,
+                key=lambda result: result[0] > similarity,
+            )
+            if index is None:
+                return 0.0, None
+            # logger.debug(
+            #     f"[match/gif] {self.name} | "
+            #     f"相似度={found[0]:.4f} 阈值={similarity} | 帧={index}"
+            # )
+            return found[0], offset[:2] + np.array(found[1])
         else:
             # 单张图片模板匹配
-            res = cv2.matchTemplate(self.image, image, cv2.TM_CCOEFF_NORMED)
-            _, sim, _, point = cv2.minMaxLoc(res)
-            self._button_offset = area_offset(
-                self._button, offset[:2] + np.array(point)
-            )
-            result = sim > similarity
+            sim, point = match_template(image, self.image, level=pyramid, similarity=similarity, reject=True)
             # logger.debug(
             #     f"[match] {self.name} | "
             #     f"相似度={sim:.4f} 阈值={similarity} | "
-            #     f"结果={'匹配' if result else '不匹配'}"
+            #     f"结果={'匹配' if sim > similarity else '不匹配'}"
             # )
-            return result
+            return sim, offset[:2] + np.array(point)
+
+    def match_apply(self, sim, shift, similarity=0.85, track=True):
+        """
+        把 match_shift() 的结果写入按钮偏移和位置跟踪，与 match() 的结果相同
+
+        Args:
+            sim (float): 相似度
+            shift (np.ndarray | None): 模板相对 area 左上角的位移
+            similarity (float): 相似度阈值
+            track (bool): 是否记录位置供下次 match() 先在附近搜索
+
+        Returns:
+            bool: 是否匹配成功
+        """
+        if shift is None:
+            return False
+        self._button_offset = area_offset(self._button, shift)
+        result = sim > similarity
+        if track and not self.is_gif:
+            self._track_shift = shift if result else None
+        return result
+
+    def _match_tracked(self, image, offset, similarity):
+        """
+        在上次匹配位置附近的小窗口内匹配
+
+        Args:
+            image (np.ndarray): match() 裁剪后的搜索区域
+            offset (np.ndarray): 解析后的偏移 (x1, y1, x2, y2)
+            similarity (float): 相似度阈值
+
+        Returns:
+            np.ndarray | None: 匹配成功时返回模板相对 area 左上角的位移
+        """
+        h, w = self.image.shape[:2]
+        full = image.shape[0] * image.shape[1]
+        if self._track_shift is None:
+            match_tracker.record(None, full, full)
+            return None
+        # 搜索区域内的坐标
+        x, y = self._track_shift - offset[:2]
+        m = match_tracker.margin
+        x1, y1 = max(x - m, 0), max(y - m, 0)
+        x2, y2 = min(x + w + m, image.shape[1]), min(y + h + m, image.shape[0])
+        if x2 - x1 < w or y2 - y1 < h:
+            # 上次的位置不在这次的偏移范围内
+            match_tracker.record(None, full, full)
+            return None
+
+        window = (x2 - x1) * (y2 - y1)
+        res = cv2.matchTemplate(image[y1:y2, x1:x2], self.image, cv2.TM_CCOEFF_NORMED)
+        _, sim, _, point = cv2.minMaxLoc(res)
+        if sim > similarity:
+            match_tracker.record(True, window, full)
+            self._track_shift = offset[:2] + np.array((x1 + point[0], y1 + point[1]))
+            return self._track_shift
+        # 未命中，还要再搜索整个区域
+        match_tracker.record(False, window + full, full)
+        return None
 
     def match_binary(self, image, offset=30, similarity=0.85):
         """
@@ -278,35 +400,31 @@ class Button:
         self.ensure_binary_template()
 
         # 处理offset参数
-        if isinstance(offset, tuple):
-            if len(offset) == 2:
-                offset = np.array((-offset[0], -offset[1], offset[0], offset[1]))
-            else:
-                offset = np.array(offset)
-        else:
-            offset = np.array((-3, -offset, 3, offset))
+        offset = self._parse_offset(offset)
 
         # 裁剪搜索区域
         image = crop(image, offset + self.area, copy=False)
 
         # GIF 支持
         if self.is_gif:
-            for template in self.image_binary:
-                # graying
-                image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                # binarization
-                _, image_binary = cv2.threshold(
-                    image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
-                )
-                # template matching
-                res = cv2.matchTemplate(template, image_binary, cv2.TM_CCOEFF_NORMED)
-                _, sim, _, point = cv2.minMaxLoc(res)
-                self._button_offset = area_offset(
-                    self._button, offset[:2] + np.array(point)
-                )
-                if sim > similarity:
-                    return True
-            return False
+            # graying
+            image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # binarization
+            _, image_binary = cv2.threshold(
+                image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+            )
+            # template matching
+            index, found = match_executor.first(
+                match_executor.match,
+                [(template, image_binary, cv2.TM_CCOEFF_NORMED, None) for template in self.image_binary],
+                key=lambda result: result[0] > similarity,
+            )
+            if index is None:
+                return False
+            self._button_offset = area_offset(
+                self._button, offset[:2] + np.array(found[1])
+            )
+            return True
         else:
             # graying
             image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -353,16 +471,18 @@ class Button:
 
         # GIF 支持
         if self.is_gif:
-            for template in self.image_luma:
-                image_luma = rgb2luma(image)
-                res = cv2.matchTemplate(image_luma, template, cv2.TM_CCOEFF_NORMED)
-                _, sim, _, point = cv2.minMaxLoc(res)
-                self._button_offset = area_offset(
-                    self._button, offset[:2] + np.array(point)
-                )
-                if sim > similarity:
-                    return True
-            return False
+            image_luma = rgb2luma(image)
+            index, found = match_executor.first(
+                match_executor.match,
+                [(image_luma, template, cv2.TM_CCOEFF_NORMED, None) for template in self.image_luma],
+                key=lambda result: result[0] > similarity,
+            )
+            if index is None:
+                return False
+            self._button_offset = area_offset(
+                self._button, offset[:2] + np.array(found[1])
+            )
+            return True
         else:
             # 转换为灰度图
             image_luma = rgb2luma(image)
@@ -466,6 +586,68 @@ class Button:
         return button
 
 
+class MatchTracker:
+    """
+    Button.match 位置跟踪的参数和统计
+
+    每个 Button 记录上次匹配成功的位置，下次先在该位置周围 margin 像素内匹配，
+    命中时不再搜索整个 area ± offset 的范围。
+    """
+
+    def __init__(self, margin=4):
+        """
+        Args:
+            margin (int): 在上次位置周围多少像素内搜索
+        """
+        self.margin = margin
+        # 线程池中并行执行的 match() 也会更新统计
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        # 小窗口命中、小窗口未命中后搜索整个区域、没有上次位置直接搜索整个区域
+        self.hit = 0
+        self.miss = 0
+        self.untracked = 0
+        # 实际搜索的像素数，和不跟踪时需要搜索的像素数
+        self.searched = 0
+        self.full = 0
+
+    def record(self, hit, searched, full):
+        """
+        Args:
+            hit (bool | None): 小窗口是否命中，None 表示没有使用小窗口
+            searched (int): 本次实际搜索的像素数
+            full (int): 不跟踪时需要搜索的像素数
+        """
+        with self.lock:
+            if hit is None:
+                self.untracked += 1
+            elif hit:
+                self.hit += 1
+            else:
+                self.miss += 1
+            self.searched += searched
+            self.full += full
+
+    @property
+    def saved(self):
+        """
+        Returns:
+            float: 节省的搜索面积比例，未命中时重复搜索可能使其为负
+        """
+        return 1 - self.searched / self.full if self.full else 0.0
+
+    def log_stats(self):
+        """输出命中率和节省的搜索面积"""
+        logger.attr("MatchTracker", f"hit={self.hit}, miss={self.miss}, untracked={self.untracked}, "
+                                    f"area_saved={self.saved:.1%}")
+
+
+match_tracker = MatchTracker()
+
+
 class ButtonGrid:
     """
     按钮网格类
@@ -598,3 +780,117 @@ class ButtonGrid:
         保存掩码图像到文件 {name}.png
         """
         self.gen_mask().save(f"{self._name}.png")
+
+
+class ButtonSet:
+    """
+    一组按钮的批量颜色检测
+
+    逐个调用 Button.appear_on 时每个按钮都要 crop + cv2.mean，按钮多时 Python 开销占大头。
+    ButtonSet 在每帧上对所有按钮区域的外接矩形计算一次积分图，之后任意按钮的平均颜色
+    只需要 4 次查表，所有按钮的比较一次向量化完成。
+
+    积分图的耗时与外接矩形面积成正比，按钮少且分散时逐个 cv2.mean 更快，
+    创建时按估算的耗时选择其中一种，结果完全相同。
+
+    Examples:
+        PAGE_BUTTONS = ButtonSet([MAIN_CHECK, TRAIN_CHECK, ...])
+        appear = PAGE_BUTTONS.appear_on(image)  # np.ndarray[bool]
+    """
+
+    # 估算耗时：积分图每个像素、逐个 cv2.mean 每个按钮（秒）
+    INTEGRAL_COST = 2e-9
+    MEAN_COST = 15e-6
+
+    def __init__(self, buttons, name="BUTTON_SET"):
+        """
+        Args:
+            buttons (list[Button]): 按钮，color 为空的按钮永远不出现
+            name (str): 名称
+        """
+        self.buttons = list(buttons)
+        self.name = name
+        areas = np.array([button.area for button in self.buttons], dtype=int).reshape(-1, 4)
+        self.areas = areas
+        self.expected = np.array(
+            [button.color if len(button.color) == 3 else (np.nan,) * 3 for button in self.buttons],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        if len(areas):
+            self.bounding = (areas[:, 0].min(), areas[:, 1].min(), areas[:, 2].max(), areas[:, 3].max())
+            pixels = (self.bounding[2] - self.bounding[0]) * (self.bounding[3] - self.bounding[1])
+        else:
+            self.bounding = (0, 0, 0, 0)
+            pixels = 0
+        self.use_integral = pixels * self.INTEGRAL_COST < len(areas) * self.MEAN_COST
+
+    def __len__(self):
+        return len(self.buttons)
+
+    def __iter__(self):
+        return iter(self.buttons)
+
+    def colors(self, image):
+        """
+        所有按钮区域的平均颜色，与逐个调用 get_color 相同
+
+        Args:
+            image: 截图
+
+        Returns:
+            np.ndarray: 形状 (按钮数, 3)
+        """
+        if not len(self.areas):
+            return np.zeros((0, 3))
+        if not self.use_integral:
+            return np.array([get_color(image, button.area) for button in self.buttons], dtype=np.float64)
+
+        # 按钮区域可能超出截图，与 crop() 一样超出部分按黑色计算
+        bx1, by1, bx2, by2 = self.bounding
+        region = crop(image, self.bounding, copy=False)
+        integral = cv2.integral(np.asarray(region))
+        x1, y1 = self.areas[:, 0] - bx1, self.areas[:, 1] - by1
+        x2, y2 = self.areas[:, 2] - bx1, self.areas[:, 3] - by1
+        # int32 积分图在 1280x720 内不会溢出
+        total = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        count = np.maximum((x2 - x1) * (y2 - y1), 1).reshape(-1, 1)
+        return total[:, :3] / count
+
+    def appear_on(self, image, threshold=10):
+        """
+        Args:
+            image: 截图
+            threshold (int): 颜色阈值，与 Button.appear_on 相同
+
+        Returns:
+            np.ndarray: 每个按钮是否出现，bool
+        """
+        diff = self.colors(image) - self.expected
+        # 与 color_similar 相同：最大正差值减去最小负差值，颜色为空的按钮是 nan，结果为 False
+        with np.errstate(invalid="ignore"):
+            positive = np.maximum(diff.max(axis=1), 0)
+            negative = np.minimum(diff.min(axis=1), 0)
+            return (positive - negative) <= threshold
+
+    def appear_any(self, image, threshold=10):
+        """
+        Returns:
+            bool: 是否有任意一个按钮出现
+        """
+        return bool(self.appear_on(image, threshold=threshold).any())
+
+    def appear_all(self, image, threshold=10):
+        """
+        Returns:
+            bool: 是否所有按钮都出现
+        """
+        return bool(self.appear_on(image, threshold=threshold).all())
+
+    def first_appear(self, image, threshold=10):
+        """
+        Returns:
+            Button | None: 第一个出现的按钮
+        """
+        appear = self.appear_on(image, threshold=threshold)
+        index = np.flatnonzero(appear)
+        return self.buttons[index[0]] if len(index) else None
@@ -6,6 +6,7 @@ import cv2
 import numpy as np
 
 from module.base.template import Template
+from module.base.template_cache import template_cache
 from module.base.utils import image_channel, load_image, rgb2luma
 
 
@@ -22,10 +23,7 @@ class Mask(Template):
     def image(self):
         """加载遮罩图像并转换为灰度图"""
         if self._image is None:
-            image = load_image(self.file)
-            if image_channel(image) == 3:
-                image = rgb2luma(image)
-            self._image = image
+            self._image = template_cache.get(self.file, "mask", self._build_mask)
 
         return self._image
 
@@ -33,6 +31,12 @@ class Mask(Template):
     def image(self, value):
         self._image = value
 
+    def _build_mask(self):
+        image = load_image(self.file)
+        if image_channel(image) == 3:
+            image = rgb2luma(image)
+        return image
+
     def set_channel(self, channel):
         """
         设置遮罩的通道数
@@ -61,6 +65,19 @@ class Mask(Template):
             else:
                 return False
 
+    def bounding_area(self):
+        """
+        遮罩中保留区域的外接矩形，区域外的像素在 apply() 后全部为 0，搜索时可以跳过
+
+        Returns:
+            tuple: (x1, y1, x2, y2)
+        """
+        image = self.image
+        if image_channel(image) == 3:
+            image = image[:, :, 0]
+        x, y, w, h = cv2.boundingRect(image)
+        return x, y, x + w, y + h
+
     def apply(self, image):
         """
         将遮罩应用到图像上
@@ -75,6 +92,8 @@ class Mask(Template):
         Returns:
             np.ndarray: 应用遮罩后的图像
         """
+        # device.image 可能是 LazyImage，OpenCV 需要完整图像
+        image = np.asarray(image)
         # 把遮罩调整成和 image 一样的通道数(OpenCV 要求图像通道相同才能进行位运算)
         self.set_channel(image_channel(image))
         '''
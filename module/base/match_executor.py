@@ -0,0 +1,212 @@
+"""
+进程共享的模板匹配线程池
+
+GIF 模板的每一帧、Selector 的每个目标、UI 的每个页面都是互不相关的 cv2.matchTemplate，
+OpenCV 计算时会释放 GIL，放进线程池可以同时使用多个核心。
+
+OpenCV 自己也会在一次调用内部开线程，两者叠加时线程数可能远超核心数。
+cv2.setNumThreads 对整个进程生效，也会让线程池之外的单次全屏匹配、resize、cvtColor 变成单线程，
+所以默认不修改，需要时通过 PriconneConfig.OPENCV_THREADS 限制。
+
+统计每个任务在队列中的等待时间和实际计算时间，用于判断线程池是否有收益。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from module.base.utils import crop
+from module.logger import logger
+
+# 最小值表示最佳匹配的方法
+_SQDIFF = (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED)
+
+
+class MatchExecutor:
+    """
+    模板匹配线程池，第一次提交多个任务时才创建线程
+    """
+
+    def __init__(self, workers=0, cv2_threads=-1):
+        """
+        Args:
+            workers (int): 线程数，0 表示 CPU 核心数，1 表示不使用线程池，在调用线程中依次执行
+            cv2_threads (int): OpenCV 内部线程数，-1 表示不修改
+        """
+        self.lock = threading.Lock()
+        self._pool = None
+        self._local = threading.local()
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.cv2_threads = -1
+        if cv2_threads >= 0:
+            cv2.setNumThreads(cv2_threads)
+            self.cv2_threads = cv2_threads
+        self.reset()
+
+    def configure(self, workers=0, cv2_threads=-1):
+        """
+        修改线程数，参数与当前相同时不做任何事
+
+        Args:
+            workers (int): 线程数，0 表示 CPU 核心数，1 表示不使用线程池
+            cv2_threads (int): OpenCV 内部线程数，-1 表示不修改
+        """
+        workers = workers if workers > 0 else (os.cpu_count() or 1)
+        if workers != self.workers:
+            with self.lock:
+                pool, self._pool = self._pool, None
+                self.workers = workers
+            if pool is not None:
+                pool.shutdown(wait=False)
+            logger.info(f"Match executor workers: {workers}")
+        if cv2_threads >= 0 and cv2_threads != self.cv2_threads:
+            cv2.setNumThreads(cv2_threads)
+            self.cv2_threads = cv2_threads
+            logger.info(f"OpenCV threads: {cv2.getNumThreads()}")
+
+    @property
+    def parallel(self):
+        """
+        Returns:
+            bool: 当前调用是否会使用线程池，线程池内部再次提交的任务在当前线程执行，避免互相等待
+        """
+        return self.workers > 1 and not getattr(self._local, "worker", False)
+
+    @property
+    def pool(self):
+        with self.lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="match")
+            return self._pool
+
+    def reset(self):
+        """清空统计"""
+        self.tasks = 0
+        self.batches = 0
+        # 提交到开始执行的时间之和、执行时间之和、调用方等待整批完成的时间之和
+        self.wait = 0.0
+        self.compute = 0.0
+        self.wall = 0.0
+
+    def _call(self, func, item, submit=None):
+        start = time.perf_counter()
+        # 在调用线程中直接执行时没有等待
+        submit = start if submit is None else submit
+        nested = getattr(self._local, "worker", False)
+        self._local.worker = True
+        try:
+            return func(item)
+        finally:
+            self._local.worker = nested
+            end = time.perf_counter()
+            with self.lock:
+                self.tasks += 1
+                self.wait += start - submit
+                self.compute += end - start
+
+    def _futures(self, func, items):
+        submit = time.perf_counter()
+        pool = self.pool
+        return [pool.submit(self._call, func, item, submit) for item in items]
+
+    def map(self, func, items):
+        """
+        Args:
+            func (callable): 对每个元素执行的函数，需要是线程安全的
+            items (list):
+
+        Returns:
+            list: 与 items 顺序相同的结果
+        """
+        items = list(items)
+        start = time.perf_counter()
+        if not self.parallel or len(items) <= 1:
+            result = [self._call(func, item) for item in items]
+        else:
+            result = [future.result() for future in self._futures(func, items)]
+        with self.lock:
+            self.batches += 1
+            self.wall += time.perf_counter() - start
+        return result
+
+    def first(self, func, items, key=bool):
+        """
+        按顺序返回第一个满足条件的结果，与依次执行并在满足条件时退出相同
+
+        Args:
+            func (callable): 对每个元素执行的函数，需要是线程安全的
+            items (list):
+            key (callable): 判断结果是否满足条件
+
+        Returns:
+            tuple[int, Any]: (序号, 结果)，都不满足时为 (None, None)
+        """
+        items = list(items)
+        start = time.perf_counter()
+        found = (None, None)
+        if not self.parallel or len(items) <= 1:
+            for index, item in enumerate(items):
+                value = self._call(func, item)
+                if key(value):
+                    found = (index, value)
+                    break
+        else:
+            futures = self._futures(func, items)
+            for index, future in enumerate(futures):
+                value = future.result()
+                if key(value):
+                    found = (index, value)
+                    break
+            # 后面还没开始的任务不再需要
+            for future in futures:
+                future.cancel()
+        with self.lock:
+            self.batches += 1
+            self.wall += time.perf_counter() - start
+        return found
+
+    def run(self, jobs):
+        """
+        执行一组 cv2.matchTemplate
+
+        Args:
+            jobs (list[tuple]): [(image, template, method, roi), ...]，
+                roi 为 (x1, y1, x2, y2) 时只在这个区域内搜索，None 表示整张图像
+
+        Returns:
+            list[tuple[float, tuple]]: [(最佳相似度, 截图中的 (x, y)), ...]，
+                TM_SQDIFF 类方法返回最小值
+        """
+        return self.map(self.match, jobs)
+
+    @staticmethod
+    def match(job):
+        """
+        执行一个 cv2.matchTemplate，参数与结果见 run()
+        """
+        image, template, method, roi = job
+        if roi is not None:
+            image = crop(image, roi, copy=False)
+        res = cv2.matchTemplate(image, template, method)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+        sim, point = (min_val, min_loc) if method in _SQDIFF else (max_val, max_loc)
+        if roi is not None:
+            point = (point[0] + int(roi[0]), point[1] + int(roi[1]))
+        return sim, point
+
+    def log_stats(self):
+        """输出等待时间与计算时间"""
+        if not self.tasks:
+            return
+        logger.attr(
+            "MatchExecutor",
+            f"workers={self.workers}, batches={self.batches}, tasks={self.tasks}, "
+            f"wait={self.wait * 1000 / self.tasks:.2f}ms/task, compute={self.compute * 1000 / self.tasks:.2f}ms/task, "
+            f"wall={self.wall * 1000:.0f}ms, compute/wall={self.compute / max(self.wall, 1e-9):.2f}x"
+        )
+
+
+match_executor = MatchExecutor()
@@ -0,0 +1,145 @@
+"""
+模板匹配的快速排除
+
+大部分调用只关心 "相似度是否超过阈值"。在做完整的 cv2.matchTemplate 之前，
+先用几乎不花时间的统计量算出 TM_CCOEFF_NORMED 的上界，上界不超过阈值时直接返回不匹配，
+结果与完整匹配的判断相同，不会漏掉匹配。
+
+两级检查：
+1. 整个搜索区域没有方差（纯色，例如黑屏、加载界面）：
+   cv2 对零方差的窗口返回 0，直接排除，开销只有一次 meanStdDev
+2. 每个窗口按通道的标准差：
+   第 c 个通道的协方差不超过 σT_c·σI_c，所以相似度不超过两个标准差向量的夹角余弦，
+   用积分图对所有窗口一次算出，开销约为完整匹配的三分之一。
+   游戏界面各通道的变化高度相关，这个上界很少低于 0.85，默认关闭
+
+模板本身没有方差时 cv2 对所有位置返回 1，不做排除。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from module.logger import logger
+
+
+class MatchReject:
+    """
+    快速排除的参数和统计
+    """
+
+    # 是否做第二级的逐窗口检查，排除率低于约 1/3 时它的开销超过节省的时间
+    # assets 中的按钮在非纯色区域上几乎不会被它排除
+    WINDOW_BOUND = False
+    # cv2.matchTemplate 使用 float32 计算，按窗口原始像素的模长留出误差
+    EPSILON = 1e-5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        self.checked = 0
+        # 搜索区域为纯色被排除、逐窗口上界被排除
+        self.flat = 0
+        self.bound = 0
+
+    @property
+    def rejected(self):
+        return self.flat + self.bound
+
+    @property
+    def reject_rate(self):
+        """
+        Returns:
+            float: 被排除的比例
+        """
+        return self.rejected / self.checked if self.checked else 0.0
+
+    def _record(self, flat=False, bound=False):
+        with self.lock:
+            self.checked += 1
+            self.flat += flat
+            self.bound += bound
+
+    @staticmethod
+    def template_var(template):
+        """
+        Returns:
+            np.ndarray: 模板每个通道去均值后的平方和
+        """
+        template = template.reshape(template.shape[0] * template.shape[1], -1).astype(np.float64)
+        return np.square(template - template.mean(axis=0)).sum(axis=0)
+
+    def window_bound(self, image, template, template_var):
+        """
+        每个窗口的 TM_CCOEFF_NORMED 上界
+
+        Args:
+            image (np.ndarray): 搜索图像
+            template (np.ndarray): 模板
+            template_var (np.ndarray): template_var(template)，不能全为 0
+
+        Returns:
+            np.ndarray: 与 cv2.matchTemplate 结果形状相同
+        """
+        h, w = template.shape[:2]
+        n = h * w
+        total, square = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        rows, cols = image.shape[0] - h + 1, image.shape[1] - w + 1
+        total = (total[h:, w:] - total[:-h, w:] - total[h:, :-w] + total[:-h, :-w]).reshape(rows, cols, -1)
+        square = (square[h:, w:] - square[:-h, w:] - square[h:, :-w] + square[:-h, :-w]).reshape(rows, cols, -1)
+        var = np.maximum(square - total * total / n, 0)
+
+        template_std = np.sqrt(template_var)
+        num = np.sqrt(var) @ template_std
+        # float32 计算的误差，近乎纯色的窗口误差相对很大，上界会超过 1，不会被排除
+        num += self.EPSILON * np.sqrt(square.sum(axis=2)) * np.linalg.norm(template_std)
+        den = np.sqrt(var.sum(axis=2) * template_var.sum())
+        bound = np.zeros((rows, cols))
+        # 零方差的窗口 cv2 返回 0
+        np.divide(num, den, out=bound, where=den > 0)
+        return np.minimum(bound, 1.0)
+
+    def check(self, image, template, similarity):
+        """
+        Args:
+            image (np.ndarray): 搜索图像
+            template (np.ndarray): 模板
+            similarity (float): 阈值，相似度需要大于它才算匹配
+
+        Returns:
+            tuple[float, tuple] | None: 可以排除时返回 (相似度上界, 上界最大的位置 (x, y))，
+                否则返回 None，需要完整匹配
+        """
+        if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+            return None
+        template_var = self.template_var(template)
+        if not template_var.any():
+            # 模板没有方差时 cv2 返回 1
+            self._record()
+            return None
+        _, std = cv2.meanStdDev(image)
+        if not std.any():
+            self._record(flat=True)
+            return 0.0, (0, 0)
+        if not self.WINDOW_BOUND:
+            self._record()
+            return None
+
+        _, upper, _, point = cv2.minMaxLoc(self.window_bound(image, template, template_var))
+        if upper <= similarity:
+            self._record(bound=True)
+            return upper, point
+        self._record()
+        return None
+
+    def log_stats(self):
+        """输出排除率"""
+        logger.attr("MatchReject", f"checked={self.checked}, flat={self.flat}, bound={self.bound}, "
+                                   f"reject_rate={self.reject_rate:.1%}")
+
+
+match_reject = MatchReject()
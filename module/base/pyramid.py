@@ -0,0 +1,174 @@
+"""
+金字塔模板匹配（由粗到细）
+
+先把截图和模板都缩小 2^level 倍做一次 TM_CCOEFF_NORMED，找出候选峰值，
+再回到原分辨率只在候选附近的小窗口内匹配，得到的相似度与全分辨率匹配完全相同。
+
+缩小后的相似度只用于挑选候选：
+- 细匹配超过阈值：结果可以确定
+- 粗匹配远低于阈值：认为不存在
+- 其他情况（粗匹配接近阈值但细匹配没有确认）视为有歧义，回退到全分辨率匹配
+"""
+
+import cv2
+import numpy as np
+
+from module.base.match_reject import match_reject
+
+# 缩小后模板的短边至少要有这么多像素，否则减少层数
+PYRAMID_MIN_SIZE = 8
+# 粗匹配相似度高于 similarity - PYRAMID_MARGIN 时认为可能存在
+PYRAMID_MARGIN = 0.15
+# 细匹配的候选峰值数量
+PYRAMID_CANDIDATES = 3
+# match_multi 中候选峰值超过这个数量时回退到全分辨率
+PYRAMID_MAX_PEAKS = 64
+# 缩小后的模板去掉的边缘宽度
+# pyrDown 在模板边缘按镜像补齐，与截图中模板周围的真实像素不同，
+# 纯色为主的模板（如 NULL_*）在正确位置的粗匹配相似度会因此降到 0 附近
+PYRAMID_BORDER = 1
+
+
+def pyramid_down(image, level):
+    """
+    Args:
+        image (np.ndarray):
+        level (int): 缩小 2^level 倍
+
+    Returns:
+        np.ndarray:
+    """
+    for _ in range(level):
+        image = cv2.pyrDown(image)
+    return image
+
+
+def _usable_level(image, template, level):
+    """
+    模板太小时降低层数
+
+    Returns:
+        int: 不超过 level 的最大可用层数，0 表示只能使用全分辨率
+    """
+    h, w = template.shape[:2]
+    while level > 0:
+        scale = 2 ** level
+        # 缩小后的模板去掉边缘后仍要足够大，搜索范围太小时粗匹配也没有意义
+        if min(h, w) // scale - 2 * PYRAMID_BORDER >= PYRAMID_MIN_SIZE \
+                and image.shape[0] >= h + 2 * scale and image.shape[1] >= w + 2 * scale:
+            return level
+        level -= 1
+    return 0
+
+
+def _coarse(image, template, level):
+    template = pyramid_down(template, level)
+    b = PYRAMID_BORDER
+    template = template[b:template.shape[0] - b, b:template.shape[1] - b]
+    return cv2.matchTemplate(pyramid_down(image, level), template, cv2.TM_CCOEFF_NORMED)
+
+
+def _peaks(res, count, radius, threshold=-1.0):
+    """
+    逐个取出最大值并抑制其邻域
+
+    Returns:
+        list[tuple[float, tuple]]: [(相似度, (x, y)), ...]，按相似度从高到低
+    """
+    res = res.copy()
+    peaks = []
+    for _ in range(count):
+        _, sim, _, (x, y) = cv2.minMaxLoc(res)
+        if sim <= threshold:
+            break
+        peaks.append((sim, (x, y)))
+        res[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1] = -1
+    return peaks
+
+
+def _window(image, template, point, level):
+    """
+    粗匹配位置对应的原分辨率窗口
+
+    Returns:
+        tuple: (窗口图像, 窗口左上角 (x, y))
+    """
+    scale = 2 ** level
+    radius = 2 * scale
+    h, w = template.shape[:2]
+    # 粗匹配的模板去掉了边缘，换算回完整模板的左上角
+    x, y = (point[0] - PYRAMID_BORDER) * scale, (point[1] - PYRAMID_BORDER) * scale
+    x1, y1 = max(0, x - radius), max(0, y - radius)
+    x2, y2 = min(image.shape[1], x + w + radius), min(image.shape[0], y + h + radius)
+    return image[y1:y2, x1:x2], (x1, y1)
+
+
+def match_template(image, template, level=0, similarity=0.85, reject=False):
+    """
+    与 cv2.matchTemplate + cv2.minMaxLoc 相同，返回最佳匹配
+
+    Args:
+        image (np.ndarray): 搜索图像
+        template (np.ndarray): 模板
+        level (int): 金字塔层数，0 表示直接在全分辨率匹配，模板太小时自动减少
+        similarity (float): 判断阈值，用于决定是否需要回退
+        reject (bool): 先用 match_reject 检查，相似度不可能超过 similarity 时跳过匹配，
+            此时返回的是相似度的上界，只适用于只关心是否超过阈值的调用
+
+    Returns:
+        tuple[float, tuple]: (相似度, (x, y))
+    """
+    if reject:
+        rejected = match_reject.check(image, template, similarity)
+        if rejected is not None:
+            return rejected
+    level = _usable_level(image, template, level)
+    if level:
+        h, w = template.shape[:2]
+        radius = max(1, min(h, w) // 2 ** level // 2)
+        peaks = _peaks(_coarse(image, template, level), PYRAMID_CANDIDATES, radius)
+        best = (-1.0, (0, 0))
+        for _, point in peaks:
+            window, (x, y) = _window(image, template, point, level)
+            _, sim, _, (px, py) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+            if sim > best[0]:
+                best = (sim, (x + px, y + py))
+        if peaks and (best[0] > similarity or peaks[0][0] <= similarity - PYRAMID_MARGIN):
+            return best
+
+    res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, sim, _, point = cv2.minMaxLoc(res)
+    return sim, point
+
+
+def match_template_multi(image, template, level=0, similarity=0.85):
+    """
+    所有相似度超过 similarity 的位置
+
+    Args:
+        image (np.ndarray): 搜索图像
+        template (np.ndarray): 模板
+        level (int): 金字塔层数，0 表示直接在全分辨率匹配，模板太小时自动减少
+        similarity (float): 相似度阈值
+
+    Returns:
+        np.ndarray: [[x0, y0], [x1, y1], ...]
+    """
+    level = _usable_level(image, template, level)
+    if level:
+        h, w = template.shape[:2]
+        radius = max(1, min(h, w) // 2 ** level // 2)
+        peaks = _peaks(
+            _coarse(image, template, level), PYRAMID_MAX_PEAKS, radius, threshold=similarity - PYRAMID_MARGIN
+        )
+        if len(peaks) < PYRAMID_MAX_PEAKS:
+            points = set()
+            for _, point in peaks:
+                window, (x, y) = _window(image, template, point, level)
+                res = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+                for py, px in zip(*np.where(res > similarity)):
+                    points.add((x + int(px), y + int(py)))
+            return np.array(sorted(points), dtype=int).reshape(-1, 2)
+
+    res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    return np.array(np.where(res > similarity)).T[:, ::-1]
@@ -1,5 +1,6 @@
 import module.config.server as server
 from module.base.decorator import cached_property, del_cached_property
+from module.base.template_cache import template_cache
 
 
 class Resource:
@@ -88,3 +89,5 @@ def release_resources(next_task=""):
     # 释放资源缓存
     for key, obj in Resource.instances.items():
         obj.resource_release()
+    # 释放模板变体缓存，需要在所有资源释放引用之后
+    template_cache.release()
@@ -9,7 +9,11 @@ import numpy as np
 
 from module.base.button import Button
 from module.base.decorator import cached_property
+from module.base.match_executor import match_executor
+from module.base.pyramid import match_template, match_template_multi
 from module.base.resource import Resource
+from module.base.template_atlas import template_atlas
+from module.base.template_cache import template_cache
 from module.base.utils import Points, area_offset, load_image, rgb2luma
 
 
@@ -55,21 +59,14 @@ class Template(Resource):
         """加载模板图像"""
         if self._image is None:
             if self.is_gif:
-                self._image = []
-                channel = 0
-                for image in imageio.mimread(self.file):
-                    if not channel:
-                        channel = len(image.shape)
-                    if channel == 3:
-                        image = image[:, :, :3].copy()
-                    elif len(image.shape) == 3:
-                        # Follow the first frame
-                        image = image[:, :, 0].copy()
-
-                    image = self.pre_process(image)
-                    self._image += [image, cv2.flip(image, 1)]
+                # 所有帧和翻转后的帧堆叠成一个数组缓存
+                self._image = list(self._cache_variant("gif", self._build_gif))
             else:
-                self._image = self.pre_process(load_image(self.file))
+                # 优先使用图集中的视图，不在图集中时读取 PNG
+                image = template_atlas.get(self.file)
+                if image is None:
+                    image = template_cache.get(self.file, "image", lambda: load_image(self.file))
+                self._image = self.pre_process(image)
 
         return self._image
 
@@ -78,18 +75,11 @@ class Template(Resource):
         """二值化模板图像"""
         if self._image_binary is None:
             if self.is_gif:
-                self._image_binary = []
-                for image in self.image:
-                    image_gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-                    _, image_binary = cv2.threshold(
-                        image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
-                    )
-                    self._image_binary.append(image_binary)
+                self._image_binary = list(self._cache_variant(
+                    "gif_binary", lambda: np.stack([self._build_binary(image) for image in self.image])
+                ))
             else:
-                image_gray = cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY)
-                _, self._image_binary = cv2.threshold(
-                    image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
-                )
+                self._image_binary = self._cache_variant("binary", lambda: self._build_binary(self.image))
 
         return self._image_binary
 
@@ -98,12 +88,11 @@ class Template(Resource):
         """亮度模板图像"""
         if self._image_luma is None:
             if self.is_gif:
-                self._image_luma = []
-                for image in self.image:
-                    luma = rgb2luma(image)
-                    self._image_luma.append(luma)
+                self._image_luma = list(self._cache_variant(
+                    "gif_luma", lambda: np.stack([rgb2luma(image) for image in self.image])
+                ))
             else:
-                self._image_luma = rgb2luma(self.image)
+                self._image_luma = self._cache_variant("luma", lambda: rgb2luma(self.image))
 
         return self._image_luma
 
@@ -111,6 +100,47 @@ class Template(Resource):
     def image(self, value):
         self._image = value
 
+    def _build_gif(self):
+        images = []
+        channel = 0
+        for image in imageio.mimread(self.file):
+            if not channel:
+                channel = len(image.shape)
+            if channel == 3:
+                image = image[:, :, :3].copy()
+            elif len(image.shape) == 3:
+                # Follow the first frame
+                image = image[:, :, 0].copy()
+
+            image = self.pre_process(image)
+            images += [image, cv2.flip(image, 1)]
+        return np.stack(images)
+
+    @staticmethod
+    def _build_binary(image):
+        image_gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        _, image_binary = cv2.threshold(
+            image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+        )
+        return image_binary
+
+    def _cache_variant(self, variant, build):
+        """
+        从 template_cache 读取由 self.image 计算出的变体
+
+        子类重写了 pre_process() 时 self.image 不再是原图，变体名称加上类名区分
+
+        Args:
+            variant (str): 预处理方式
+            build (callable): 缓存未命中时的计算方法
+
+        Returns:
+            np.ndarray:
+        """
+        if type(self).pre_process is not Template.pre_process:
+            variant = f"{type(self).__name__}_{variant}"
+        return template_cache.get(self.file, variant, build)
+
     def resource_release(self):
         """释放资源"""
         super().resource_release()
@@ -138,7 +168,7 @@ class Template(Resource):
         else:
             return self.image.shape[0:2][::-1]
 
-    def match(self, image, scaling=1.0, similarity=0.85):
+    def match(self, image, scaling=1.0, similarity=0.85, pyramid=0):
         """
         全屏搜索匹配模板（彩色）
 
@@ -146,29 +176,28 @@ class Template(Resource):
             image: 全屏截图
             scaling (int, float): 缩放比例
             similarity (float): 相似度阈值 (0-1)
+            pyramid (int): 金字塔层数，先在缩小 2^pyramid 倍的图像上找候选，0 表示不使用
 
         Returns:
             bool: 是否找到匹配
         """
+        # device.image 可能是 LazyImage，全屏匹配需要完整图像
+        image = np.asarray(image)
         scaling = 1 / scaling
         if scaling != 1.0:
             image = cv2.resize(image, None, fx=scaling, fy=scaling)
 
         if self.is_gif:
-            for template in self.image:
-                # 全屏模版匹配
-                res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
-                # 寻找最佳匹配点
-                _, sim, _, _ = cv2.minMaxLoc(res)
-                # print(self.file, sim)
-                if sim > similarity:
-                    return True
-
-            return False
+            # 各帧互不相关，交给线程池，按顺序取第一个匹配的帧
+            index, _ = match_executor.first(
+                lambda template: match_template(image, template, level=pyramid, similarity=similarity, reject=True)[0],
+                self.image,
+                key=lambda sim: sim > similarity,
+            )
+            return index is not None
 
         else:
-            res = cv2.matchTemplate(image, self.image, cv2.TM_CCOEFF_NORMED)
-            _, sim, _, _ = cv2.minMaxLoc(res)
+            sim, _ = match_template(image, self.image, level=pyramid, similarity=similarity, reject=True)
             # print(self.file, sim)
             return sim > similarity
 
@@ -183,6 +212,7 @@ class Template(Resource):
         Returns:
             bool: 是否找到匹配
         """
+        image = np.asarray(image)
         if self.is_gif:
             # graying
             image_gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
@@ -190,15 +220,13 @@ class Template(Resource):
             _, image_binary = cv2.threshold(
                 image_gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
             )
-            for template in self.image_binary:
-                # template matching
-                res = cv2.matchTemplate(image_binary, template, cv2.TM_CCOEFF_NORMED)
-                _, sim, _, _ = cv2.minMaxLoc(res)
-                # print(self.file, sim)
-                if sim > similarity:
-                    return True
-
-            return False
+            # template matching
+            index, _ = match_executor.first(
+                match_executor.match,
+                [(image_binary, template, cv2.TM_CCOEFF_NORMED, None) for template in self.image_binary],
+                key=lambda result: result[0] > similarity,
+            )
+            return index is not None
 
         else:
             # graying
@@ -226,16 +254,15 @@ class Template(Resource):
         Returns:
             bool: 是否找到匹配
         """
+        image = np.asarray(image)
         if self.is_gif:
             image = rgb2luma(image)
-            for template in self.image_luma:
-                res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
-                _, sim, _, _ = cv2.minMaxLoc(res)
-                # print(self.file, sim)
-                if sim > similarity:
-                    return True
-
-            return False
+            index, _ = match_executor.first(
+                match_executor.match,
+                [(image, template, cv2.TM_CCOEFF_NORMED, None) for template in self.image_luma],
+                key=lambda result: result[0] > similarity,
+            )
+            return index is not None
 
         else:
             image_luma = rgb2luma(image)
@@ -264,20 +291,22 @@ class Template(Resource):
             button.load_color(image)
         return button
 
-    def match_result(self, image, name=None):
+    def match_result(self, image, name=None, pyramid=0, similarity=0.85):
         """
         返回匹配结果（相似度 + 位置）
 
         Args:
             image: 全屏截图
             name (str): 按钮名称
+            pyramid (int): 金字塔层数，0 表示不使用
+            similarity (float): 使用金字塔时，用于判断粗匹配结果是否有歧义
 
         Returns:
             float: 相似度
             Button: 匹配位置的 Button 对象
         """
-        res = cv2.matchTemplate(image, self.image, cv2.TM_CCOEFF_NORMED)
-        _, sim, _, point = cv2.minMaxLoc(res)
+        image = np.asarray(image)
+        sim, point = match_template(image, self.image, level=pyramid, similarity=similarity)
         # print(self.file, sim)
 
         # 转化为 Button
@@ -296,6 +325,7 @@ class Template(Resource):
             float: 相似度
             Button: 匹配位置的 Button 对象
         """
+        image = np.asarray(image)
         image_luma = rgb2luma(image)
         res = cv2.matchTemplate(image_luma, self.image_luma, cv2.TM_CCOEFF_NORMED)
         _, sim, _, point = cv2.minMaxLoc(res)
@@ -304,7 +334,7 @@ class Template(Resource):
         button = self._point_to_button(point, image=image, name=name)
         return sim, button
 
-    def match_multi(self, image, scaling=1.0, similarity=0.85, threshold=3, name=None):
+    def match_multi(self, image, scaling=1.0, similarity=0.85, threshold=3, name=None, pyramid=0):
         """
         匹配目标出现的所有位置（返回所有匹配位置）
 
@@ -314,10 +344,12 @@ class Template(Resource):
             similarity (float): 相似度阈值 (0-1)
             threshold (int): 聚类距离阈值，距离小于此值的点会被合并
             name (str): 按钮名称
+            pyramid (int): 金字塔层数，0 表示不使用
 
         Returns:
             list[Button]: 所有匹配位置的 Button 列表
         """
+        image = np.asarray(image)
         scaling = 1 / scaling
         if scaling != 1.0:
             image = cv2.resize(image, None, fx=scaling, fy=scaling)
@@ -326,14 +358,12 @@ class Template(Resource):
         if self.is_gif:
             result = []
             for template in self.image:
-                res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
                 # 找到所有相似度 > 0.85 的点
-                res = np.array(np.where(res > similarity)).T[:, ::-1].tolist()
+                res = match_template_multi(image, template, level=pyramid, similarity=similarity).tolist()
                 result += res
             result = np.array(result)
         else:
-            result = cv2.matchTemplate(image, self.image, cv2.TM_CCOEFF_NORMED)
-            result = np.array(np.where(result > similarity)).T[:, ::-1]
+            result = match_template_multi(image, self.image, level=pyramid, similarity=similarity)
 
         # result: np.array([[x0, y0], [x1, y1], ...)
         if scaling != 1.0:
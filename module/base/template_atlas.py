@@ -0,0 +1,175 @@
+"""
+打包的模板图集
+
+角色模板有七百多张小图，逐个用 PIL 打开解码既慢又会产生大量零散的小数组。
+dev_tools/build_character_atlas.py 把它们按顺序拼接成一个 uint8 文件，
+运行时用 np.memmap 映射，Template.image 直接是文件上的只读视图，
+只有真正用到的模板所在的页才会被读入内存。
+
+文件格式：MAGIC | 索引长度 (uint64) | JSON 索引 | 对齐填充 | 所有模板依次拼接的像素
+索引记录每个源文件的偏移、形状、mtime、大小、sha1，以及 uid、星级等角色信息。
+加载时按内容检查源文件，与 template_cache 相同：mtime 和大小不变时直接沿用，
+mtime 变化时（例如重新 clone、git pull）再比较 sha1。内容变化的模板回退到读取 PNG。
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from module.logger import logger
+
+
+class TemplateAtlas:
+    """
+    只读的模板图集，第一次查询时加载索引并映射文件
+    """
+
+    MAGIC = b"PCRATL01"
+    VERSION = 2
+    ALIGN = 64
+
+    def __init__(self, file="./cache/character.atlas"):
+        """
+        Args:
+            file (str): 图集文件路径
+        """
+        self.file = file
+        self.lock = threading.Lock()
+        self._loaded = False
+        self._memmap = None
+        # 源文件路径 -> 索引记录
+        self.entries = {}
+        self._stale = set()
+
+    def _data_offset(self, length):
+        """数据区的起始位置，按 ALIGN 对齐"""
+        return (16 + length + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+
+    def _load(self):
+        with self.lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.file):
+                return
+            try:
+                with open(self.file, "rb") as f:
+                    head = f.read(16)
+                    if head[:8] != self.MAGIC:
+                        raise ValueError("Invalid header")
+                    (length,) = struct.unpack("<Q", head[8:16])
+                    index = json.loads(f.read(length).decode("utf-8"))
+                if index.get("version") != self.VERSION:
+                    raise ValueError("Version changed, please rebuild")
+                start = self._data_offset(length)
+                if os.path.getsize(self.file) > start:
+                    self._memmap = np.memmap(self.file, dtype=np.uint8, mode="r", offset=start)
+            except Exception as e:
+                logger.warning(f"Failed to load template atlas {self.file}: {e}")
+                return
+            self.entries = index["entries"]
+            self._stale = {file for file, entry in self.entries.items() if not self._unchanged(file, entry)}
+            logger.info(f"Template atlas loaded: {len(self.entries)} templates")
+            if self._stale:
+                logger.warning(f"Template atlas is outdated: {len(self._stale)}/{len(self.entries)} templates changed, "
+                               f"reading them from PNG. Run dev_tools/build_character_atlas.py to rebuild")
+
+    @staticmethod
+    def _unchanged(file, entry):
+        """
+        Args:
+            file (str): 模板源文件
+            entry (dict): 索引记录
+
+        Returns:
+            bool: 源文件内容与打包时相同
+        """
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return False
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        with open(file, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest() == entry["sha1"]
+
+    def get(self, file):
+        """
+        Args:
+            file (str): 模板源文件
+
+        Returns:
+            np.ndarray | None: 图集上的只读视图，不在图集中或图集过期时返回 None
+        """
+        self._load()
+        entry = self.entries.get(file)
+        if entry is None or self._memmap is None or file in self._stale:
+            return None
+        offset, shape = entry["offset"], entry["shape"]
+        # np.asarray 去掉 memmap 子类，仍然是映射内存上的视图
+        return np.asarray(self._memmap[offset:offset + int(np.prod(shape))]).reshape(shape)
+
+    def info(self, file):
+        """
+        Args:
+            file (str): 模板源文件
+
+        Returns:
+            dict | None: 索引中记录的角色信息，包括 uid、stars、name 等
+        """
+        self._load()
+        entry = self.entries.get(file)
+        if entry is None:
+            return None
+        return {key: value for key, value in entry.items()
+                if key not in ("offset", "shape", "mtime_ns", "size", "sha1")}
+
+    def build(self, images, metadata=None):
+        """
+        写入图集文件，已加载的映射不会更新，需要重新启动
+
+        Args:
+            images (dict[str, np.ndarray]): 源文件路径 -> 图像
+            metadata (dict[str, dict]): 源文件路径 -> 额外写入索引的信息
+
+        Returns:
+            int: 数据区大小(字节)
+        """
+        metadata = metadata or {}
+        entries = {}
+        offset = 0
+        for file, image in images.items():
+            stat = os.stat(file)
+            with open(file, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            entries[file] = {
+                "offset": offset,
+                "shape": list(image.shape),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha1": digest,
+                **metadata.get(file, {}),
+            }
+            offset += (image.nbytes + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+        header = json.dumps({"version": self.VERSION, "entries": entries}, ensure_ascii=False).encode("utf-8")
+
+        os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+        temp = f"{self.file}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(self.MAGIC + struct.pack("<Q", len(header)) + header)
+            f.write(b"\0" * (self._data_offset(len(header)) - 16 - len(header)))
+            for image in images.values():
+                image = np.ascontiguousarray(image, dtype=np.uint8)
+                f.write(image.tobytes())
+                f.write(b"\0" * (-image.nbytes % self.ALIGN))
+        os.replace(temp, self.file)
+        return offset
+
+
+template_atlas = TemplateAtlas()
@@ -0,0 +1,141 @@
+"""
+多模板批量匹配
+
+逐个调用 Template.match_result 时，每次 cv2.matchTemplate 都要重新对整张截图做 DFT、
+计算积分图。TemplateBank 把同一尺寸的模板放在一起，每张截图只计算一次：
+- 截图每个通道的频谱
+- 每个窗口的方差（积分图）
+之后每个模板只需要对自身做 DFT、一次频谱乘法和一次逆变换。
+模板频谱的大小与截图相同（每个通道几 MB），所以不缓存。
+结果与 cv2.TM_CCOEFF_NORMED 相同（float32 精度内）。
+"""
+
+import cv2
+import numpy as np
+
+from module.base.match_executor import match_executor
+from module.base.utils import crop
+
+
+class TemplateBank:
+    """
+    一组模板的批量匹配，模板按尺寸分组
+    """
+
+    # 窗口内每个像素方差之和低于该值时视为纯色区域，相似度记为 0
+    # 避免遮罩后的黑色区域被浮点误差放大成高相似度
+    MIN_VARIANCE = 1.0
+
+    def __init__(self, templates):
+        """
+        Args:
+            templates (dict[str, Template]): 名称 -> 模板，不支持 GIF 模板
+        """
+        self.templates = dict(templates)
+
+    def _groups(self, names):
+        """
+        Returns:
+            dict[tuple, list[str]]: 模板形状 -> 模板名称
+        """
+        groups = {}
+        for name in names:
+            shape = self.templates[name].image.shape
+            groups.setdefault(shape, []).append(name)
+        return groups
+
+    def _template_spectrum(self, name, dft_size):
+        """
+        Returns:
+            tuple: (每个通道去均值后的频谱, 去均值后的平方和)
+        """
+        template = self.templates[name].image.astype(np.float32)
+        if template.ndim == 2:
+            template = template[:, :, np.newaxis]
+        h, w, channel = template.shape
+        template = template - template.reshape(-1, channel).mean(axis=0)
+        spectrum = []
+        for index in range(channel):
+            padded = np.zeros(dft_size, dtype=np.float32)
+            padded[:h, :w] = template[:, :, index]
+            spectrum.append(cv2.dft(padded))
+        return spectrum, float(np.square(template).sum())
+
+    def _match_group(self, image, names, shape):
+        """
+        Args:
+            image (np.ndarray): float32，形状 (H, W, C)
+            names (list[str]): 同一尺寸的模板
+            shape (tuple): 模板形状
+
+        Returns:
+            dict[str, tuple]: 名称 -> (相似度, (x, y))
+        """
+        height, width, channel = image.shape
+        h, w = shape[:2]
+        rows, cols = height - h + 1, width - w + 1
+        dft_size = (cv2.getOptimalDFTSize(height + h - 1), cv2.getOptimalDFTSize(width + w - 1))
+
+        # 截图一侧，只算一次
+        spectrum = []
+        for index in range(channel):
+            padded = np.zeros(dft_size, dtype=np.float32)
+            padded[:height, :width] = image[:, :, index]
+            spectrum.append(cv2.dft(padded))
+        total, square = cv2.integral2(image, sdepth=cv2.CV_64F)
+        total = total[h:, w:] - total[:-h, w:] - total[h:, :-w] + total[:-h, :-w]
+        square = square[h:, w:] - square[:-h, w:] - square[h:, :-w] + square[:-h, :-w]
+        variance = (square - total * total / (h * w)).reshape(rows, cols, -1).sum(axis=2)
+        flat = variance < self.MIN_VARIANCE
+        norm = np.sqrt(np.maximum(variance, self.MIN_VARIANCE)).astype(np.float32)
+
+        def match(name):
+            template, template_square = self._template_spectrum(name, dft_size)
+            if template_square < self.MIN_VARIANCE:
+                return 0.0, (0, 0)
+            # 各通道的互相关在频域中相加，只做一次逆变换
+            product = cv2.mulSpectrums(spectrum[0], template[0], 0, conjB=True)
+            for index in range(1, channel):
+                cv2.add(product, cv2.mulSpectrums(spectrum[index], template[index], 0, conjB=True), dst=product)
+            corr = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE, nonzeroRows=rows)
+            res = cv2.divide(corr[:rows, :cols], norm, scale=1 / np.sqrt(template_square))
+            res[flat] = 0
+            _, sim, _, point = cv2.minMaxLoc(res)
+            return min(sim, 1.0), point
+
+        # 每个模板只读取截图一侧的结果，可以并行
+        return dict(zip(names, match_executor.map(match, names)))
+
+    def match_result(self, image, names=None, area=None):
+        """
+        返回每个模板的最佳匹配，与逐个调用 Template.match_result 相同
+
+        Args:
+            image: 全屏截图
+            names (list[str]): 只匹配这些模板，None 表示全部
+            area (tuple): 只在这个区域内搜索 (x1, y1, x2, y2)
+
+        Returns:
+            dict[str, tuple[float, Button]]: 名称 -> (相似度, 匹配位置的 Button)，
+                搜索区域小于模板时为 (0.0, None)
+        """
+        image = np.asarray(image)
+        if names is None:
+            names = list(self.templates)
+        search = image if area is None else crop(image, area, copy=False)
+        origin = (0, 0) if area is None else tuple(area[:2])
+        search = search.astype(np.float32)
+        if search.ndim == 2:
+            search = search[:, :, np.newaxis]
+
+        result = {}
+        for shape, group in self._groups(names).items():
+            if search.shape[0] < shape[0] or search.shape[1] < shape[1]:
+                for name in group:
+                    result[name] = (0.0, None)
+                continue
+            for name, (sim, point) in self._match_group(search, group, shape).items():
+                point = (point[0] + origin[0], point[1] + origin[1])
+                button = self.templates[name]._point_to_button(point, image=image, name=name)
+                result[name] = (sim, button)
+        return result
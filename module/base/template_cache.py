@@ -0,0 +1,203 @@
+"""
+模板预处理结果的磁盘缓存
+
+每次启动都要重新解码几百张模板 PNG 并计算灰度、二值化、亮度等变体。
+这里把结果打包保存到 ./cache/templates.pack，以源文件内容的 sha1 作为键：
+- 源文件 mtime 和大小不变时直接沿用记录的 sha1，不读取文件
+- 内容变化后旧的结果在下次保存时被清理
+Button、Template、Mask 共用同一个实例，缓存的数组是只读的。
+release_resources() 时调用 release() 释放，之后用到时重新读取。
+
+文件格式：MAGIC | 索引长度 (uint64) | JSON 索引 | 对齐填充 | 所有数组依次拼接的数据
+启动时整个文件一次读入，每个数组都是这块内存上的视图，不需要逐个解析。
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from module.logger import logger
+
+
+class TemplateCache:
+    """
+    模板变体缓存，进程内只加载一次，退出时把新增的结果写回磁盘
+    """
+
+    MAGIC = b"PCRTPL01"
+    # 变体的计算方式改变时增加版本号，旧缓存整体作废
+    VERSION = 1
+    ALIGN = 64
+
+    def __init__(self, file="./cache/templates.pack"):
+        """
+        Args:
+            file (str): 缓存文件路径
+        """
+        self.file = file
+        self.lock = threading.RLock()
+        self._loaded = False
+        # 键 -> 数组，包括从磁盘读取的和本次新计算的
+        self._arrays = {}
+        # 源文件路径 -> [mtime_ns, size, sha1]
+        self._sources = {}
+        self._dirty = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.file):
+            return
+        try:
+            with open(self.file, "rb") as f:
+                data = f.read()
+            if data[:8] != self.MAGIC:
+                raise ValueError("Invalid header")
+            (length,) = struct.unpack("<Q", data[8:16])
+            index = json.loads(data[16:16 + length].decode("utf-8"))
+            if index.get("version") != self.VERSION:
+                logger.info("Template cache version changed, rebuild")
+                return
+            start = self._data_offset(length)
+            blob = np.frombuffer(data, dtype=np.uint8, offset=start)
+            arrays = {}
+            for key, (offset, dtype, shape) in index["arrays"].items():
+                dtype = np.dtype(dtype)
+                size = int(np.prod(shape)) * dtype.itemsize
+                arrays[key] = blob[offset:offset + size].view(dtype).reshape(shape)
+        except Exception as e:
+            logger.warning(f"Failed to load template cache {self.file}: {e}")
+            return
+        self._arrays = arrays
+        self._sources = index["sources"]
+
+    def _data_offset(self, length):
+        """数据区的起始位置，按 ALIGN 对齐"""
+        return (16 + length + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+
+    def _digest(self, file):
+        """
+        Args:
+            file (str): 源文件
+
+        Returns:
+            str: 源文件内容的 sha1
+        """
+        stat = os.stat(file)
+        record = self._sources.get(file)
+        if record is not None and record[0] == stat.st_mtime_ns and record[1] == stat.st_size:
+            return record[2]
+        with open(file, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self._sources[file] = [stat.st_mtime_ns, stat.st_size, digest]
+        self._dirty = True
+        return digest
+
+    def get(self, file, variant, build):
+        """
+        读取缓存，未命中时调用 build() 计算并记录
+
+        Args:
+            file (str): 源文件
+            variant (str): 预处理方式，同一个源文件的不同结果用它区分
+            build (callable): 无参数，返回 np.ndarray，返回 None 时不缓存
+
+        Returns:
+            np.ndarray: 只读数组
+        """
+        with self.lock:
+            self._load()
+            try:
+                key = f"{self._digest(file)}.{variant}"
+            except OSError:
+                # 文件不存在，交给 build() 报错
+                return build()
+            image = self._arrays.get(key)
+        if image is not None:
+            return image
+
+        image = build()
+        if isinstance(image, np.ndarray):
+            image = np.ascontiguousarray(image)
+            image.flags.writeable = False
+            with self.lock:
+                self._arrays[key] = image
+                self._dirty = True
+        return image
+
+    def save(self):
+        """
+        写回磁盘，只保留仍然存在的源文件的当前内容对应的结果
+        """
+        with self.lock:
+            if not self._dirty:
+                return
+            sources = {file: record for file, record in self._sources.items() if os.path.exists(file)}
+            digests = {record[2] for record in sources.values()}
+            arrays = {key: image for key, image in self._arrays.items() if key.split(".", 1)[0] in digests}
+
+            index = {}
+            offset = 0
+            for key, image in arrays.items():
+                index[key] = [offset, image.dtype.str, list(image.shape)]
+                offset += (image.nbytes + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+            header = json.dumps(
+                {"version": self.VERSION, "sources": sources, "arrays": index}, ensure_ascii=False
+            ).encode("utf-8")
+
+            os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+            temp = f"{self.file}.{os.getpid()}.tmp"
+            try:
+                with open(temp, "wb") as f:
+                    f.write(self.MAGIC + struct.pack("<Q", len(header)) + header)
+                    f.write(b"\0" * (self._data_offset(len(header)) - 16 - len(header)))
+                    for image in arrays.values():
+                        f.write(image.tobytes())
+                        f.write(b"\0" * (-image.nbytes % self.ALIGN))
+                os.replace(temp, self.file)
+            except OSError as e:
+                logger.warning(f"Failed to save template cache {self.file}: {e}")
+                if os.path.exists(temp):
+                    os.remove(temp)
+                return
+            self._arrays = arrays
+            self._sources = sources
+            self._dirty = False
+            logger.info(f"Template cache saved: {len(arrays)} arrays, {len(sources)} files")
+
+    def release(self):
+        """
+        释放已加载的数组，新计算的结果先写回磁盘，下次 get() 时重新读取
+
+        数组都是同一块内存上的视图，Button 和 Template 也释放引用后内存才会回收
+        """
+        with self.lock:
+            self.save()
+            self._arrays = {}
+            self._sources = {}
+            self._dirty = False
+            self._loaded = False
+
+
+def area_variant(area, name):
+    """
+    按区域裁剪后的变体名称
+
+    Args:
+        area (tuple): (x1, y1, x2, y2)
+        name (str): 预处理方式
+
+    Returns:
+        str:
+    """
+    return "area_{}_{}_{}_{}.{}".format(*map(int, area), name)
+
+
+template_cache = TemplateCache()
+atexit.register(template_cache.save)
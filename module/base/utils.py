@@ -106,7 +106,7 @@ def save_image(image, file):
         image (np.ndarray): 图像数组
         file (str): 保存路径
     """
-    Image.fromarray(image).save(file)
+    Image.fromarray(np.asarray(image)).save(file)
 
 
 def copy_image(src):
@@ -119,6 +119,7 @@ def copy_image(src):
     Returns:
         np.ndarray: 复制的图像
     """
+    src = np.asarray(src)
     dst = np.empty_like(src)
     cv2.copyTo(src, None, dst)
     return dst
@@ -218,7 +219,7 @@ def rgb2gray(image):
     Returns:
         np.ndarray: Shape (height, width)
     """
-    r, g, b = cv2.split(image)
+    r, g, b = cv2.split(np.asarray(image))
     maximum = cv2.max(r, g)
     cv2.min(r, g, dst=r)
     cv2.max(maximum, b, dst=maximum)
@@ -240,7 +241,7 @@ def rgb2luma(image):
     Returns:
         np.ndarray: 亮度图像，形状 (height, width)
     """
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2YUV)
+    image = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2YUV)
     luma, _, _ = cv2.split(image)
     return luma
 
@@ -310,6 +311,7 @@ def extract_letters(image, letter=(255, 255, 255), threshold=128):
     Returns:
         np.ndarray: Shape (height, width)
     """
+    image = np.asarray(image)
     diff = cv2.subtract(image, (*letter, 0))
     r, g, b = cv2.split(diff)
     cv2.max(r, g, dst=r)
@@ -389,6 +391,8 @@ def get_bbox(image, threshold=0):
     Raises:
         ImageNotSupported: 如果无法获取边界框
     """
+    # device.image 可能是 LazyImage，OpenCV 需要完整图像
+    image = np.asarray(image)
     channel = image_channel(image)
     # 转换为灰度图
     if channel == 3:
@@ -65,13 +65,17 @@ class BattleMonitor:
         logger.info(f"截图方式: {mode}")
 
         # ── 初始化 OCR 引擎 ──
-        ocr_engine = OCR_MODEL.pcr
+        # 同一秒内的帧几乎相同，经过缓存后只有新出现的画面才需要跑模型
+        ocr_engine = OCR_MODEL.pcr_cached
         ocr_engine.init()
+        ocr_engine.reset_stats()
         async_ocr = AsyncOCR(ocr_engine, alphabet=_TIMER_ALPHABET)
 
         # ── 创建异步截图实例 ──
+        # 监控循环只读取倒计时区域，只转换这一小块像素
         async_screenshot = create_async_screenshot(
-            self.device, mode=mode, crop_area=_TIMER_CROP
+            self.device, mode=mode, crop_area=_TIMER_CROP, full_frame=False,
+            use_process=self.config.BATTLE_CAPTURE_PROCESS,
         )
 
         logger.info("开始监控倒计时")
@@ -99,15 +103,15 @@ class BattleMonitor:
         sys.stdout.flush()
 
         start_ts = time.time()
-        last_image = None
         result = False
 
         async_screenshot.start()
         async_ocr.start()
+        # OCR 消费者游标，按帧序号判断是否是新帧
+        ocr_cursor = async_screenshot.cursor("ocr")
 
         # 等待第一帧
-        while async_screenshot.get_image()[0] is None:
-            time.sleep(0.01)
+        async_screenshot.wait_for_frame(copy=False)
 
         try:
             while True:
@@ -115,10 +119,13 @@ class BattleMonitor:
 
                 # 异步截图期间 device.screenshot() 不会被调用
                 self.device.stuck_record_clear()
-                image, _ = async_screenshot.get_image()
-                if image is not None and image is not last_image:
-                    last_image = image
-                    async_ocr.submit(image)
+                frame = ocr_cursor.poll(copy=False)
+                if frame is not None:
+                    # 裁剪图很小，复制后交给 OCR 线程，避免槽位被覆盖
+                    cropped = frame.cropped.copy()
+                    # 复制期间槽位被截图线程覆盖时丢弃这一帧
+                    if async_screenshot.is_valid(frame):
+                        async_ocr.submit(cropped)
 
                 text, ocr_image, _ = async_ocr.get_result()
                 current_ts = time.time()
@@ -218,6 +225,7 @@ class BattleMonitor:
             elapsed = time.time() - start_ts
             logger.info("=" * 70)
             logger.info(f"  运行时间: {elapsed:.1f}s | 识别次数: {detection_count} | 后端: {mode}")
+            ocr_engine.log_stats()
             if last_valid_seconds is not None:
                 m, s = divmod(last_valid_seconds, 60)
                 logger.info(f"  最后识别倒计时: {m}:{s:02d}")
@@ -0,0 +1,255 @@
+"""
+按网格识别角色列表
+分辨率: 1280×720
+
+角色列表是固定间距的网格，没必要让每个模板在整个列表上滑动。
+每页先确定网格的纵向位置，裁出每个格子中的头像，
+用缩小后的图像向量与模板做最近邻查找，只对最接近的几个模板做一次小范围的模板匹配确认。
+一页的开销从 "模板数 × 全屏卷积" 变为 "格子数 × 几次向量比较"。
+
+头像在卡片中的位置不是写死的：校准前 recognize() 返回 None，由全列表模板匹配识别，
+calibrate() 用匹配到的头像位置测量它们相对于网格的偏移，
+locate() 的相位如果有固定偏差也一起被吸收。
+"""
+
+import cv2
+import numpy as np
+
+from module.base.button import ButtonGrid
+from module.base.utils import crop
+from module.logger import logger
+
+# 角色卡片网格，列表横向位置固定，纵向随滚动变化，origin 的 y 每页重新计算
+CHARACTER_GRID = ButtonGrid(
+    origin=(84, 0),
+    delta=(141, 146),
+    button_shape=(119, 116),
+    grid_shape=(8, 4),
+    name="CHARACTER_CARD",
+)
+
+
+class CharacterGrid:
+    """
+    角色列表网格识别
+    """
+
+    # 缩小后的边长
+    DESCRIPTOR_SIZE = 12
+    # 头像位置的误差，在 ±FACE_SHIFT 范围内按 FACE_SHIFT_STEP 取多个位置
+    FACE_SHIFT = 6
+    FACE_SHIFT_STEP = 3
+    # 每个格子对最接近的几个模板做模板匹配确认
+    TOP_K = 2
+    # 确认时在头像位置周围多少像素内搜索
+    VERIFY_MARGIN = 10
+    # 卡片边框的纵向梯度与网格的吻合度低于该值时认为不是角色列表
+    MIN_PHASE_SCORE = 1.5
+    # 得分不低于最高分该比例的相邻相位视为并列
+    PHASE_TOLERANCE = 0.98
+    # 校准需要的头像数，这些头像相对网格的偏移相差不超过 FACE_SHIFT
+    CALIBRATE_HITS = 2
+
+    def __init__(self, templates, area, grid=CHARACTER_GRID):
+        """
+        Args:
+            templates (dict[str, Template]): 名称 -> 头像模板
+            area (tuple): 列表可见区域 (x1, y1, x2, y2)，通常是 MASK_CHARACTER_LIST 的外接矩形
+            grid (ButtonGrid): 卡片网格
+        """
+        self.templates = dict(templates)
+        self.area = tuple(int(v) for v in area)
+        self.grid = grid
+        self.names = list(self.templates)
+        self._descriptors = None
+        # 头像左上角相对网格 origin 的偏移 (x, y)，对 delta 取模，None 表示未校准
+        self.face_offset = None
+        # 校准中收集到的偏移
+        self._offsets = []
+
+    @classmethod
+    def descriptor(cls, image):
+        """
+        缩小后去均值、归一化的向量，两个向量的点积近似于低分辨率下的 TM_CCOEFF_NORMED
+
+        Args:
+            image (np.ndarray): RGB 图像
+
+        Returns:
+            np.ndarray: float32，长度 DESCRIPTOR_SIZE ** 2 * 3
+        """
+        size = cls.DESCRIPTOR_SIZE
+        vector = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @property
+    def descriptors(self):
+        """
+        Returns:
+            np.ndarray: 形状 (模板数, 向量长度)
+        """
+        if self._descriptors is None:
+            self._descriptors = np.stack([self.descriptor(self.templates[name].image) for name in self.names])
+        return self._descriptors
+
+    def locate(self, image):
+        """
+        根据卡片上下边框的位置确定当前页网格的纵向偏移
+
+        Args:
+            image (np.ndarray): 截图
+
+        Returns:
+            ButtonGrid | None: 当前页的网格，不是角色列表时返回 None
+        """
+        x1, y1, x2, y2 = self.area
+        gray = cv2.cvtColor(crop(image, self.area, copy=False), cv2.COLOR_RGB2GRAY)
+        # 每一行纵向梯度的中位数，卡片上下边框横跨大部分列，是峰值；头像内容只占少数列，影响不大
+        profile = np.median(np.abs(np.diff(gray.astype(np.int16), axis=0)), axis=1).astype(np.float32)
+        # 边框有几个像素宽，平滑到相邻几行，避免差一两个像素就完全错过
+        profile = cv2.blur(profile.reshape(-1, 1), (1, 5)).ravel()
+        delta = int(self.grid.delta[1])
+        height = int(self.grid.button_shape[1])
+        scores = np.zeros(delta)
+        for phase in range(delta):
+            edges = np.concatenate([np.arange(phase, len(profile), delta), np.arange(phase + height, len(profile), delta)])
+            edges = edges[edges < len(profile)]
+            if len(edges):
+                scores[phase] = profile[edges].mean()
+        phase = int(np.argmax(scores))
+        score = scores[phase] / max(profile.mean(), 1e-6)
+        if score < self.MIN_PHASE_SCORE:
+            logger.info(f"Character grid not found, score={score:.2f}")
+            return None
+        # 边框有几个像素宽，平滑后相邻的几个相位得分并列，取并列区间的中点，而不是最靠上的一个
+        threshold = scores[phase] * self.PHASE_TOLERANCE
+        left = right = 0
+        while left < delta and scores[(phase - left - 1) % delta] >= threshold:
+            left += 1
+        while right < delta and scores[(phase + right + 1) % delta] >= threshold:
+            right += 1
+        phase = (phase + (right - left) // 2) % delta
+
+        # 网格第一行从可见区域上方开始，部分可见的行由 cells() 过滤
+        origin_y = y1 + phase - delta
+        return self.grid.move((0, origin_y - int(self.grid.origin[1])))
+
+    def cells(self, grid):
+        """
+        完整可见的头像位置
+
+        Args:
+            grid (ButtonGrid): locate() 的结果
+
+        Returns:
+            list[tuple]: 头像左上角 (x, y)
+        """
+        w, h = self.templates[self.names[0]].size
+        dx, dy = (int(v) for v in grid.delta)
+        # 每页 locate() 的相位可能差几个像素，贴着边缘的头像允许超出 FACE_SHIFT，由偏移搜索吸收
+        x1, y1, x2, y2 = np.add(self.area, (-self.FACE_SHIFT, -self.FACE_SHIFT, self.FACE_SHIFT, self.FACE_SHIFT))
+        # 可见区域内第一个头像的位置
+        fx = x1 + (int(grid.origin[0]) + self.face_offset[0] - x1) % dx
+        fy = y1 + (int(grid.origin[1]) + self.face_offset[1] - y1) % dy
+        return [(int(x), int(y)) for y in range(fy, y2 - h + 1, dy) for x in range(fx, x2 - w + 1, dx)]
+
+    def calibrate(self, image, results, similarity=0.85):
+        """
+        用全列表模板匹配的结果测量头像相对网格的偏移
+
+        Args:
+            image: 截图，与 results 对应
+            results (dict[str, tuple[float, Button]]): TemplateBank.match_result() 的结果
+            similarity (float): 只使用相似度不低于该值的结果
+
+        Returns:
+            bool: 是否已校准
+        """
+        if self.face_offset is not None:
+            return True
+        grid = self.locate(np.asarray(image))
+        if grid is None:
+            return False
+        delta = grid.delta.astype(int)
+        for sim, button in results.values():
+            if sim >= similarity:
+                self._offsets.append((np.array(button.area[:2]) - grid.origin.astype(int)) % delta)
+        if len(self._offsets) < self.CALIBRATE_HITS:
+            return False
+
+        # 偏移按 delta 取模，以第一个为参照展开到 ±delta / 2 再比较
+        offsets = np.array(self._offsets)
+        diff = (offsets - offsets[0] + delta // 2) % delta - delta // 2
+        if np.abs(diff).max() > self.FACE_SHIFT:
+            logger.info(f"Character grid calibration inconsistent: {offsets.tolist()}")
+            self._offsets = self._offsets[-1:]
+            return False
+        self.face_offset = tuple(int(v) for v in (offsets[0] + np.round(np.median(diff, axis=0)).astype(int)) % delta)
+        logger.info(f"Character grid calibrated: face_offset={self.face_offset}")
+        return True
+
+    def reset(self):
+        """
+        清除校准结果，之后重新由全列表模板匹配校准
+        """
+        self.face_offset = None
+        self._offsets = []
+
+    def _shifted_descriptors(self, image, point, size):
+        """头像位置附近多个偏移处的向量"""
+        w, h = size
+        shifts = range(-self.FACE_SHIFT, self.FACE_SHIFT + 1, self.FACE_SHIFT_STEP)
+        vectors = []
+        for dy in shifts:
+            for dx in shifts:
+                x, y = point[0] + dx, point[1] + dy
+                vectors.append(self.descriptor(crop(image, (x, y, x + w, y + h), copy=False)))
+        return np.stack(vectors)
+
+    def recognize(self, image, names=None, similarity=0.85):
+        """
+        识别当前页所有格子中的角色
+
+        Args:
+            image: 截图
+            names (list[str]): 只查找这些模板，None 表示全部
+            similarity (float): 模板匹配确认的阈值
+
+        Returns:
+            dict[str, tuple[float, Button]] | None: 名称 -> (相似度, 匹配位置的 Button)，
+                只包含确认通过的角色，未校准或无法确定网格时返回 None
+        """
+        if self.face_offset is None:
+            return None
+        image = np.asarray(image)
+        grid = self.locate(image)
+        if grid is None:
+            return None
+
+        candidates = np.arange(len(self.names)) if names is None \
+            else np.array([self.names.index(name) for name in names], dtype=int)
+        if not len(candidates):
+            return {}
+        descriptors = self.descriptors[candidates]
+        size = self.templates[self.names[0]].size
+        margin = self.VERIFY_MARGIN
+
+        result = {}
+        for fx, fy in self.cells(grid):
+            # 每个模板取各个偏移中的最高分
+            scores = (self._shifted_descriptors(image, (fx, fy), size) @ descriptors.T).max(axis=0)
+            window = crop(image, (fx - margin, fy - margin, fx + size[0] + margin, fy + size[1] + margin), copy=False)
+            for index in np.argsort(-scores)[:self.TOP_K]:
+                name = self.names[candidates[index]]
+                template = self.templates[name]
+                res = cv2.matchTemplate(window, template.image, cv2.TM_CCOEFF_NORMED)
+                _, sim, _, point = cv2.minMaxLoc(res)
+                if sim < similarity:
+                    continue
+                if name not in result or sim > result[name][0]:
+                    point = (fx - margin + point[0], fy - margin + point[1])
+                    result[name] = (sim, template._point_to_button(point, image=image, name=name))
+                break
+        return result
@@ -0,0 +1,257 @@
+"""
+角色头像感知哈希索引
+
+对每个角色模板计算 64 位感知哈希（默认 RGB 三个通道各一个 dHash），
+用 BK 树按汉明距离检索，找出最接近的 k 个候选，
+之后只需要对这几个候选做 matchTemplate，而不是遍历全部七百多个模板。
+
+哈希在 dev_tools/build_character_atlas.py 打包图集时计算并写入图集索引，
+运行时直接读取；图集不存在或过期时从模板重新计算。
+"""
+
+import cv2
+import numpy as np
+
+from module.base.template_atlas import template_atlas
+from module.logger import logger
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(gray):
+    """
+    差异哈希：缩小到 9x8，比较左右相邻像素
+
+    Args:
+        gray (np.ndarray): 单通道图像
+
+    Returns:
+        int: 64 位
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray):
+    """
+    感知哈希：缩小到 32x32 做 DCT，取左上 8x8 低频系数与中位数比较
+
+    Args:
+        gray (np.ndarray): 单通道图像
+
+    Returns:
+        int: 64 位
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficient = cv2.dct(small)[:8, :8].ravel()
+    # 直流分量只反映整体亮度，不参与中位数
+    return _bits_to_int(coefficient > np.median(coefficient[1:]))
+
+
+HASH_METHODS = {"dhash": dhash, "phash": phash}
+
+
+def image_hash(image, method="dhash", per_channel=True):
+    """
+    Args:
+        image (np.ndarray): RGB 图像
+        method (str): "dhash" 或 "phash"
+        per_channel (bool): True 时每个颜色通道各计算一个哈希，False 时只计算灰度图的哈希
+
+    Returns:
+        tuple[int]: 每个通道的哈希
+    """
+    func = HASH_METHODS[method]
+    if image.ndim == 2:
+        return (func(image),)
+    if per_channel:
+        return tuple(func(np.ascontiguousarray(image[:, :, index])) for index in range(3))
+    return (func(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)),)
+
+
+def hash_distance(a, b):
+    """
+    各通道汉明距离之和，满足三角不等式，可以用于 BK 树
+
+    Returns:
+        int:
+    """
+    return sum(bin(x ^ y).count("1") for x, y in zip(a, b))
+
+
+class BKTree:
+    """
+    按整数距离组织的 BK 树，节点: [键, 值列表, {到父节点的距离: 子节点}]
+    """
+
+    def __init__(self, distance=hash_distance):
+        """
+        Args:
+            distance (callable): 度量函数，需要满足三角不等式
+        """
+        self.distance = distance
+        self.root = None
+        self.size = 0
+        # 最近一次查询计算距离的次数，用于评估剪枝效果
+        self.visited = 0
+
+    def add(self, key, value):
+        """
+        Args:
+            key (tuple[int]): 哈希
+            value: 与哈希关联的值，相同哈希的值放在同一个节点
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [value], {}]
+            return
+        node = self.root
+        while True:
+            d = self.distance(key, node[0])
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, k=5, radius=None):
+        """
+        最近的 k 个值
+
+        Args:
+            key (tuple[int]): 查询的哈希
+            k (int): 返回数量
+            radius (int): 最大距离，None 表示不限制
+
+        Returns:
+            list[tuple[Any, int]]: [(值, 距离), ...]，按距离从小到大
+        """
+        self.visited = 0
+        if self.root is None:
+            return []
+        # 当前第 k 近的距离作为搜索半径，随着结果变好不断收紧
+        limit = float("inf") if radius is None else radius
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = self.distance(key, node[0])
+            self.visited += 1
+            if d <= limit:
+                found.extend((value, d) for value in node[1])
+                found.sort(key=lambda item: item[1])
+                del found[k:]
+                if len(found) >= k:
+                    limit = min(limit, found[-1][1])
+            # 三角不等式：子树中节点到查询的距离至少为 |d - 边长|
+            for edge, child in node[2].items():
+                if abs(d - edge) <= limit:
+                    stack.append(child)
+        return found
+
+
+class IconIndex:
+    """
+    角色头像索引
+    """
+
+    def __init__(self, templates, method="dhash", per_channel=True):
+        """
+        Args:
+            templates (dict[str, Template]): 名称 -> 头像模板
+            method (str): 哈希方法
+            per_channel (bool): 是否按颜色通道分别计算
+        """
+        self.templates = dict(templates)
+        self.method = method
+        self.per_channel = per_channel
+        self.key = f"{method}_rgb" if per_channel else method
+        self.tree = BKTree()
+        # uid -> 模板名称
+        self.uids = {}
+        computed = 0
+        for name, template in self.templates.items():
+            info = template_atlas.info(template.file) or {}
+            uid = info.get("uid", name)
+            self.uids[uid] = name
+            value = info.get(self.key)
+            # 图集中的哈希只在模板未修改时可信
+            if value is None or template_atlas.get(template.file) is None:
+                value = image_hash(template.image, method=method, per_channel=per_channel)
+                computed += 1
+            self.tree.add(tuple(value), uid)
+        if computed:
+            logger.info(f"Icon index: {computed}/{len(self.templates)} hashes computed at runtime")
+
+    def identify(self, image, k=5, radius=None):
+        """
+        Args:
+            image (np.ndarray): 头像截图，尺寸与模板相近
+            k (int): 返回候选数量
+            radius (int): 最大距离，None 表示不限制
+
+        Returns:
+            list[tuple[str, int]]: [(uid, 距离), ...]，按距离从小到大
+        """
+        key = image_hash(np.asarray(image), method=self.method, per_channel=self.per_channel)
+        return self.tree.search(key, k=k, radius=radius)
+
+    def match(self, image, k=5, similarity=0.85):
+        """
+        在候选中用模板匹配确认
+
+        Args:
+            image (np.ndarray): 头像截图，可以比模板稍大
+            k (int): 候选数量
+            similarity (float): 相似度阈值
+
+        Returns:
+            tuple[str, float] | None: (uid, 相似度)，没有超过阈值的候选时返回 None
+        """
+        image = np.asarray(image)
+        best = None
+        for uid, _ in self.identify(image, k=k):
+            template = self.templates[self.uids[uid]].image
+            if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+                continue
+            _, sim, _, _ = cv2.minMaxLoc(cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED))
+            if sim >= similarity and (best is None or sim > best[1]):
+                best = (uid, sim)
+        return best
+
+
+_icon_index = None
+
+
+def icon_index():
+    """
+    Returns:
+        IconIndex: 所有角色模板的索引，第一次调用时建立
+    """
+    global _icon_index
+    if _icon_index is None:
+        from module.base.template import Template
+        import module.character.assets as assets
+        templates = {
+            name: value for name, value in vars(assets).items()
+            if name.startswith("TEMPLATE_") and isinstance(value, Template)
+        }
+        _icon_index = IconIndex(templates)
+    return _icon_index
+
+
+def identify_icon(crop, k=5):
+    """
+    Args:
+        crop (np.ndarray): 头像截图
+        k (int): 返回候选数量
+
+    Returns:
+        list[tuple[str, int]]: [(uid, 距离), ...]，没有 uid 的手动模板以模板名称代替
+    """
+    return icon_index().identify(crop, k=k)
@@ -3,7 +3,10 @@
 """
 
 from module.logger import logger
+from module.base.decorator import cached_property
 from module.base.timer import Timer
+from module.base.template_bank import TemplateBank
+from module.character.grid import CharacterGrid
 from module.ui.scroll import Scroll
 from module.base.mask import Mask
 import numpy as np
@@ -19,6 +22,8 @@ class Selector:
 
     # 相似度阈值
     SIMILARITY_THRESHOLD = 0.85
+    # 按网格识别角色列表，网格用前几页全列表模板匹配的结果校准，找不到网格时回退到全列表模板匹配
+    USE_GRID = True
 
     def __init__(self, main, target_characters, clear_button_position=(706, 601)):
         """
@@ -66,6 +71,26 @@ class Selector:
             self.use_selected_mask = False
             logger.warning("已选区域遮罩不存在")
 
+        # 所有目标角色一起匹配，每张截图只计算一次
+        self.bank = TemplateBank(self.target_characters)
+
+    @cached_property
+    def list_area(self):
+        """角色列表的搜索区域，没有遮罩时为 None（全屏）"""
+        return self.mask_list.bounding_area() if self.use_mask else None
+
+    @cached_property
+    def character_grid(self):
+        """角色列表网格识别，需要列表遮罩确定可见区域"""
+        if not self.USE_GRID or self.list_area is None:
+            return None
+        return CharacterGrid(self.target_characters, self.list_area)
+
+    @cached_property
+    def selected_area(self):
+        """已选区域的搜索区域"""
+        return self.mask_selected.bounding_area() if self.use_selected_mask else None
+
     def _get_selected_area_image(self):
         """
         获取已选角色区域的截图
@@ -93,17 +118,17 @@ class Selector:
         matched_count = 0
         matched_names = []
 
-        # 逐个验证目标角色
-        for char_name, template in self.target_characters.items():
-            try:
-                # 在已选区域进行模板匹配
-                sim, button = template.match_result(selected_image)
+        # 在已选区域一次匹配所有目标角色
+        try:
+            results = self.bank.match_result(selected_image, area=self.selected_area)
+        except Exception as e:
+            logger.warning(f"验证已选角色时出错: {e}")
+            results = {}
 
-                if sim >= self.SIMILARITY_THRESHOLD:
-                    matched_count += 1
-                    matched_names.append(char_name)
-            except Exception as e:
-                logger.warning(f"验证 {char_name} 时出错: {e}")
+        for char_name, (sim, button) in results.items():
+            if sim >= self.SIMILARITY_THRESHOLD:
+                matched_count += 1
+                matched_names.append(char_name)
 
         # 判断是否全部正确
         is_correct = matched_count == len(self.target_characters)
@@ -194,17 +219,25 @@ class Selector:
             # 一次性检测所有目标角色
             all_matches = []
 
-            for char_name, template in self.target_characters.items():
-                if char_name in selected_names:
-                    continue
+            remaining = [name for name in self.target_characters if name not in selected_names]
+            try:
+                results = None
+                if self.character_grid is not None:
+                    results = self.character_grid.recognize(
+                        image, names=remaining, similarity=self.SIMILARITY_THRESHOLD
+                    )
+                if results is None:
+                    results = self.bank.match_result(image, names=remaining, area=self.list_area)
+                    if self.character_grid is not None:
+                        self.character_grid.calibrate(image, results, similarity=self.SIMILARITY_THRESHOLD)
+            except Exception as e:
+                logger.error(f"匹配角色出错: {e}")
+                results = {}
 
-                try:
-                    sim, button = template.match_result(image, name=char_name)
-                    if sim >= self.SIMILARITY_THRESHOLD:
-                        logger.info(f"找到 {char_name}: 相似度 {sim:.3f}")
-                        all_matches.append((char_name, button))
-                except Exception as e:
-                    logger.error(f"匹配 {char_name} 出错: {e}")
+            for char_name, (sim, button) in results.items():
+                if sim >= self.SIMILARITY_THRESHOLD:
+                    logger.info(f"找到 {char_name}: 相似度 {sim:.3f}")
+                    all_matches.append((char_name, button))
 
             # 批量点击
             for char_name, button in all_matches:
@@ -234,6 +267,9 @@ class Selector:
                     logger.warning(
                         f"仅找到 {selected_count}/{len(self.target_characters)} 个角色"
                     )
+                    # 网格可能漏掉了角色，下次重新校准
+                    if self.character_grid is not None:
+                        self.character_grid.reset()
                 break
 
             # 向上翻页
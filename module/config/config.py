@@ -65,6 +65,15 @@ class PriconneConfig(ConfigUpdater, GeneratedConfig, ConfigWatcher):
     BUTTON_OFFSET = 30
     WAIT_BEFORE_SAVING_SCREEN_SHOT = 1
 
+    # 模板匹配线程池 (module/base/match_executor.py)
+    MATCH_EXECUTOR_WORKERS = 0  # 线程数，0 表示 CPU 核心数，1 表示不使用线程池
+    OPENCV_THREADS = -1  # OpenCV 内部线程数，对整个进程生效，与线程池叠加超额订阅时再调小，-1 表示不修改
+
+    # OCR 模型的 torch 线程数 (module/ocr/torch_threads.py)，ONNX Runtime 的倒计时模型也使用 OCR_TORCH_THREADS
+    # 默认不修改，用 tests/test_ocr_thread_benchmark.py 测过后再按机器调整
+    OCR_TORCH_THREADS = 0  # intra-op 线程数，与截图、模板匹配线程分享核心，0 表示不修改
+    OCR_TORCH_INTEROP_THREADS = 0  # inter-op 线程数，只在第一次加载模型前生效，0 表示不修改
+
     # 截图保存配置
     SCREEN_SHOT_SAVE_INTERVAL = 1  # 截图保存间隔（秒）
     SCREEN_SHOT_SAVE_FOLDER = "./screenshot"  # 截图保存文件夹
@@ -76,6 +85,23 @@ class PriconneConfig(ConfigUpdater, GeneratedConfig, ConfigWatcher):
     DROIDCAST_FILEPATH_REMOTE = "/data/local/tmp/DroidCast_raw.apk"
     FORWARD_PORT_RANGE = (20000, 21000)  # ADB端口转发范围
 
+    # 截图方式自动选择 (Emulator_ScreenshotMethod = auto)，按实测耗时在 SCREENSHOT_AUTO_METHODS 中选择
+    # 从未成功过的方式失败时只记录一次，不会为它重连、安装或启动 DroidCast
+    SCREENSHOT_AUTO_BENCHMARK = False  # 第一次截图时逐个测速。关闭时与以前相同从 ADB 开始，靠定期试探切换
+    SCREENSHOT_AUTO_METHODS = ["NemuIpc", "DroidCast_raw", "ADB_raw", "ADB"]  # 参与选择的截图方式
+    SCREENSHOT_BENCHMARK_TOTAL = 10  # 启动测速时每种方式的截图次数
+    SCREENSHOT_BENCHMARK_BEST = 8  # 取最好的几次计算平均值
+    SCREENSHOT_PROBE_INTERVAL = 300  # 每隔多少秒试用一次其他截图方式，更快时切换
+    # 截图失败熔断，所有截图方式通用
+    SCREENSHOT_FAILURE_THRESHOLD = 3  # 连续失败多少次后熔断
+    SCREENSHOT_FAILURE_COOLDOWN = 60  # 熔断多少秒后再次尝试
+
+    # 战斗监控的异步截图 (module/device/async_screenshot.py)
+    BATTLE_CAPTURE_PROCESS = False  # 在子进程中截图并通过共享内存发布，截图不再占用主进程的 GIL
+
+    # ADB_raw 配置
+    ADB_RAW_STREAM = True  # 保持一个长期运行的 shell 会话连续截图，省去每帧建立会话的往返
+
     # MaaTouch 配置
     MAATOUCH_FILEPATH_LOCAL = "./bin/MaaTouch/maatouchsync"
     MAATOUCH_FILEPATH_REMOTE = "/data/local/tmp/maatouchsync"
@@ -3,65 +3,378 @@
 """
 
 import time
-from threading import Thread, Lock
+from threading import Thread, Lock, Condition
+
+import cv2
+import numpy as np
+
+from module.device.frame import NemuRgbaFrame, Rgb565Frame
+from module.device.method.droidcast import Rgb565Converter
+from module.device.method.droidcast_client import DroidCastRawClient
+
+
+class Frame:
+    """
+    环形缓冲区中的一帧
+
+    Attributes:
+        seq (int): 帧序号，从 1 开始单调递增
+        timestamp (float): 截图完成时间 (time.time())
+        cost (float): 截图耗时(秒)
+        image (np.ndarray): 完整截图，只截取裁剪区域时为 None
+        cropped (np.ndarray): 裁剪后的图像，未设置 crop_area 时与 image 相同
+    """
+
+    __slots__ = ("seq", "timestamp", "cost", "image", "cropped")
+
+    def __init__(self, seq=0, timestamp=0.0, cost=0.0, image=None, cropped=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.cost = cost
+        self.image = image
+        self.cropped = cropped
+
+    def copy(self):
+        """复制帧数据，返回的帧不再受槽位复用影响"""
+        cropped = self.cropped.copy() if self.cropped is not None else None
+        if self.cropped is self.image:
+            image = cropped
+        else:
+            image = self.image.copy() if self.image is not None else None
+        return Frame(self.seq, self.timestamp, self.cost, image, cropped)
+
+    def __repr__(self):
+        return f"Frame(seq={self.seq}, timestamp={self.timestamp:.3f})"
+
+
+class FrameRing:
+    """
+    固定大小的预分配帧环形缓冲区
+
+    所有槽位在收到第一帧时按帧尺寸一次性分配，之后截图线程只把数据写入
+    下一个槽位，不再分配内存。读取方按序号取帧，序号落后超过 size 的帧已被覆盖。
+    """
+
+    def __init__(self, size=4, crop_area=None):
+        """
+        Args:
+            size (int): 槽位数量，至少为 2
+            crop_area: 裁剪区域 (x1, y1, x2, y2)，None 表示不裁剪
+        """
+        self.size = max(int(size), 2)
+        self.crop_area = crop_area
+        self.slots = [Frame() for _ in range(self.size)]
+        self.latest_seq = 0
+        self._shape = None
+
+    def _allocate(self, image, cropped):
+        for slot in self.slots:
+            if image is None:
+                slot.image = None
+                slot.cropped = np.empty_like(cropped)
+            else:
+                slot.image = np.empty_like(image)
+                if self.crop_area:
+                    x1, y1, x2, y2 = self.crop_area
+                    slot.cropped = np.empty_like(image[y1:y2, x1:x2])
+                else:
+                    slot.cropped = slot.image
+            slot.seq = 0
+        self._shape = (
+            None if image is None else image.shape,
+            None if cropped is None else cropped.shape,
+        )
+
+    def write_slot(self, image=None, cropped=None):
+        """
+        把截图复制到下一个槽位，返回待发布的槽位。调用方需持锁后调用 publish()。
+
+        Args:
+            image (np.ndarray): 截图，可以是借用帧
+            cropped (np.ndarray): 只截取了裁剪区域时传入裁剪图，此时 image 为 None
+
+        Returns:
+            Frame:
+        """
+        shape = (
+            None if image is None else image.shape,
+            None if cropped is None else cropped.shape,
+        )
+        if self._shape != shape:
+            self._allocate(image, cropped)
+        slot = self.slots[(self.latest_seq + 1) % self.size]
+        # 先作废该槽位，读取方在写入期间不会拿到半帧
+        slot.seq = 0
+        if image is None:
+            np.copyto(slot.cropped, cropped)
+            return slot
+        np.copyto(slot.image, image)
+        if self.crop_area:
+            x1, y1, x2, y2 = self.crop_area
+            np.copyto(slot.cropped, image[y1:y2, x1:x2])
+        return slot
+
+    def publish(self, slot, timestamp, cost):
+        self.latest_seq += 1
+        slot.seq = self.latest_seq
+        slot.timestamp = timestamp
+        slot.cost = cost
+
+    def get(self, seq):
+        """
+        Args:
+            seq (int): 帧序号
+
+        Returns:
+            Frame | None: 槽位的视图，图像直接引用槽位的内存，序号等字段在取帧时固定。
+                该帧已被覆盖或尚未产生时返回 None
+        """
+        if seq <= 0:
+            return None
+        slot = self.slots[seq % self.size]
+        if slot.seq != seq:
+            return None
+        # 槽位对象会被复用，借出独立的 Frame，才能在之后用 is_valid() 比较序号
+        return Frame(slot.seq, slot.timestamp, slot.cost, slot.image, slot.cropped)
+
+    @property
+    def latest(self):
+        return self.get(self.latest_seq)
+
+    def is_valid(self, frame):
+        """检查借出的帧是否仍未被覆盖"""
+        if frame.seq <= 0:
+            return False
+        slot = self.slots[frame.seq % self.size]
+        # 重新分配槽位时旧的数组不再属于环形缓冲区
+        return slot.seq == frame.seq and slot.cropped is frame.cropped
+
+
+class FrameCursor:
+    """
+    消费者游标，每个消费者（OCR、结算检测、时间轴等）独立记录已处理到的帧序号
+    """
+
+    def __init__(self, source, name=None):
+        """
+        Args:
+            source (AsyncScreenshotBase):
+            name (str): 游标名称，用于调试
+        """
+        self.source = source
+        self.name = name
+        self.seq = 0
+        self.received = 0
+        self.skipped = 0  # 被跳过（处理不及时）的帧数
+
+    def next(self, timeout=None, copy=True):
+        """
+        获取比上次更新的一帧
+
+        Args:
+            timeout (float | None): 最长等待秒数，None 表示一直等待
+            copy (bool): 见 AsyncScreenshotBase.wait_for_frame
+
+        Returns:
+            Frame | None: 超时返回 None
+        """
+        frame = self.source.wait_for_frame(self.seq, timeout=timeout, copy=copy)
+        if frame is not None:
+            if self.seq:
+                self.skipped += frame.seq - self.seq - 1
+            self.seq = frame.seq
+            self.received += 1
+        return frame
+
+    def poll(self, copy=True):
+        """非阻塞获取新帧，没有新帧返回 None"""
+        return self.next(timeout=0, copy=copy)
+
+    def __repr__(self):
+        return (
+            f"FrameCursor({self.name}, seq={self.seq}, "
+            f"received={self.received}, skipped={self.skipped})"
+        )
 
 
 class AsyncScreenshotBase:
     """
     异步截图基类
-    子类实现 _capture_single() 返回完整截图 numpy 数组
+    子类实现 _capture_single() 返回完整截图 numpy 数组，
+    可选实现 _capture_area() 只转换裁剪区域的像素
+
+    截图写入预分配的环形缓冲区，每帧带有单调递增的序号和时间戳，
+    消费者通过 wait_for_frame() 或 cursor() 按序号取帧，不再依赖对象身份判断是否是新帧。
     """
 
-    def __init__(self, crop_area=None):
+    # 无人取帧超过该秒数后进入空闲模式
+    IDLE_TIMEOUT = 1.0
+    # 空闲模式下的截图间隔(秒)，有消费者取帧时立即唤醒
+    IDLE_INTERVAL = 0.5
+
+    def __init__(self, crop_area=None, ring_size=4, target_fps=30, full_frame=True):
         """
         Args:
             crop_area: 截图后裁剪区域 (x1, y1, x2, y2)，None 表示不裁剪
+            ring_size (int): 环形缓冲区槽位数
+            target_fps (int, float): 截图帧率上限，0 或 None 表示不限速
+            full_frame (bool): False 时只转换并保存裁剪区域，
+                Frame.image 为 None，get_full_image() 不可用。需要设置 crop_area
         """
         self.crop_area = crop_area
-        self.latest_image = None       # 完整截图
-        self.latest_cropped = None     # 裁剪后的图像
+        self.target_fps = target_fps
+        self.full_frame = full_frame or not crop_area
         self.screenshot_time = 0.0    # 上次截图耗时(秒)
+        self.ring = FrameRing(size=ring_size, crop_area=crop_area)
         self.lock = Lock()
+        self.condition = Condition(self.lock)
         self.running = False
         self.thread = None
+        self._last_demand = 0.0
 
     def start(self):
         """启动后台截图线程"""
         self.running = True
+        self._last_demand = time.time()
         self.thread = Thread(target=self._capture_loop, daemon=True)
         self.thread.start()
 
     def stop(self):
         """停止后台截图线程"""
         self.running = False
+        with self.condition:
+            self.condition.notify_all()
         if self.thread:
             self.thread.join(timeout=1)
 
     def _capture_single(self):
         """
         执行一次截图，返回完整图像。子类必须实现。
+        返回值会被立即复制进环形缓冲区，因此可以是借用帧。
 
         Returns:
             np.ndarray: BGR/RGB 图像
         """
         raise NotImplementedError
 
+    def _capture_area(self, area):
+        """
+        执行一次截图，只返回指定区域。子类可以覆盖为只转换该区域的像素。
+
+        Args:
+            area (tuple): (x1, y1, x2, y2)
+
+        Returns:
+            np.ndarray: BGR/RGB 图像
+        """
+        x1, y1, x2, y2 = area
+        return self._capture_single()[y1:y2, x1:x2]
+
+    @property
+    def is_idle(self):
+        """最近 IDLE_TIMEOUT 秒内没有消费者取帧"""
+        return time.time() - self._last_demand > self.IDLE_TIMEOUT
+
+    def _demand(self):
+        """记录消费需求，唤醒处于空闲模式的截图线程。调用方需持锁。"""
+        self._last_demand = time.time()
+        self.condition.notify_all()
+
+    def _pace(self, t0):
+        """
+        帧率控制，在两次截图之间休眠
+
+        Args:
+            t0 (float): 本次截图开始时间
+        """
+        if self.is_idle:
+            with self.condition:
+                if self.running and self.is_idle:
+                    self.condition.wait(timeout=self.IDLE_INTERVAL)
+            return
+        if self.target_fps:
+            remain = 1.0 / self.target_fps - (time.time() - t0)
+            if remain > 0:
+                time.sleep(remain)
+
     def _capture_loop(self):
         while self.running:
             t0 = time.time()
             try:
-                image = self._capture_single()
-                if self.crop_area:
-                    x1, y1, x2, y2 = self.crop_area
-                    cropped = image[y1:y2, x1:x2].copy()
+                if self.full_frame:
+                    slot = self.ring.write_slot(image=self._capture_single())
                 else:
-                    cropped = image
-                with self.lock:
-                    self.latest_image = image
-                    self.latest_cropped = cropped
-                    self.screenshot_time = time.time() - t0
+                    slot = self.ring.write_slot(cropped=self._capture_area(self.crop_area))
+                now = time.time()
+                with self.condition:
+                    self.ring.publish(slot, timestamp=now, cost=now - t0)
+                    self.screenshot_time = now - t0
+                    self.condition.notify_all()
             except Exception:
-                pass
+                # 截图失败时避免空转占满 CPU
+                time.sleep(0.05)
+                continue
+            self._pace(t0)
+
+    @property
+    def latest_seq(self):
+        """最新一帧的序号，尚无截图时为 0"""
+        return self.ring.latest_seq
+
+    def wait_for_frame(self, after_seq=0, timeout=None, copy=True):
+        """
+        等待序号大于 after_seq 的帧
+
+        Args:
+            after_seq (int): 已处理到的帧序号
+            timeout (float | None): 最长等待秒数，None 表示一直等待，0 表示不等待
+            copy (bool): True 返回复制后的帧；
+                False 返回环形缓冲区槽位本身（零拷贝），只能读取，
+                截图线程写满一圈后会覆盖，可用 is_valid() 检查
+
+        Returns:
+            Frame | None: 最新的一帧，超时或已停止时返回 None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            self._demand()
+            while self.ring.latest_seq <= after_seq:
+                if not self.running:
+                    return None
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remain = deadline - time.time()
+                    if remain <= 0:
+                        return None
+                    self.condition.wait(timeout=remain)
+            frame = self.ring.latest
+            if copy and frame is not None:
+                frame = frame.copy()
+            return frame
+
+    def is_valid(self, frame):
+        """
+        Args:
+            frame (Frame): wait_for_frame(copy=False) 返回的帧
+
+        Returns:
+            bool: 该帧是否还未被覆盖
+        """
+        with self.lock:
+            return self.ring.is_valid(frame)
+
+    def cursor(self, name=None):
+        """
+        创建独立的消费者游标
+
+        Args:
+            name (str): 游标名称
+
+        Returns:
+            FrameCursor:
+        """
+        return FrameCursor(self, name=name)
 
     def get_image(self):
         """
@@ -71,7 +384,11 @@ class AsyncScreenshotBase:
             (np.ndarray | None, float): (裁剪图像, 截图耗时)
         """
         with self.lock:
-            return self.latest_cropped, self.screenshot_time
+            self._demand()
+            frame = self.ring.latest
+            if frame is None:
+                return None, self.screenshot_time
+            return frame.cropped.copy(), self.screenshot_time
 
     def get_full_image(self):
         """
@@ -81,42 +398,86 @@ class AsyncScreenshotBase:
             np.ndarray | None
         """
         with self.lock:
-            return self.latest_image
+            self._demand()
+            frame = self.ring.latest
+            if frame is None or frame.image is None:
+                return None
+            return frame.image.copy()
 
 
 class AsyncScreenshotNemuIpc(AsyncScreenshotBase):
     """异步截图 - NemuIpc"""
 
-    def __init__(self, nemu_ipc, crop_area=None):
+    def __init__(self, nemu_ipc, crop_area=None, ring_size=4, target_fps=30, full_frame=True):
         """
         Args:
             nemu_ipc: NemuIpc 实例
             crop_area: 截图后裁剪区域 (x1, y1, x2, y2)
+            ring_size (int): 环形缓冲区槽位数
+            target_fps (int, float): 截图帧率上限
+            full_frame (bool): 是否转换完整截图
         """
-        super().__init__(crop_area=crop_area)
+        super().__init__(
+            crop_area=crop_area, ring_size=ring_size, target_fps=target_fps, full_frame=full_frame
+        )
         self.nemu_ipc = nemu_ipc
 
     def _capture_single(self):
-        return self.nemu_ipc.screenshot()
+        # 借用帧会被立即复制进环形缓冲区
+        return self.nemu_ipc.screenshot(borrow=True)
+
+    def _capture_area(self, area):
+        with self.nemu_ipc.lock:
+            rgba = self.nemu_ipc.capture_raw()
+            return NemuRgbaFrame(rgba, code=cv2.COLOR_RGBA2BGR).crop(area)
 
 
 class AsyncScreenshotDroidCast(AsyncScreenshotBase):
     """异步截图 - DroidCast"""
 
-    def __init__(self, device, crop_area=None):
+    def __init__(self, device, crop_area=None, ring_size=4, target_fps=30, full_frame=True):
         """
         Args:
             device: Device 实例
             crop_area: 截图后裁剪区域 (x1, y1, x2, y2)
+            ring_size (int): 环形缓冲区槽位数
+            target_fps (int, float): 截图帧率上限
+            full_frame (bool): 是否转换完整截图
         """
-        super().__init__(crop_area=crop_area)
+        super().__init__(
+            crop_area=crop_area, ring_size=ring_size, target_fps=target_fps, full_frame=full_frame
+        )
         self.device = device
+        # 独立的长连接，不与主线程的截图共用；连续截图时预取下一帧
+        self.client = DroidCastRawClient(timeout=3)
+        self._buffer = None
+        # 颜色转换复用中间缓冲区，转换结果写入 _image 后再复制进环形缓冲区
+        self.converter = Rgb565Converter()
+        self._image = None
+
+    def _capture_raw(self):
+        # 帧数据会被立即转换并复制进环形缓冲区，响应缓冲区可以复用
+        self._buffer = self.device.droidcast_raw_capture(
+            dst=self._buffer, client=self.client, prefetch=True
+        )
+        return self._buffer
 
     def _capture_single(self):
-        return self.device.screenshot_droidcast_raw()
+        self._image = self.converter.convert(self._capture_raw(), dst=self._image)
+        return self._image
+
+    def _capture_area(self, area):
+        return Rgb565Frame(self._capture_raw()).crop(area)
+
+    def stop(self):
+        super().stop()
+        self.client.close()
 
 
-def create_async_screenshot(device, mode="NemuIpc", crop_area=None):
+def create_async_screenshot(
+    device, mode="NemuIpc", crop_area=None, ring_size=4, target_fps=30, use_process=False,
+    full_frame=True,
+):
     """
     工厂函数：根据模式创建对应的异步截图实例。
 
@@ -124,14 +485,49 @@ def create_async_screenshot(device, mode="NemuIpc", crop_area=None):
         device: Device 实例（DroidCast 模式 | 获取 serial）
         mode (str): "NemuIpc" 或 "DroidCast"
         crop_area (tuple | None): 截图后裁剪区域 (x1, y1, x2, y2)
+        ring_size (int): 环形缓冲区槽位数
+        target_fps (int, float): 截图帧率上限，0 或 None 表示不限速
+        use_process (bool): 在子进程中截图，通过共享内存发布帧，
+            截图和颜色转换不再占用主进程的 GIL
+        full_frame (bool): False 时只转换裁剪区域的像素，Frame.image 为 None。
+            子进程模式下子进程也只转换并发布裁剪区域
 
     Returns:
         AsyncScreenshotBase 子类实例
     """
     if mode == "DroidCast":
         device.droidcast_init()
-        return AsyncScreenshotDroidCast(device, crop_area=crop_area)
+        if use_process:
+            from module.device.process_screenshot import AsyncScreenshotProcess
+            shape, rotate = device.droidcast_raw_shape()
+            height, width = (shape[1], shape[0]) if rotate else shape
+            return AsyncScreenshotProcess(
+                "DroidCast",
+                dict(url=device.droidcast_raw_url(), shape=shape, rotate=rotate),
+                shape=(height, width, 3),
+                crop_area=crop_area, ring_size=ring_size, target_fps=target_fps, full_frame=full_frame,
+            )
+        return AsyncScreenshotDroidCast(
+            device, crop_area=crop_area, ring_size=ring_size, target_fps=target_fps,
+            full_frame=full_frame,
+        )
     else:
         from module.device.method.nemu_ipc import get_nemu_ipc
         nemu = get_nemu_ipc(serial=device.serial)
-        return AsyncScreenshotNemuIpc(nemu, crop_area=crop_area)
+        if use_process:
+            from module.device.process_screenshot import AsyncScreenshotProcess
+            width, height = nemu.get_resolution()
+            return AsyncScreenshotProcess(
+                "NemuIpc",
+                dict(
+                    nemu_folder=nemu.nemu_folder,
+                    instance_id=nemu.instance_id,
+                    display_id=nemu.display_id,
+                ),
+                shape=(height, width, 3),
+                crop_area=crop_area, ring_size=ring_size, target_fps=target_fps, full_frame=full_frame,
+            )
+        return AsyncScreenshotNemuIpc(
+            nemu, crop_area=crop_area, ring_size=ring_size, target_fps=target_fps,
+            full_frame=full_frame,
+        )
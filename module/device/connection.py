@@ -155,6 +155,32 @@ class Connection(Adb):
             result = remove_shell_warning(result)
             return result
 
+    def adb_exec_out(self, cmd, timeout=10):
+        """
+        通过 exec 服务执行命令，等同于 adb exec-out
+
+        与 shell 服务不同，exec 的输出是原始字节流，不会转换换行符，
+        连接也可以双向使用（向 stdin 写入命令）。
+        Args:
+            cmd (list, str): 命令列表或字符串
+            timeout (int): 超时时间 (默认: 10)
+        Returns:
+            AdbConnection: 调用方负责关闭
+        """
+        if not isinstance(cmd, str):
+            cmd = " ".join(map(str, cmd))
+
+        stream = self.adb_client._connect(timeout=timeout)
+        try:
+            stream.send_command("host:transport:" + self.serial)
+            stream.check_okay()
+            stream.send_command("exec:" + cmd)
+            stream.check_okay()
+        except Exception:
+            stream.close()
+            raise
+        return stream
+
     def subprocess_run(self, cmd, timeout=10):
         """
         运行子进程命令
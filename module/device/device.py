@@ -5,6 +5,7 @@
 import collections
 from datetime import datetime
 
+from module.base.match_executor import match_executor
 from module.base.timer import Timer
 from module.device.control import Control
 from module.device.screenshot import Screenshot
@@ -16,6 +17,7 @@ from module.exception import (
     GameNotRunningError,
 )
 from module.logger import logger
+from module.ocr.torch_threads import torch_threads
 
 
 class Device(Control, Screenshot):
@@ -52,6 +54,16 @@ class Device(Control, Screenshot):
 
         logger.info("Device initialized successfully")
 
+        # 进程共享的模板匹配线程池和 torch 线程数，只在这里配置一次
+        match_executor.configure(
+            workers=getattr(config, "MATCH_EXECUTOR_WORKERS", 0),
+            cv2_threads=getattr(config, "OPENCV_THREADS", -1),
+        )
+        torch_threads.configure(
+            threads=getattr(config, "OCR_TORCH_THREADS", 0),
+            interop_threads=getattr(config, "OCR_TORCH_INTEROP_THREADS", 0),
+        )
+
         # 检查分辨率
         if not self._screen_size_checked:
             self.check_screen_size()
@@ -0,0 +1,406 @@
+"""
+截图原始帧 - 保留截图方式返回的原始数据，颜色转换按区域延迟执行
+
+大部分识别只关心屏幕上的几个小区域（按钮、倒计时等），
+整帧颜色转换的开销可以推迟到真正需要完整截图时再付出。
+"""
+
+import cv2
+import numpy as np
+
+from module.device.method.droidcast import rgb565_to_rgb888
+
+
+class RawFrame:
+    """
+    原始帧基类
+    子类实现 _convert_area() 把原始数据的一个子矩形转换为 RGB
+    """
+
+    # 原始数据是否上下颠倒存放
+    flipped = False
+
+    def __init__(self, width, height):
+        """
+        Args:
+            width (int): 转换后的图像宽度
+            height (int): 转换后的图像高度
+        """
+        self.width = width
+        self.height = height
+
+    @property
+    def shape(self):
+        """转换后的图像尺寸 (height, width, 3)"""
+        return self.height, self.width, 3
+
+    def _convert_area(self, x1, y1, x2, y2):
+        """
+        转换一个位于图像范围内的子矩形
+
+        Returns:
+            np.ndarray: RGB 图像，不引用原始数据
+        """
+        raise NotImplementedError
+
+    def raw(self):
+        """
+        Returns:
+            np.ndarray: 原始数据，前两维为 (height, width)
+        """
+        raise NotImplementedError
+
+    def crop(self, area):
+        """
+        只转换指定区域，超出屏幕的部分用 0 填充，与 module.base.utils.crop 一致
+
+        Args:
+            area: (upper_left_x, upper_left_y, bottom_right_x, bottom_right_y)
+
+        Returns:
+            np.ndarray: RGB 图像
+        """
+        x1, y1, x2, y2 = map(round, area)
+        cx1, cy1 = max(x1, 0), max(y1, 0)
+        cx2, cy2 = min(x2, self.width), min(y2, self.height)
+        if cx1 >= cx2 or cy1 >= cy2:
+            return np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+
+        image = self._convert_area(cx1, cy1, cx2, cy2)
+        top, bottom, left, right = cy1 - y1, y2 - cy2, cx1 - x1, x2 - cx2
+        if top or bottom or left or right:
+            image = cv2.copyMakeBorder(
+                image, top, bottom, left, right, borderType=cv2.BORDER_CONSTANT, value=(0, 0, 0)
+            )
+        return image
+
+    def convert(self):
+        """
+        转换整帧
+
+        Returns:
+            np.ndarray: RGB 图像
+        """
+        return self._convert_area(0, 0, self.width, self.height)
+
+
+class ImageFrame(RawFrame):
+    """已经解码好的图像，例如 ADB 截图"""
+
+    def __init__(self, image):
+        super().__init__(image.shape[1], image.shape[0])
+        self.image = image
+
+    def raw(self):
+        return self.image
+
+    def _convert_area(self, x1, y1, x2, y2):
+        return self.image[y1:y2, x1:x2].copy()
+
+    def convert(self):
+        return self.image
+
+
+class Rgb565Frame(RawFrame):
+    """DroidCast_raw 返回的 RGB565 位图"""
+
+    def __init__(self, arr, converter=None):
+        """
+        Args:
+            arr (np.ndarray): uint16 数组，形状 (height, width)，已旋转为横屏
+            converter (Rgb565Converter): 整帧转换时使用，复用中间缓冲区
+        """
+        super().__init__(arr.shape[1], arr.shape[0])
+        self.arr = arr
+        self.converter = converter
+
+    def raw(self):
+        return self.arr
+
+    def _convert_area(self, x1, y1, x2, y2):
+        # OpenCV 可以直接处理按行跨步的切片，不需要先复制
+        return rgb565_to_rgb888(self.arr[y1:y2, x1:x2])
+
+    def convert(self):
+        if self.converter is None:
+            return super().convert()
+        return self.converter.convert(self.arr)
+
+
+class RgbaFrame(RawFrame):
+    """4 通道原始图像，例如 ADB_raw 的 screencap 输出"""
+
+    def __init__(self, rgba, code=cv2.COLOR_RGBA2RGB):
+        """
+        Args:
+            rgba (np.ndarray): 4 通道图像，形状 (height, width, 4)
+            code (int): 转换为 3 通道的颜色转换代码
+        """
+        super().__init__(rgba.shape[1], rgba.shape[0])
+        self.rgba = rgba
+        self.code = code
+
+    def raw(self):
+        return self.rgba
+
+    def _convert_area(self, x1, y1, x2, y2):
+        return cv2.cvtColor(self.rgba[y1:y2, x1:x2], self.code)
+
+
+class NemuRgbaFrame(RgbaFrame):
+    """
+    NemuIpc 返回的倒置 RGBA 图像
+
+    异步截图使用 code=cv2.COLOR_RGBA2BGR
+    """
+
+    flipped = True
+
+    def _convert_area(self, x1, y1, x2, y2):
+        # 图像上下颠倒，第 y 行位于缓冲区的第 height - 1 - y 行
+        h = self.height
+        image = cv2.cvtColor(self.rgba[h - y2:h - y1, x1:x2], self.code)
+        cv2.flip(image, 0, dst=image)
+        return image
+
+
+class LazyImage:
+    """
+    延迟转换的完整截图，用作 device.image
+
+    按 TILE x TILE 分块，切片访问时只转换切片覆盖到的分块并写入预分配的缓冲区，
+    按钮检测、取色这类只读取小区域的操作不再需要整帧转换。
+    np.asarray() 或访问 ndarray 的其他属性时才整帧转换。
+
+    OpenCV 和 PIL 不接受非 ndarray 对象，需要整图时先调用 np.asarray(image)。
+    """
+
+    TILE = 64
+
+    def __init__(self, frame):
+        """
+        Args:
+            frame (RawFrame): 原始帧，全部分块转换完成后释放
+        """
+        self.frame = frame
+        self.shape = frame.shape
+        self.dtype = np.dtype(np.uint8)
+        self.ndim = 3
+        self.size = int(np.prod(self.shape))
+        self._buffer = None
+        h, w = self.shape[:2]
+        self._tiles = np.zeros(((h - 1) // self.TILE + 1, (w - 1) // self.TILE + 1), dtype=bool)
+
+    @property
+    def converted(self):
+        """是否已经整帧转换"""
+        return self.frame is None
+
+    def _convert_tiles(self, x1, y1, x2, y2):
+        """确保区域 [x1, x2) x [y1, y2) 覆盖的分块都已转换"""
+        if self.frame is None or x1 >= x2 or y1 >= y2:
+            return
+        if self._buffer is None:
+            self._buffer = np.empty(self.shape, dtype=np.uint8)
+
+        t = self.TILE
+        h, w = self.shape[:2]
+        tx1, tx2 = x1 // t, (x2 - 1) // t + 1
+        for ty in range(y1 // t, (y2 - 1) // t + 1):
+            missing = np.flatnonzero(~self._tiles[ty, tx1:tx2])
+            if not len(missing):
+                continue
+            # 同一行缺失的分块合并成一次转换
+            cx1 = (tx1 + missing[0]) * t
+            cx2 = min((tx1 + missing[-1] + 1) * t, w)
+            cy1, cy2 = ty * t, min((ty + 1) * t, h)
+            self._buffer[cy1:cy2, cx1:cx2] = self.frame._convert_area(cx1, cy1, cx2, cy2)
+            self._tiles[ty, tx1 + missing[0]:tx1 + missing[-1] + 1] = True
+
+        if self._tiles.all():
+            # 全部转换完成，释放原始数据
+            self.frame = None
+
+    def materialize(self):
+        """
+        整帧转换
+
+        Returns:
+            np.ndarray: RGB 图像
+        """
+        if self.frame is not None:
+            if self._buffer is None:
+                self._buffer = self.frame.convert()
+                if self._buffer.base is not None or not self._buffer.flags.writeable:
+                    self._buffer = self._buffer.copy()
+                self._tiles[:] = True
+                self.frame = None
+            else:
+                self._convert_tiles(0, 0, self.shape[1], self.shape[0])
+        return self._buffer
+
+    @staticmethod
+    def _index_range(index, length):
+        """
+        把一维索引转换为 [start, stop)，不支持的索引返回 None
+        """
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                return None
+            start, stop, _ = index.indices(length)
+            return start, max(start, stop)
+        if isinstance(index, (int, np.integer)):
+            index = int(index)
+            if index < 0:
+                index += length
+            return index, index + 1
+        return None
+
+    def __getitem__(self, key):
+        if self.frame is None:
+            return self._buffer[key]
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) <= 3 and all(k is not Ellipsis for k in key):
+            h, w = self.shape[:2]
+            rows = self._index_range(key[0], h)
+            cols = self._index_range(key[1], w) if len(key) > 1 else (0, w)
+            if rows is not None and cols is not None:
+                self._convert_tiles(cols[0], rows[0], cols[1], rows[1])
+                return self._buffer[key]
+        return self.materialize()[key]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        image = self.materialize()
+        if dtype is not None and dtype != image.dtype:
+            return image.astype(dtype)
+        if copy:
+            return image.copy()
+        return image
+
+    def copy(self):
+        return self.materialize().copy()
+
+    def __getattr__(self, name):
+        # 其他 ndarray 属性和方法 (astype, mean, tobytes ...) 在完整图像上执行
+        if name.startswith("_") or name == "frame":
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __repr__(self):
+        done = int(self._tiles.sum())
+        return f"LazyImage(shape={self.shape}, tiles={done}/{self._tiles.size})"
+
+
+class TileChangeDetector:
+    """
+    逐块检测相邻两帧的变化
+
+    直接逐字节比较原始帧数据（RGB565、RGBA 等，不做颜色转换）和上一帧的副本，
+    记录每个 TILE x TILE 分块最近一次发生变化时的帧序号。
+    识别结果以区域内分块的最大序号作为版本，区域没有变化时可以直接复用上一次的结果。
+    """
+
+    TILE = 64
+
+    def __init__(self):
+        # 已检测的帧数，每帧递增
+        self.seq = 0
+        # 每个分块最近一次变化时的 seq
+        self.versions = None
+        # 最近一帧中发生变化的分块
+        self.changed = None
+        self._previous = None
+        self._key = None
+
+    def reset(self):
+        """丢弃上一帧，下一帧视为全部变化"""
+        self._previous = None
+        self._key = None
+
+    def _tile_max(self, diff, length, axis):
+        """
+        沿 axis 按 TILE 分段取最大值
+
+        Args:
+            diff (np.ndarray): 二维数组
+            length (int): 该方向上的像素数，diff 在该方向上的长度是它的整数倍
+            axis (int): 0 或 1
+
+        Returns:
+            np.ndarray: 该方向上的长度变为分块数
+        """
+        t = self.TILE * (diff.shape[axis] // length)
+        full = diff.shape[axis] // t * t
+        if axis == 0:
+            parts = [diff[:full].reshape(-1, t, diff.shape[1]).max(axis=1)]
+            if full < diff.shape[0]:
+                parts.append(diff[full:].max(axis=0, keepdims=True))
+        else:
+            parts = [diff[:, :full].reshape(diff.shape[0], -1, t).max(axis=2)]
+            if full < diff.shape[1]:
+                parts.append(diff[:, full:].max(axis=1, keepdims=True))
+        return np.concatenate(parts, axis=axis) if len(parts) > 1 else parts[0]
+
+    def update(self, frame):
+        """
+        Args:
+            frame (RawFrame): 新截取的原始帧
+
+        Returns:
+            np.ndarray: bool 数组，形状 (分块行数, 分块列数)，本帧中发生变化的分块
+        """
+        self.seq += 1
+        h, w = frame.height, frame.width
+        # 按字节比较，统一成 (height, width * 每像素字节数) 的 uint8 数组
+        data = np.ascontiguousarray(frame.raw()).reshape(h, -1).view(np.uint8)
+        key = (type(frame), getattr(frame, "code", None), data.shape)
+
+        if self._previous is None or self._key != key:
+            t = self.TILE
+            shape = ((h - 1) // t + 1, (w - 1) // t + 1)
+            self.versions = np.full(shape, self.seq, dtype=np.int64)
+            self.changed = np.ones(shape, dtype=bool)
+            self._previous = data.copy()
+            self._key = key
+            return self.changed
+
+        diff = cv2.absdiff(data, self._previous)
+        if not cv2.countNonZero(diff):
+            # 画面完全没有变化，这是 UI 循环里最常见的情况
+            self.changed = np.zeros(self.versions.shape, dtype=bool)
+            return self.changed
+
+        if frame.flipped:
+            # 倒置的视图，按图像行的顺序分块
+            diff = diff[::-1]
+        diff = self._tile_max(self._tile_max(diff, h, axis=0), w, axis=1)
+        self.changed = diff > 0
+        self.versions[self.changed] = self.seq
+        np.copyto(self._previous, data)
+        return self.changed
+
+    def version(self, area):
+        """
+        Args:
+            area: (x1, y1, x2, y2)，超出屏幕的部分忽略
+
+        Returns:
+            int: 区域内分块最近一次变化时的 seq，区域为空时返回 0
+        """
+        if self.versions is None:
+            return 0
+        t = self.TILE
+        rows, cols = self.versions.shape
+        x1, y1, x2, y2 = map(int, area)
+        tx1, ty1 = max(x1 // t, 0), max(y1 // t, 0)
+        tx2, ty2 = min((x2 - 1) // t + 1, cols), min((y2 - 1) // t + 1, rows)
+        if tx1 >= tx2 or ty1 >= ty2:
+            return 0
+        return int(self.versions[ty1:ty2, tx1:tx2].max())
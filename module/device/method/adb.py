@@ -3,6 +3,7 @@ ADB 设备控制方法
 """
 
 import re
+import struct
 import time
 from functools import wraps
 import cv2
@@ -15,12 +16,23 @@ from module.device.method.utils import (
     RETRY_TRIES,
     handle_adb_error,
     handle_unknown_host_service,
+    recv_all,
+    recv_into,
     retry_sleep,
     remove_prefix,
 )
 from module.exception import RequestHumanTakeover
 from module.logger import logger
 
+# screencap 原始输出的像素格式 -> (每像素字节数, 转换为 RGB 的颜色代码)
+# https://developer.android.com/reference/android/graphics/PixelFormat
+SCREENCAP_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2RGB),  # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2RGB),  # RGBX_8888
+    4: (2, None),  # RGB_565
+    5: (4, cv2.COLOR_BGRA2RGB),  # BGRA_8888
+}
+
 
 def retry(func):
     """
@@ -114,6 +126,17 @@ class Adb:
         """
         raise NotImplementedError
 
+    def adb_exec_out(self, cmd, timeout=10):
+        """
+        执行 adb exec-out 命令
+        Args:
+            cmd (list, str): 命令
+            timeout (int): 超时时间
+        Returns:
+            AdbConnection: 原始字节流
+        """
+        raise NotImplementedError
+
     def adb_reconnect(self):
         """重新连接 ADB"""
         raise NotImplementedError
@@ -396,9 +419,147 @@ class Adb:
         Returns:
             np.ndarray: RGB格式的图像数组
         """
+        return self.screenshot_adb_once()
+
+    def screenshot_adb_once(self):
+        """
+        screenshot_adb() 的单次尝试，不重试也不重连，
+        失败处理交给 ScreenshotBackendManager
+        Returns:
+            np.ndarray: RGB格式的图像数组
+        """
         data = self.adb_shell(["screencap", "-p"], stream=True)
 
         if len(data) < 500:
             logger.warning(f"Unexpected screenshot: {data}")
 
         return self.__process_screenshot(data)
+
+    # ADB_raw: screencap 原始输出的头部长度，首次截图时根据数据长度确定
+    # 头部为 width, height, format (uint32)，Android 9 起多了 4 字节 colorspace
+    _screencap_header_size = 0
+    # 长期运行的 exec:sh 会话，每帧写入一条 screencap 命令
+    _screencap_stream = None
+
+    @staticmethod
+    def _screencap_parse_header(header):
+        """
+        Args:
+            header (bytes, bytearray): screencap 输出头部
+        Returns:
+            tuple: (width, height, format)
+        """
+        width, height, fmt = struct.unpack_from("<III", header)
+        if fmt not in SCREENCAP_FORMATS:
+            raise ImageTruncated(f"Unknown screencap pixel format: {fmt}")
+        return width, height, fmt
+
+    @staticmethod
+    def _screencap_buffer(dst, width, height, fmt):
+        """
+        按帧尺寸检查复用的缓冲区，不匹配时重新分配
+        Returns:
+            np.ndarray: RGBA 为 (height, width, 4) uint8，RGB565 为 (height, width) uint16
+        """
+        if SCREENCAP_FORMATS[fmt][0] == 4:
+            shape, dtype = (height, width, 4), np.uint8
+        else:
+            shape, dtype = (height, width), np.uint16
+        if dst is None or dst.shape != shape or dst.dtype != dtype:
+            dst = np.empty(shape, dtype=dtype)
+        return dst
+
+    def _screencap_raw_detect(self, dst=None):
+        """
+        首次截图，完整接收一次输出，由数据长度推算头部长度
+        Returns:
+            tuple: (np.ndarray, int) 像素数据和像素格式
+        """
+        stream = self.adb_exec_out(["screencap"])
+        try:
+            data = recv_all(stream)
+        finally:
+            stream.close()
+
+        if len(data) < 16:
+            logger.warning(f"Unexpected screenshot: {data}")
+            raise ImageTruncated(f"Screencap output too short: {len(data)}")
+        width, height, fmt = self._screencap_parse_header(data)
+        dst = self._screencap_buffer(dst, width, height, fmt)
+        header_size = len(data) - dst.nbytes
+        if header_size not in (12, 16):
+            raise ImageTruncated(
+                f"Unexpected screencap output size {len(data)} for {width}x{height} format={fmt}"
+            )
+
+        self._screencap_header_size = header_size
+        logger.attr("ScreencapRaw", f"{width}x{height}, format={fmt}, header={header_size}")
+        np.copyto(dst, np.frombuffer(data, dtype=dst.dtype, offset=header_size).reshape(dst.shape))
+        return dst, fmt
+
+    def _screencap_raw_read(self, stream, dst=None):
+        """
+        从流中读取一帧，像素数据直接写入 dst
+        Returns:
+            tuple: (np.ndarray, int) 像素数据和像素格式
+        """
+        header = bytearray(self._screencap_header_size)
+        recv_into(stream, memoryview(header))
+        width, height, fmt = self._screencap_parse_header(header)
+        dst = self._screencap_buffer(dst, width, height, fmt)
+        recv_into(stream, memoryview(dst).cast("B"))
+        return dst, fmt
+
+    def _screencap_raw_stream(self, dst=None):
+        """
+        通过长期运行的 shell 会话截图，省去每帧建立 ADB 会话的往返
+        """
+        if self._screencap_stream is None:
+            self._screencap_stream = self.adb_exec_out(["sh"])
+        try:
+            # stderr 和 stdout 共用同一个流，丢弃 stderr 以免混入像素数据
+            self._screencap_stream.conn.sendall(b"screencap 2>/dev/null\n")
+            return self._screencap_raw_read(self._screencap_stream, dst)
+        except Exception:
+            # 流中可能残留半帧数据，丢弃整个会话，下次重新建立
+            self.screencap_stream_close()
+            raise
+
+    def screencap_stream_close(self):
+        """关闭 ADB_raw 的长期 shell 会话"""
+        if self._screencap_stream is not None:
+            try:
+                self._screencap_stream.close()
+            except OSError:
+                pass
+            self._screencap_stream = None
+
+    @retry
+    def adb_raw_capture(self, dst=None):
+        """
+        使用 adb exec-out screencap 获取未压缩的原始帧，不经过 PNG 编解码
+        Args:
+            dst (np.ndarray): 复用的缓冲区，尺寸或格式不匹配时重新分配
+        Returns:
+            tuple: (np.ndarray, int) 像素数据和像素格式，见 SCREENCAP_FORMATS
+        """
+        return self.adb_raw_capture_once(dst)
+
+    def adb_raw_capture_once(self, dst=None):
+        """
+        adb_raw_capture() 的单次尝试，不重试也不重连
+        Args:
+            dst (np.ndarray): 复用的缓冲区，尺寸或格式不匹配时重新分配
+        Returns:
+            tuple: (np.ndarray, int) 像素数据和像素格式，见 SCREENCAP_FORMATS
+        """
+        if not self._screencap_header_size:
+            return self._screencap_raw_detect(dst)
+        if self.config.ADB_RAW_STREAM:
+            return self._screencap_raw_stream(dst)
+
+        stream = self.adb_exec_out(["screencap"])
+        try:
+            return self._screencap_raw_read(stream, dst)
+        finally:
+            stream.close()
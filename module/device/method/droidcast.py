@@ -13,6 +13,7 @@ from adbutils.errors import AdbError
 
 from module.base.decorator import cached_property, del_cached_property
 from module.base.timer import Timer
+from module.device.method.droidcast_client import DroidCastConnectionError, DroidCastRawClient
 from module.device.method.uiautomator_2 import ProcessInfo, Uiautomator2
 from module.device.method.utils import (
     ImageTruncated,
@@ -86,6 +87,7 @@ def retry(func):
             except (
                 requests.exceptions.ConnectionError,
                 requests.exceptions.ReadTimeout,
+                DroidCastConnectionError,
             ) as e:
                 logger.error(e)
 
@@ -119,6 +121,101 @@ def retry(func):
     return retry_wrapper
 
 
+def droidcast_raw_reshape(data, shape, rotate=False):
+    """
+    DroidCast_raw 返回的字节流 -> RGB565 数组
+
+    Args:
+        data (bytes, bytearray, memoryview): 响应内容
+        shape (tuple): (height, width)
+        rotate (bool): 是否需要旋转为横屏
+
+    Returns:
+        np.ndarray: uint16 数组
+
+    Raises:
+        ValueError: 数据长度与尺寸不符
+    """
+    arr = np.frombuffer(data, dtype=np.uint16)
+    arr = arr.reshape(shape)
+    if rotate:
+        # arr = cv2.rotate(arr, cv2.ROTATE_90_CLOCKWISE)
+        # A little bit faster?
+        arr = cv2.transpose(arr)
+        cv2.flip(arr, 1, dst=arr)
+    return arr
+
+
+def rgb565_to_rgb888(arr, dst=None, buffers=None):
+    """
+    RGB565 -> RGB888
+
+    Args:
+        arr (np.ndarray): uint16 数组，形状 (height, width)
+        dst (np.ndarray): 输出缓冲区，uint8 连续数组，形状 (height, width, 3)。None 表示分配新的数组
+        buffers (tuple): 中间结果缓冲区 (uint16 数组, uint8 数组 x4)，形状均为 (height, width)。
+            None 表示每次分配，连续截图时使用 Rgb565Converter 复用
+
+    Returns:
+        np.ndarray: RGB 图像，形状 (height, width, 3)
+    """
+    # Convert RGB565 to RGB888
+    # https://blog.csdn.net/happy08god/article/details/10516871
+
+    # The same as the code above but costs about 3~4ms instead of 10ms.
+    # Note that cv2.convertScaleAbs is 5x fast as cv2.multiply, cv2.add is 8x fast as cv2.convertScaleAbs
+    # Note that cv2.convertScaleAbs includes rounding
+    masked, r, g, b, m = buffers if buffers is not None else (None,) * 5
+
+    masked = cv2.bitwise_and(arr, 0b1111100000000000, dst=masked)
+    r = cv2.convertScaleAbs(masked, alpha=0.00390625, dst=r)
+    m = cv2.convertScaleAbs(r, alpha=0.03125, dst=m)
+    cv2.add(r, m, dst=r)
+
+    masked = cv2.bitwise_and(arr, 0b0000011111100000, dst=masked)
+    g = cv2.convertScaleAbs(masked, alpha=0.125, dst=g)
+    m = cv2.convertScaleAbs(g, alpha=0.015625, dst=m)
+    cv2.add(g, m, dst=g)
+
+    masked = cv2.bitwise_and(arr, 0b0000000000011111, dst=masked)
+    b = cv2.convertScaleAbs(masked, alpha=8, dst=b)
+    m = cv2.convertScaleAbs(b, alpha=0.03125, dst=m)
+    cv2.add(b, m, dst=b)
+
+    return cv2.merge([r, g, b], dst=dst)
+
+
+class Rgb565Converter:
+    """
+    复用中间缓冲区的 RGB565 -> RGB888 转换
+
+    整帧转换的耗时大部分花在为十几个中间数组分配新内存上（缺页），
+    连续转换同尺寸的帧时复用这些数组，输出也可以写入调用方提供的缓冲区。
+    一个实例同一时间只能被一个线程使用，DroidCast、异步截图和截图子进程各自持有实例。
+    """
+
+    def __init__(self):
+        self.buffers = None
+
+    def convert(self, arr, dst=None):
+        """
+        Args:
+            arr (np.ndarray): uint16 数组，形状 (height, width)
+            dst (np.ndarray): 输出缓冲区，形状不符时忽略。None 表示分配新的数组
+
+        Returns:
+            np.ndarray: RGB 图像，形状 (height, width, 3)
+        """
+        shape = arr.shape[:2]
+        if self.buffers is None or self.buffers[0].shape != shape:
+            self.buffers = (np.empty(shape, dtype=np.uint16),) + tuple(
+                np.empty(shape, dtype=np.uint8) for _ in range(4)
+            )
+        if dst is not None and (dst.shape != shape + (3,) or dst.dtype != np.uint8 or not dst.flags.c_contiguous):
+            dst = None
+        return rgb565_to_rgb888(arr, dst=dst, buffers=self.buffers)
+
+
 class DroidCast(Uiautomator2):
     """
     DroidCast截图实现
@@ -138,6 +235,11 @@ class DroidCast(Uiautomator2):
         self._droidcast_port = self.adb_forward("tcp:53516")
         return session
 
+    @cached_property
+    def droidcast_raw_client(self):
+        """DroidCast_raw 截图使用的长连接客户端"""
+        return DroidCastRawClient(timeout=3)
+
     def droidcast_url(self, url="/preview"):
         """
         生成DroidCast URL (PNG版本)
@@ -203,6 +305,8 @@ class DroidCast(Uiautomator2):
         logger.info(resp)
         del_cached_property(self, "droidcast_session")
         _ = self.droidcast_session
+        # 服务已重启，旧连接不再可用
+        self.droidcast_raw_client.close()
 
         if self.config.DROIDCAST_VERSION == "DroidCast":
             logger.attr("DroidCast", self.droidcast_url())
@@ -224,10 +328,13 @@ class DroidCast(Uiautomator2):
             self.droidcast_width, self.droidcast_height = w, h
             logger.info(f"Droidcast resolution: {(w, h)}")
 
-    @retry
-    def screenshot_droidcast_raw(self):
-        """使用DroidCast_raw获取RGB565格式截图"""
-        self.config.DROIDCAST_VERSION = "DroidCast_raw"
+    def droidcast_raw_shape(self):
+        """
+        DroidCast_raw 返回的位图尺寸
+
+        Returns:
+            tuple: ((height, width), rotate)，rotate 表示需要旋转为横屏
+        """
         shape = (720, 1280)
 
         if self.is_mumu_over_version_356:
@@ -237,23 +344,45 @@ class DroidCast(Uiautomator2):
                 shape = (self.droidcast_height, self.droidcast_width)
 
         rotate = self.is_mumu_over_version_356 and self.orientation == 1
+        return shape, rotate
+
+    @retry
+    def droidcast_raw_capture(self, dst=None, client=None, prefetch=False):
+        """
+        使用DroidCast_raw获取RGB565原始位图，不做颜色转换
 
-        image = self.droidcast_session.get(self.droidcast_raw_url(), timeout=3).content
+        Args:
+            dst (np.ndarray): 复用的缓冲区，通常是上一次返回的数组，None 表示分配新的缓冲区
+            client (DroidCastRawClient): 使用的客户端，默认为 self.droidcast_raw_client。
+                后台截图线程应使用自己的客户端
+            prefetch (bool): 读取完成后立即请求下一帧，见 DroidCastRawClient.get
+
+        Returns:
+            np.ndarray: uint16 数组，形状 (height, width)，已旋转为横屏。
+                未旋转时是 dst 的视图
+        """
+        return self.droidcast_raw_capture_once(dst=dst, client=client, prefetch=prefetch)
+
+    def droidcast_raw_capture_once(self, dst=None, client=None, prefetch=False):
+        """
+        droidcast_raw_capture() 的单次尝试，不重试，也不会安装或重启 DroidCast，
+        失败处理交给 ScreenshotBackendManager。参数同 droidcast_raw_capture()
+        """
+        self.config.DROIDCAST_VERSION = "DroidCast_raw"
+        shape, rotate = self.droidcast_raw_shape()
+        if client is None:
+            client = self.droidcast_raw_client
+
+        # 端口转发在创建 droidcast_session 时建立
+        _ = self.droidcast_session
+        image = client.get(self.droidcast_raw_url(), dst=dst, prefetch=prefetch)
         # DroidCast_raw returns a RGB565 bitmap
 
         try:
-            arr = np.frombuffer(image, dtype=np.uint16)
-            if rotate:
-                arr = arr.reshape(shape)
-                # arr = cv2.rotate(arr, cv2.ROTATE_90_CLOCKWISE)
-                # A little bit faster?
-                arr = cv2.transpose(arr)
-                cv2.flip(arr, 1, dst=arr)
-            else:
-                arr = arr.reshape(shape)
+            arr = droidcast_raw_reshape(image, shape, rotate)
         except ValueError as e:
             if len(image) < 500:
-                logger.warning(f"Unexpected screenshot: {image}")
+                logger.warning(f"Unexpected screenshot: {bytes(image)}")
             # Try to load as `DroidCast`
             image_test = np.frombuffer(image, np.uint8)
             if image_test is not None:
@@ -265,30 +394,20 @@ class DroidCast(Uiautomator2):
             # ValueError: cannot reshape array of size 0 into shape (720,1280)
             raise ImageTruncated(str(e))
 
-        # Convert RGB565 to RGB888
-        # https://blog.csdn.net/happy08god/article/details/10516871
-
-        # The same as the code above but costs about 3~4ms instead of 10ms.
-        # Note that cv2.convertScaleAbs is 5x fast as cv2.multiply, cv2.add is 8x fast as cv2.convertScaleAbs
-        # Note that cv2.convertScaleAbs includes rounding
-        r = cv2.bitwise_and(arr, 0b1111100000000000)
-        r = cv2.convertScaleAbs(r, alpha=0.00390625)
-        m = cv2.convertScaleAbs(r, alpha=0.03125)
-        cv2.add(r, m, dst=r)
-
-        g = cv2.bitwise_and(arr, 0b0000011111100000)
-        g = cv2.convertScaleAbs(g, alpha=0.125)
-        m = cv2.convertScaleAbs(g, alpha=0.015625, dst=m)
-        cv2.add(g, m, dst=g)
+        return arr
 
-        b = cv2.bitwise_and(arr, 0b0000000000011111)
-        b = cv2.convertScaleAbs(b, alpha=8)
-        m = cv2.convertScaleAbs(b, alpha=0.03125, dst=m)
-        cv2.add(b, m, dst=b)
+    @cached_property
+    def rgb565_converter(self):
+        """DroidCast_raw 颜色转换，复用中间缓冲区"""
+        return Rgb565Converter()
 
-        image = cv2.merge([r, g, b])
+    def screenshot_droidcast_raw(self):
+        """使用DroidCast_raw获取RGB565格式截图"""
+        return self.rgb565_converter.convert(self.droidcast_raw_capture())
 
-        return image
+    def screenshot_droidcast_raw_once(self):
+        """screenshot_droidcast_raw() 的单次尝试"""
+        return self.rgb565_converter.convert(self.droidcast_raw_capture_once())
 
     def droidcast_wait_startup(self):
         """等待DroidCast服务启动完成"""
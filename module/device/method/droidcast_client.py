@@ -0,0 +1,211 @@
+"""
+DroidCast_raw 专用 HTTP 客户端
+
+requests 每帧都要构造请求对象、把响应体拼成新的 bytes，
+这里直接在 socket 上收发 HTTP/1.1：
+- 保持长连接
+- 响应体用 readinto 直接写入调用方提供的缓冲区
+- 可选预取：读完当前帧后立即发出下一帧的请求，服务端截图和本地颜色转换并行
+"""
+
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class DroidCastConnectionError(Exception):
+    """DroidCast 连接失败或响应异常"""
+
+    pass
+
+
+class DroidCastRawClient:
+    """
+    DroidCast_raw HTTP 客户端，线程安全，但预取只适合单一消费者连续截图的场景
+    """
+
+    def __init__(self, timeout=3, prefetch_max_age=0.1):
+        """
+        Args:
+            timeout (int, float): socket 超时时间(秒)
+            prefetch_max_age (float): 预取请求发出超过该秒数后视为过期，丢弃并重新请求
+        """
+        self.timeout = timeout
+        self.prefetch_max_age = prefetch_max_age
+        self.lock = threading.Lock()
+        self.sock = None
+        self.reader = None
+        self.address = None
+        # 已发出但还未读取响应的请求 (url, 发出时间)
+        self._pending = None
+
+    def connect(self, address):
+        """
+        Args:
+            address (tuple): (host, port)
+        """
+        self.close()
+        try:
+            self.sock = socket.create_connection(address, timeout=self.timeout)
+        except OSError as e:
+            raise DroidCastConnectionError(f"Failed to connect {address}: {e}")
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        self.address = address
+
+    def close(self):
+        """关闭连接，未读取的预取响应一并丢弃"""
+        self._pending = None
+        if self.reader is not None:
+            try:
+                self.reader.close()
+            except OSError:
+                pass
+            self.reader = None
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        self.address = None
+
+    def _send(self, url):
+        parts = urlsplit(url)
+        address = (parts.hostname, parts.port or 80)
+        if self.sock is None or self.address != address:
+            self.connect(address)
+
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Connection: keep-alive\r\n"
+            f"\r\n"
+        )
+        self.sock.sendall(request.encode("ascii"))
+        self._pending = (url, time.time())
+
+    def _read_headers(self):
+        """
+        Returns:
+            tuple: (status, headers)，headers 的键为小写
+        """
+        line = self.reader.readline()
+        if not line:
+            raise DroidCastConnectionError("Remote end closed connection without response")
+        try:
+            status = int(line.split(None, 2)[1])
+        except (IndexError, ValueError):
+            raise DroidCastConnectionError(f"Invalid status line: {line[:100]}")
+
+        headers = {}
+        while True:
+            line = self.reader.readline()
+            if not line:
+                raise DroidCastConnectionError("Connection closed while reading headers")
+            if line in (b"\r\n", b"\n"):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        return status, headers
+
+    def _read_into(self, view):
+        """从连接中读取数据直到填满 view"""
+        received = 0
+        total = len(view)
+        while received < total:
+            n = self.reader.readinto(view[received:])
+            if not n:
+                raise DroidCastConnectionError(f"Connection closed after receiving {received}/{total} bytes")
+            received += n
+
+    def _read_response(self, dst=None):
+        """
+        读取一个响应，响应体写入 dst
+
+        Args:
+            dst: 支持缓冲区协议的可写对象 (np.ndarray, bytearray)，长度不足或为 None 时重新分配
+
+        Returns:
+            memoryview: 响应体，底层对象可以通过 .obj 取得
+        """
+        self._pending = None
+        status, headers = self._read_headers()
+
+        length = headers.get("content-length")
+        if length is None:
+            # 没有 Content-Length 时读到连接关闭为止
+            body = self.reader.read()
+            self.close()
+            view = memoryview(bytearray(body))
+        else:
+            length = int(length)
+            view = memoryview(dst).cast("B") if dst is not None else None
+            if view is None or view.readonly or len(view) < length:
+                view = memoryview(bytearray(length))
+            view = view[:length]
+            self._read_into(view)
+            if headers.get("connection", "").lower() == "close":
+                self.close()
+
+        if status != 200:
+            raise DroidCastConnectionError(f"HTTP {status}: {bytes(view[:100])}")
+        return view
+
+    def get(self, url, dst=None, prefetch=False):
+        """
+        请求一帧
+
+        Args:
+            url (str): DroidCast_raw 截图地址
+            dst: 响应体写入的缓冲区 (np.ndarray, bytearray)，None 表示分配新的缓冲区
+            prefetch (bool): 读取完成后立即发出下一帧的请求。
+                下一次调用拿到的是这次预取的帧，只在连续截图时使用
+
+        Returns:
+            memoryview: 响应体
+
+        Raises:
+            DroidCastConnectionError:
+        """
+        with self.lock:
+            # 复用的长连接可能已经被服务端在空闲时关闭，第一次请求才会发现
+            reused = self.sock is not None
+            try:
+                return self._request(url, dst, prefetch)
+            except (OSError, DroidCastConnectionError) as e:
+                self.close()
+                if not reused:
+                    if isinstance(e, OSError):
+                        raise DroidCastConnectionError(str(e))
+                    raise
+            # 重新连接后再发一次，新连接也失败时才抛出异常
+            try:
+                return self._request(url, dst, prefetch)
+            except OSError as e:
+                # 包括 socket.timeout 和连接重置
+                self.close()
+                raise DroidCastConnectionError(str(e))
+            except DroidCastConnectionError:
+                self.close()
+                raise
+
+    def _request(self, url, dst=None, prefetch=False):
+        """
+        在当前连接上请求一帧，参数同 get()，调用方需持锁
+        """
+        if self._pending is not None:
+            pending_url, sent = self._pending
+            if pending_url != url or time.time() - sent > self.prefetch_max_age:
+                # 预取的帧已过期，读取后丢弃
+                self._read_response(dst)
+        if self._pending is None:
+            self._send(url)
+        body = self._read_response(dst)
+        if prefetch and self.sock is not None:
+            self._send(url)
+        return body
@@ -7,6 +7,7 @@ import ctypes
 import os
 import sys
 import contextlib
+import threading
 
 import cv2
 import numpy as np
@@ -207,6 +208,15 @@ class NemuIpcImpl:
         self.width = 0
         self.height = 0
 
+        # 每个连接复用的帧缓冲区，分辨率变化时重建
+        self._pixels = None  # ctypes RGBA 缓冲区，DLL 直接写入
+        self._pixels_pointer = None
+        self._rgba = None  # _pixels 的 numpy 视图 (倒置的 RGBA)
+        self._rgb = None  # 复用的 RGB 输出缓冲区
+        self._bgr = None  # 复用的 BGR 输出缓冲区
+        # 异步截图线程和主线程共用同一个实例，截图和转换期间持有该锁，避免缓冲区被交叉写入
+        self.lock = threading.RLock()
+
     def connect(self):
         """连接到模拟器"""
         if self.connect_id > 0:
@@ -237,6 +247,7 @@ class NemuIpcImpl:
         self.lib.nemu_disconnect(self.connect_id)
         logger.info(f"NemuIpc 已断开: connect_id={self.connect_id}")
         self.connect_id = 0
+        self.release_buffers()
 
     def reconnect(self):
         """重新连接"""
@@ -262,44 +273,120 @@ class NemuIpcImpl:
         self.height = height_ptr.contents.value
         return self.width, self.height
 
-    def screenshot(self) -> np.ndarray:
+    def _ensure_buffers(self):
         """
-        截图
+        按当前分辨率分配复用的帧缓冲区
 
-        Returns:
-            np.ndarray: BGR 格式图像
+        RGBA 缓冲区由 ctypes 分配，地址固定，DLL 每帧直接写入同一块内存，
+        numpy 视图和输出缓冲区只在分辨率变化时重建。
         """
-        if self.connect_id == 0:
-            self.connect()
-        if self.width == 0 or self.height == 0:
-            self.get_resolution()
+        shape = (self.height, self.width)
+        if self._rgba is not None and self._rgba.shape[:2] == shape:
+            return
 
-        width_ptr = ctypes.pointer(ctypes.c_int(self.width))
-        height_ptr = ctypes.pointer(ctypes.c_int(self.height))
         length = self.width * self.height * 4  # RGBA
-        pixels_pointer = ctypes.pointer((ctypes.c_ubyte * length)())
-
-        # 抑制 DLL 的 "screencap fail" 输出
-        with suppress_stderr():
-            self.lib.nemu_capture_display(
-                self.connect_id,
-                self.display_id,
-                length,
-                width_ptr,
-                height_ptr,
-                pixels_pointer,
-            )
-
-        # 转换为 numpy 数组
-        image = np.ctypeslib.as_array(pixels_pointer.contents).reshape(
+        self._pixels = (ctypes.c_ubyte * length)()
+        self._pixels_pointer = ctypes.pointer(self._pixels)
+        self._rgba = np.ctypeslib.as_array(self._pixels).reshape(
             (self.height, self.width, 4)
         )
+        self._rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._bgr = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        logger.info(f"NemuIpc 帧缓冲区: {self.width}x{self.height}")
+
+    def release_buffers(self):
+        """释放帧缓冲区，之前借出的帧不再保证有效"""
+        self._pixels = None
+        self._pixels_pointer = None
+        self._rgba = None
+        self._rgb = None
+        self._bgr = None
+
+    def capture_raw(self, dst=None) -> np.ndarray:
+        """
+        截取一帧 RGBA 原始数据
+
+        Args:
+            dst (np.ndarray): 调用方提供的 uint8 缓冲区，形状 (height, width, 4)，
+                None 表示写入复用的内部缓冲区
 
-        # RGBA -> BGR，并垂直翻转
-        image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
-        cv2.flip(image, 0, dst=image)
+        Returns:
+            np.ndarray: 倒置的 RGBA 图像。写入内部缓冲区时是其视图，下一次截图会覆盖，
+                调用方需要在持有 self.lock 期间使用
+        """
+        with self.lock:
+            if self.connect_id == 0:
+                self.connect()
+            if self.width == 0 or self.height == 0:
+                self.get_resolution()
+            self._ensure_buffers()
+
+            if dst is None:
+                dst = self._rgba
+                pointer = self._pixels_pointer
+            else:
+                if dst.shape != self._rgba.shape or not dst.flags["C_CONTIGUOUS"]:
+                    raise NemuIpcError(f"Invalid capture buffer: {dst.shape}, expected {self._rgba.shape}")
+                pointer = dst.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
+
+            width_ptr = ctypes.pointer(ctypes.c_int(self.width))
+            height_ptr = ctypes.pointer(ctypes.c_int(self.height))
+
+            # 抑制 DLL 的 "screencap fail" 输出
+            with suppress_stderr():
+                self.lib.nemu_capture_display(
+                    self.connect_id,
+                    self.display_id,
+                    dst.nbytes,
+                    width_ptr,
+                    height_ptr,
+                    pointer,
+                )
 
-        return image
+            return dst
+
+    def _convert(self, code, dst):
+        """
+        RGBA 缓冲区 -> 3 通道输出，并垂直翻转
+
+        颜色转换直接写入 dst，翻转在 dst 上原地进行，全程不分配新数组。
+        （把倒置视图 rgba[::-1] 传给 cvtColor 会让 OpenCV 先复制一份，反而更慢）
+        """
+        cv2.cvtColor(self._rgba, code, dst=dst)
+        cv2.flip(dst, 0, dst=dst)
+        return dst
+
+    def screenshot(self, borrow=False) -> np.ndarray:
+        """
+        截图
+
+        Args:
+            borrow (bool): True 时返回复用的内部缓冲区（借用帧），
+                下一次截图会覆盖其内容，调用方只能读取且不能跨帧持有。
+
+        Returns:
+            np.ndarray: BGR 格式图像
+        """
+        with self.lock:
+            self.capture_raw()
+            dst = self._bgr if borrow else np.empty_like(self._bgr)
+            return self._convert(cv2.COLOR_RGBA2BGR, dst)
+
+    def screenshot_rgb(self, borrow=False) -> np.ndarray:
+        """
+        截图，直接输出 RGB，省去 BGR -> RGB 的二次转换
+
+        Args:
+            borrow (bool): True 时返回复用的内部缓冲区（借用帧），
+                下一次截图会覆盖其内容，调用方只能读取且不能跨帧持有。
+
+        Returns:
+            np.ndarray: RGB 格式图像
+        """
+        with self.lock:
+            self.capture_raw()
+            dst = self._rgb if borrow else np.empty_like(self._rgb)
+            return self._convert(cv2.COLOR_RGBA2RGB, dst)
 
     def __enter__(self):
         self.connect()
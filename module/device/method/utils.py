@@ -123,6 +123,31 @@ def recv_all(stream, chunk_size=4096, recv_interval=0.000):
     return b"".join(fragments)
 
 
+def recv_into(stream, view):
+    """
+    从流中接收数据直到填满 view，数据直接写入调用方的缓冲区
+    Args:
+        stream: 数据流对象 (AdbConnection 或 socket)
+        view (memoryview): 字节视图
+    Returns:
+        int: 接收到的字节数
+    Raises:
+        ImageTruncated: 填满之前连接已关闭
+    """
+    if isinstance(stream, AdbConnection):
+        stream = stream.conn
+
+    total = len(view)
+    received = 0
+    while received < total:
+        n = stream.recv_into(view[received:])
+        if not n:
+            raise ImageTruncated(f"Connection closed after receiving {received}/{total} bytes")
+        received += n
+
+    return received
+
+
 def possible_reasons(*args):
     """
     打印可能的失败原因
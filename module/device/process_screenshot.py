@@ -0,0 +1,420 @@
+"""
+多进程异步截图 - 在子进程中截图，通过共享内存环形缓冲区发布帧
+
+截图和颜色转换在子进程执行，不再与主进程的 OCR、监控循环争抢 GIL。
+主进程直接读取共享内存中的帧（零拷贝），接口与 AsyncScreenshotBase 一致。
+"""
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from module.device.async_screenshot import AsyncScreenshotBase, Frame
+from module.device.frame import NemuRgbaFrame, Rgb565Frame
+from module.logger import logger
+
+# 共享头部布局（float64）
+_LATEST_SEQ = 0
+_RUNNING = 1
+_LAST_DEMAND = 2
+_SCREENSHOT_TIME = 3
+_HEADER_FIXED = 4
+# 每个槽位: seq, timestamp, cost
+_SLOT_FIELDS = 3
+
+
+class SharedFrameRing:
+    """
+    共享内存中的帧环形缓冲区，主进程和子进程各自 attach 同一块内存
+
+    内存布局: [头部 float64 数组][槽位 0 图像][槽位 1 图像]...
+    写入方先把槽位 seq 清零，写完图像后再设置 seq 并更新 latest_seq，
+    读取方通过槽位 seq 判断帧是否完整、是否已被覆盖。
+    """
+
+    def __init__(self, shape, size=4, name=None, create=False):
+        """
+        Args:
+            shape (tuple): 帧尺寸 (height, width, channel)
+            size (int): 槽位数量
+            name (str): 共享内存名称，attach 已有内存时必须提供
+            create (bool): 是否创建新的共享内存
+        """
+        self.shape = tuple(shape)
+        self.size = max(int(size), 2)
+        self.frame_bytes = int(np.prod(self.shape))
+        header_len = _HEADER_FIXED + _SLOT_FIELDS * self.size
+        self.header_bytes = header_len * 8
+        total = self.header_bytes + self.frame_bytes * self.size
+
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=total if create else 0)
+        self.header = np.ndarray((header_len,), dtype=np.float64, buffer=self.shm.buf)
+        self.slots = [
+            np.ndarray(
+                self.shape,
+                dtype=np.uint8,
+                buffer=self.shm.buf,
+                offset=self.header_bytes + i * self.frame_bytes,
+            )
+            for i in range(self.size)
+        ]
+        if create:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _slot_field(self, index, field):
+        return _HEADER_FIXED + index * _SLOT_FIELDS + field
+
+    @property
+    def latest_seq(self):
+        return int(self.header[_LATEST_SEQ])
+
+    def slot_seq(self, index):
+        return int(self.header[self._slot_field(index, 0)])
+
+    def write(self, image, timestamp, cost):
+        """
+        子进程写入一帧
+
+        Args:
+            image (np.ndarray): 截图，可以是借用帧
+            timestamp (float):
+            cost (float):
+
+        Returns:
+            int: 帧序号
+        """
+        seq = self.latest_seq + 1
+        index = seq % self.size
+        self.header[self._slot_field(index, 0)] = 0
+        np.copyto(self.slots[index], image)
+        self.header[self._slot_field(index, 1)] = timestamp
+        self.header[self._slot_field(index, 2)] = cost
+        self.header[self._slot_field(index, 0)] = seq
+        self.header[_SCREENSHOT_TIME] = cost
+        self.header[_LATEST_SEQ] = seq
+        return seq
+
+    def get(self, seq, crop_area=None, full_frame=True):
+        """
+        Args:
+            seq (int): 帧序号
+            crop_area: 裁剪区域，裁剪结果是共享内存的视图
+            full_frame (bool): False 时槽位中只有子进程裁剪好的区域，Frame.image 为 None
+
+        Returns:
+            Frame | None: 该帧已被覆盖或尚未产生时返回 None
+        """
+        if seq <= 0:
+            return None
+        index = seq % self.size
+        if self.slot_seq(index) != seq:
+            return None
+        image = self.slots[index]
+        if not full_frame:
+            image, cropped = None, image
+        elif crop_area:
+            x1, y1, x2, y2 = crop_area
+            cropped = image[y1:y2, x1:x2]
+        else:
+            cropped = image
+        return Frame(
+            seq=seq,
+            timestamp=float(self.header[self._slot_field(index, 1)]),
+            cost=float(self.header[self._slot_field(index, 2)]),
+            image=image,
+            cropped=cropped,
+        )
+
+    def is_valid(self, frame):
+        return self.slot_seq(frame.seq % self.size) == frame.seq
+
+    def close(self):
+        """解除映射，仍有外部视图引用时交给 GC 处理"""
+        self.header = None
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning("Shared frame ring still referenced, leave it to GC")
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _create_capture(backend, kwargs, area=None):
+    """
+    在子进程中创建截图函数
+
+    Args:
+        backend (str): "NemuIpc" 或 "DroidCast"
+        kwargs (dict): 截图参数
+        area (tuple): 只转换这个区域 (x1, y1, x2, y2)，None 表示完整截图
+
+    Returns:
+        callable: 无参数，返回完整截图或 area 区域
+    """
+    if backend == "DroidCast":
+        from module.device.method.droidcast import Rgb565Converter, droidcast_raw_reshape
+        from module.device.method.droidcast_client import DroidCastRawClient
+
+        client = DroidCastRawClient(timeout=3)
+        url, shape, rotate = kwargs["url"], kwargs["shape"], kwargs["rotate"]
+        converter = Rgb565Converter()
+        buffer = bytearray()
+        image = None
+
+        def capture():
+            nonlocal buffer, image
+            # 连续截图，预取下一帧；响应体和转换结果都写入复用的缓冲区，随后被复制进共享内存
+            data = client.get(url, dst=buffer, prefetch=True)
+            buffer = data.obj
+            arr = droidcast_raw_reshape(data, shape, rotate)
+            if area is not None:
+                return Rgb565Frame(arr).crop(area)
+            image = converter.convert(arr, dst=image)
+            return image
+
+        return capture
+    else:
+        from module.device.method.nemu_ipc import NemuIpcImpl
+
+        nemu = NemuIpcImpl(kwargs["nemu_folder"], kwargs["instance_id"], kwargs.get("display_id", 0))
+        nemu.connect()
+
+        def capture():
+            if area is not None:
+                with nemu.lock:
+                    return NemuRgbaFrame(nemu.capture_raw(), code=cv2.COLOR_RGBA2BGR).crop(area)
+            # 借用帧会被立即复制进共享内存
+            return nemu.screenshot(borrow=True)
+
+        return capture
+
+
+def capture_worker(name, shape, size, target_fps, idle_timeout, idle_interval, backend, kwargs, condition, area=None):
+    """
+    子进程入口，持续截图并写入共享内存
+
+    Args:
+        name (str): 共享内存名称
+        shape (tuple): 槽位尺寸，只截取 area 时为区域的尺寸
+        size (int): 槽位数量
+        target_fps (int, float): 截图帧率上限
+        idle_timeout (float): 无人取帧超过该秒数后进入空闲模式
+        idle_interval (float): 空闲模式下的截图间隔
+        backend (str): 截图方式
+        kwargs (dict): 截图参数
+        condition (multiprocessing.Condition): 新帧通知
+        area (tuple): 只转换并发布这个区域，None 表示完整截图
+    """
+    ring = SharedFrameRing(shape, size=size, name=name)
+    try:
+        capture = _create_capture(backend, kwargs, area=area)
+    except Exception as e:
+        logger.error(f"Capture worker init failed: {e}")
+        ring.header[_RUNNING] = 0
+        ring.close()
+        return
+
+    error_logged = False
+    while ring.header[_RUNNING]:
+        t0 = time.time()
+        try:
+            image = capture()
+            if image.shape != ring.shape:
+                raise ValueError(f"Frame shape {image.shape} != {ring.shape}")
+            now = time.time()
+            ring.write(image, timestamp=now, cost=now - t0)
+            with condition:
+                condition.notify_all()
+            error_logged = False
+        except Exception as e:
+            if not error_logged:
+                logger.warning(f"Capture worker: {e}")
+                error_logged = True
+            time.sleep(0.05)
+            continue
+
+        # 帧率控制
+        if time.time() - ring.header[_LAST_DEMAND] > idle_timeout:
+            with condition:
+                condition.wait(timeout=idle_interval)
+        elif target_fps:
+            remain = 1.0 / target_fps - (time.time() - t0)
+            if remain > 0:
+                time.sleep(remain)
+
+    ring.close()
+
+
+class AsyncScreenshotProcess(AsyncScreenshotBase):
+    """
+    异步截图 - 子进程 + 共享内存
+
+    wait_for_frame(copy=False) 返回的帧直接引用共享内存，不发生复制。
+    full_frame=False 时子进程只转换裁剪区域，共享内存中每个槽位也只有区域大小。
+    """
+
+    def __init__(
+        self, backend, capture_kwargs, shape=(720, 1280, 3), crop_area=None, ring_size=4, target_fps=30,
+        full_frame=True,
+    ):
+        """
+        Args:
+            backend (str): "NemuIpc" 或 "DroidCast"
+            capture_kwargs (dict): 传给子进程的截图参数，必须可 pickle
+            shape (tuple): 帧尺寸 (height, width, channel)
+            crop_area: 截图后裁剪区域 (x1, y1, x2, y2)
+            ring_size (int): 环形缓冲区槽位数
+            target_fps (int, float): 截图帧率上限
+            full_frame (bool): False 时只转换并发布裁剪区域，Frame.image 为 None。需要设置 crop_area
+        """
+        super().__init__(crop_area=crop_area, ring_size=ring_size, target_fps=target_fps, full_frame=full_frame)
+        self.backend = backend
+        self.capture_kwargs = capture_kwargs
+        self.shape = tuple(shape)
+        if not self.full_frame:
+            x1, y1, x2, y2 = crop_area
+            self.shape = (y2 - y1, x2 - x1) + self.shape[2:]
+        self.ring_size = ring_size
+        self.shared = None
+        self.process = None
+        self._context = multiprocessing.get_context("spawn")
+        self._mp_condition = self._context.Condition()
+
+    def start(self):
+        """启动截图子进程"""
+        self.shared = SharedFrameRing(self.shape, size=self.ring_size, create=True)
+        self.shared.header[_RUNNING] = 1
+        self.shared.header[_LAST_DEMAND] = time.time()
+        self.process = self._context.Process(
+            target=capture_worker,
+            args=(
+                self.shared.name, self.shape, self.ring_size, self.target_fps,
+                self.IDLE_TIMEOUT, self.IDLE_INTERVAL,
+                self.backend, self.capture_kwargs, self._mp_condition,
+                None if self.full_frame else tuple(self.crop_area),
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        self.running = True
+        logger.info(f"Capture worker started: pid={self.process.pid}, backend={self.backend}")
+
+    def stop(self):
+        """停止截图子进程并释放共享内存"""
+        self.running = False
+        if self.shared is None:
+            return
+        self.shared.header[_RUNNING] = 0
+        with self._mp_condition:
+            self._mp_condition.notify_all()
+        if self.process:
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=1)
+        self.shared.close()
+        self.shared.unlink()
+        self.shared = None
+
+    def _demand(self):
+        """记录消费需求，子进程处于空闲模式时立即唤醒"""
+        now = time.time()
+        idle = now - self.shared.header[_LAST_DEMAND] > self.IDLE_TIMEOUT
+        self.shared.header[_LAST_DEMAND] = now
+        if idle:
+            with self._mp_condition:
+                self._mp_condition.notify_all()
+
+    @property
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive() and bool(self.shared.header[_RUNNING])
+
+    @property
+    def latest_seq(self):
+        if self.shared is None:
+            return 0
+        return self.shared.latest_seq
+
+    @property
+    def screenshot_time(self):
+        if self.shared is None:
+            return 0.0
+        return float(self.shared.header[_SCREENSHOT_TIME])
+
+    @screenshot_time.setter
+    def screenshot_time(self, value):
+        # 截图耗时由子进程写入共享内存
+        pass
+
+    def wait_for_frame(self, after_seq=0, timeout=None, copy=True):
+        """
+        等待序号大于 after_seq 的帧，参数同 AsyncScreenshotBase.wait_for_frame
+        """
+        if self.shared is None:
+            return None
+        self._demand()
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            seq = self.shared.latest_seq
+            if seq > after_seq:
+                frame = self.shared.get(seq, crop_area=self.crop_area, full_frame=self.full_frame)
+                if frame is not None:
+                    if copy:
+                        copied = frame.copy()
+                        # 复制期间被子进程覆盖则重取
+                        if not self.shared.is_valid(frame):
+                            continue
+                        frame = copied
+                    return frame
+            if not self.is_alive:
+                return None
+            if deadline is None:
+                wait = 0.1
+            else:
+                wait = deadline - time.time()
+                if wait <= 0:
+                    return None
+            with self._mp_condition:
+                if self.shared.latest_seq <= after_seq:
+                    self._mp_condition.wait(timeout=min(wait, 0.1))
+
+    def is_valid(self, frame):
+        if self.shared is None:
+            return False
+        return self.shared.is_valid(frame)
+
+    def get_image(self):
+        """
+        获取裁剪后的图像
+
+        Returns:
+            (np.ndarray | None, float): (裁剪图像, 截图耗时)
+        """
+        frame = self.wait_for_frame(timeout=0, copy=True)
+        if frame is None:
+            return None, self.screenshot_time
+        return frame.cropped, self.screenshot_time
+
+    def get_full_image(self):
+        """
+        获取完整截图
+
+        Returns:
+            np.ndarray | None
+        """
+        frame = self.wait_for_frame(timeout=0, copy=True)
+        if frame is None:
+            return None
+        return frame.image
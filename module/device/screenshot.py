@@ -3,15 +3,33 @@
 """
 
 import os
+import weakref
 import numpy as np
 import time
 import cv2
 
 from module.base.decorator import cached_property
 from module.base.utils import save_image
-from module.device.method.adb import Adb
-from module.device.method.droidcast import DroidCast
+from module.device.frame import (
+    ImageFrame,
+    LazyImage,
+    NemuRgbaFrame,
+    Rgb565Frame,
+    RgbaFrame,
+    TileChangeDetector,
+)
+from module.device.method.adb import Adb, SCREENCAP_FORMATS
+from module.device.method.droidcast import DroidCast, DroidCastVersionIncompatible
+from module.device.method.droidcast_client import DroidCastConnectionError
 from module.device.method.nemu_ipc import get_nemu_ipc, NemuIpcIncompatible, NemuIpcError
+from module.device.method.utils import (
+    PackageNotInstalled,
+    RETRY_DELAY,
+    RETRY_TRIES,
+    handle_adb_error,
+    handle_unknown_host_service,
+)
+from module.device.screenshot_backend import ScreenshotBackendManager
 from module.exception import ScriptError, RequestHumanTakeover
 from module.logger import logger
 
@@ -21,23 +39,49 @@ class Screenshot(Adb):
     截图类
     """
 
+    # np.ndarray 或 LazyImage，LazyImage 只在被读取的区域上做颜色转换
     image: np.ndarray
+    # 截图是否返回 LazyImage，False 时每次截图都整帧转换
+    lazy_image = True
+    # 是否逐块检测相邻两帧的变化，ModuleBase.appear() 据此缓存识别结果
+    detect_change = True
+    # 每种截图方法保留的原始帧缓冲区数量
+    # device.image 持有上一帧时新截图写入另一个缓冲区，两个缓冲区交替使用
+    FRAME_BUFFERS = 2
     _last_save_time = {}
 
     @cached_property
     def screenshot_methods(self):
         """
-        截图方法映射表
+        截图方法映射表，都是单次尝试，重试和重连由 screenshot_backend 负责
 
         Returns:
             dict: 方法名 -> 方法函数的映射
         """
         return {
-            "ADB": self.screenshot_adb,
-            "DroidCast_raw": self.screenshot_droidcast_raw,
+            "ADB": self.screenshot_adb_once,
+            "ADB_raw": self.screenshot_adb_raw,
+            "DroidCast_raw": self.screenshot_droidcast_raw_once,
             "NemuIpc": self.screenshot_nemu_ipc,
         }
 
+    @cached_property
+    def screenshot_raw_methods(self):
+        """
+        原始帧截图方法映射表，都是单次尝试
+        screenshot()、screenshot_rois() 和 check_screen_size() 都用这张表截图，
+        screenshot_backend 的测速、试探和 p50 比较的都是同一种耗时（不含整帧颜色转换）
+
+        Returns:
+            dict: 方法名 -> 返回 RawFrame 的方法
+        """
+        return {
+            "ADB": self.screenshot_adb_frame,
+            "ADB_raw": self.screenshot_adb_raw_frame,
+            "DroidCast_raw": self.screenshot_droidcast_raw_frame,
+            "NemuIpc": self.screenshot_nemu_ipc_frame,
+        }
+
     @cached_property
     def screenshot_method_override(self) -> str:
         """
@@ -62,22 +106,176 @@ class Screenshot(Adb):
         # 检查是否卡住
         self.stuck_record_check()
 
-        # 截图方法
+        # 执行截图，颜色转换推迟到读取时按区域进行
+        frame = self.screenshot_backend.capture(self.screenshot_raw_methods)
+        if self.lazy_image:
+            self.image = LazyImage(frame)
+        else:
+            self.image = LazyImage(frame).materialize()
+        self._detect_change(frame)
+
+        return self.image
+
+    @property
+    def screenshot_method_name(self):
+        """
+        Returns:
+            str: 当前使用的截图方法名
+        """
         if self.screenshot_method_override:
-            method_name = self.screenshot_method_override
+            return self.screenshot_method_override
+        return self.config.Emulator_ScreenshotMethod
+
+    @cached_property
+    def _screenshot_backends(self):
+        """
+        Returns:
+            dict: 截图方法名 -> ScreenshotBackendManager
+        """
+        return {}
+
+    @property
+    def screenshot_backend(self):
+        """
+        当前截图方法对应的 ScreenshotBackendManager
+
+        - auto: 在 SCREENSHOT_AUTO_METHODS 中按实测耗时选择。
+            SCREENSHOT_AUTO_BENCHMARK 为 True 时第一次截图先逐个测速；
+            否则与以前相同从 ADB 开始，之后定期试探其他方式，更快时切换
+        - NemuIpc: 失败时使用 ADB，熔断冷却后切回
+        - 其他: 只使用该方法
+
+        Returns:
+            ScreenshotBackendManager:
+        """
+        method_name = self.screenshot_method_name
+        backend = self._screenshot_backends.get(method_name)
+        if backend is not None:
+            return backend
+
+        kwargs = dict(
+            failure_threshold=self.config.SCREENSHOT_FAILURE_THRESHOLD,
+            cooldown=self.config.SCREENSHOT_FAILURE_COOLDOWN,
+            recover=self.screenshot_recover,
+            retry_tries=RETRY_TRIES,
+            retry_delay=RETRY_DELAY,
+        )
+        if method_name == "auto":
+            names = self.config.SCREENSHOT_AUTO_METHODS
+            benchmark = self.config.SCREENSHOT_AUTO_BENCHMARK
+            if not benchmark:
+                names = ["ADB"] + [name for name in names if name != "ADB"]
+            backend = ScreenshotBackendManager(
+                names,
+                adaptive=True,
+                benchmark=benchmark,
+                test_total=self.config.SCREENSHOT_BENCHMARK_TOTAL,
+                test_best=self.config.SCREENSHOT_BENCHMARK_BEST,
+                probe_interval=self.config.SCREENSHOT_PROBE_INTERVAL,
+                **kwargs,
+            )
+        elif method_name == "NemuIpc":
+            backend = ScreenshotBackendManager(["NemuIpc", "ADB"], adaptive=False, **kwargs)
         else:
-            method_name = self.config.Emulator_ScreenshotMethod
+            if method_name not in self.screenshot_raw_methods:
+                logger.warning(f"Unknown screenshot method: {method_name}, fallback to ADB")
+                method_name = "ADB"
+            backend = ScreenshotBackendManager([method_name], adaptive=False, **kwargs)
+        self._screenshot_backends[self.screenshot_method_name] = backend
+        return backend
+
+    def screenshot_recover(self, name, error):
+        """
+        截图失败后的恢复，由 screenshot_backend 在下一次使用该方式之前调用，
+        与 @retry 对各种异常的处理相同
 
-        # 获取对应的截图方法
-        method = self.screenshot_methods.get(method_name)
-        if method is None:
-            logger.warning(f"Unknown screenshot method: {method_name}, fallback to ADB")
-            method = self.screenshot_adb
+        Args:
+            name (str): 截图方法名
+            error (Exception): 上一次失败的异常
+        """
+        if isinstance(error, ConnectionResetError):
+            self.adb_reconnect()
+        elif "AdbError" in type(error).__name__:
+            if handle_unknown_host_service(error):
+                self.adb_start_server()
+                self.adb_reconnect()
+            elif handle_adb_error(error):
+                self.adb_reconnect()
+        elif isinstance(error, PackageNotInstalled):
+            self.detect_package()
+        elif name == "DroidCast_raw" and isinstance(
+                error, (OSError, DroidCastConnectionError, DroidCastVersionIncompatible)):
+            # requests 的 ConnectionError、ReadTimeout 都是 OSError 的子类
+            self.droidcast_init()
+        elif name == "NemuIpc" and isinstance(error, NemuIpcError):
+            self._nemu_ipc_instance.reconnect()
+        elif name == "ADB_raw":
+            # 流中可能残留半帧数据
+            self.screencap_stream_close()
+
+    def screenshot_rois(self, areas):
+        """
+        截图，但只对指定区域做颜色转换
 
-        # 执行截图
-        self.image = method()
+        self.image 设置为 LazyImage，其他区域在读取时才转换，
+        只需要检查几个按钮或读取倒计时的循环可以省掉整帧转换的开销。
 
-        return self.image
+        Args:
+            areas (list[tuple]): 区域列表，每个为 (x1, y1, x2, y2)
+
+        Returns:
+            list[np.ndarray]: 与 areas 一一对应的 RGB 图像
+
+        Raises:
+            GameStuckError: 界面卡住超过60秒
+            GameNotRunningError: 应用已挂掉
+        """
+        self.stuck_record_check()
+
+        frame = self.screenshot_backend.capture(self.screenshot_raw_methods)
+        self.image = LazyImage(frame)
+        self._detect_change(frame)
+        return [frame.crop(area) for area in areas]
+
+    @cached_property
+    def change_detector(self):
+        """
+        相邻两帧的逐块变化检测
+
+        Returns:
+            TileChangeDetector:
+        """
+        return TileChangeDetector()
+
+    def _detect_change(self, frame):
+        """
+        比较新截图和上一帧，记录发生变化的分块
+
+        Args:
+            frame (RawFrame): 新截图的原始帧，此时 self.image 已经是这一帧
+        """
+        if not self.detect_change:
+            return
+        self.change_detector.update(frame)
+        # 只记录弱引用，不影响原始帧缓冲区的复用
+        self._change_image = weakref.ref(self.image)
+
+    def region_version(self, area):
+        """
+        区域的版本号，区域内任意分块发生变化后版本号都会增大
+
+        Args:
+            area: (x1, y1, x2, y2)
+
+        Returns:
+            int | None: 未启用变化检测，或 self.image 不是最近一次检测的截图（例如被外部替换）时返回 None
+        """
+        if not self.detect_change:
+            return None
+        ref = getattr(self, "_change_image", None)
+        if ref is None or ref() is None or ref() is not getattr(self, "image", None):
+            return None
+        return self.change_detector.version(area)
 
     def save_screenshot(self, genre="items", interval=None, to_base_folder=False):
         """
@@ -139,6 +337,49 @@ class Screenshot(Adb):
         """
         return hasattr(self, "image") and self.image is not None
 
+    @cached_property
+    def _frame_buffers(self):
+        """
+        原始帧缓冲区缓存
+
+        Returns:
+            dict: 截图方法名 -> list[(缓冲区, 使用该缓冲区的 RawFrame 的弱引用)]，按使用顺序排列
+        """
+        return {}
+
+    def _reuse_frame_buffer(self, key):
+        """
+        取出一个可以覆盖的原始帧缓冲区
+
+        使用缓冲区的帧还未转换完且仍被持有（例如 device.image 或外部保存的截图）时，
+        覆盖缓冲区会改变那一帧的内容，跳过这个缓冲区。
+        没有可用的缓冲区时返回 None，由调用方分配新的缓冲区。
+
+        Args:
+            key (str): 截图方法名
+
+        Returns:
+            np.ndarray | None:
+        """
+        for buffer, ref in self._frame_buffers.get(key, []):
+            if ref() is None:
+                return buffer
+        return None
+
+    def _bind_frame_buffer(self, key, buffer, frame):
+        """
+        记录缓冲区和使用它的 RawFrame
+
+        Args:
+            key (str): 截图方法名
+            buffer (np.ndarray):
+            frame (RawFrame):
+        """
+        buffers = [item for item in self._frame_buffers.get(key, []) if item[0] is not buffer]
+        buffers.append((buffer, weakref.ref(frame)))
+        # 超出数量时丢弃最早的缓冲区，仍被持有的帧自己保留着它
+        self._frame_buffers[key] = buffers[-self.FRAME_BUFFERS:]
+
     @cached_property
     def _nemu_ipc_instance(self):
         """
@@ -162,16 +403,87 @@ class Screenshot(Adb):
 
         Returns:
             np.ndarray: RGB格式的图像数组
+
+        Raises:
+            NemuIpcIncompatible:
+            NemuIpcError: 失败时回退到 ADB 由 screenshot_backend 处理
         """
-        try:
-            # NemuIpc 返回的是 BGR 格式，需要转换为 RGB
-            image = self._nemu_ipc_instance.screenshot()
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            return image
-        except (NemuIpcIncompatible, NemuIpcError) as e:
-            logger.error(f"NemuIpc screenshot failed: {e}")
-            logger.warning("Fallback to ADB screenshot")
-            return self.screenshot_adb()
+        # 直接从 RGBA 缓冲区转换为 RGB，不再经过 BGR 中转
+        # device.image 会被跨帧持有，所以这里不使用借用帧
+        return self._nemu_ipc_instance.screenshot_rgb()
+
+    def screenshot_nemu_ipc_frame(self):
+        """
+        使用 NemuIpc 截取原始帧，DLL 直接写入本实例持有的缓冲区
+
+        Returns:
+            RawFrame:
+
+        Raises:
+            NemuIpcIncompatible:
+            NemuIpcError:
+        """
+        nemu = self._nemu_ipc_instance
+        buffer = self._reuse_frame_buffer("NemuIpc")
+        with nemu.lock:
+            if nemu.width == 0 or nemu.height == 0:
+                nemu.get_resolution()
+            shape = (nemu.height, nemu.width, 4)
+            if buffer is None or buffer.shape != shape:
+                buffer = np.empty(shape, dtype=np.uint8)
+            nemu.capture_raw(dst=buffer)
+        frame = NemuRgbaFrame(buffer)
+        self._bind_frame_buffer("NemuIpc", buffer, frame)
+        return frame
+
+    def screenshot_droidcast_raw_frame(self):
+        """
+        使用 DroidCast_raw 截取原始 RGB565 帧
+
+        Returns:
+            RawFrame:
+        """
+        buffer = self._reuse_frame_buffer("DroidCast_raw")
+        arr = self.droidcast_raw_capture_once(dst=buffer)
+        frame = Rgb565Frame(arr, converter=self.rgb565_converter)
+        # 未旋转时 arr 就是响应体所在的缓冲区，下次截图直接写入
+        self._bind_frame_buffer("DroidCast_raw", arr, frame)
+        return frame
+
+    def screenshot_adb_raw_frame(self):
+        """
+        使用 adb exec-out screencap 截取未压缩的原始帧
+
+        Returns:
+            RawFrame:
+        """
+        buffer = self._reuse_frame_buffer("ADB_raw")
+        data, fmt = self.adb_raw_capture_once(dst=buffer)
+        code = SCREENCAP_FORMATS[fmt][1]
+        if code is None:
+            frame = Rgb565Frame(data, converter=self.rgb565_converter)
+        else:
+            frame = RgbaFrame(data, code=code)
+        self._bind_frame_buffer("ADB_raw", data, frame)
+        return frame
+
+    def screenshot_adb_raw(self):
+        """
+        使用 adb exec-out screencap 截图，省去设备端 PNG 编码和本地解码
+
+        Returns:
+            np.ndarray: RGB格式的图像数组
+        """
+        return self.screenshot_adb_raw_frame().convert()
+
+    def screenshot_adb_frame(self):
+        """
+        ADB 截图是 PNG，无法按区域解码，直接整帧解码
+
+        Returns:
+            RawFrame:
+        """
+        return ImageFrame(self.screenshot_adb_once())
 
     def check_screen_size(self):
         """
@@ -181,10 +493,9 @@ class Screenshot(Adb):
             RequestHumanTakeover: 分辨率不符合要求
         """
         logger.info("Checking screen size")
-        method_name = self.config.Emulator_ScreenshotMethod
-        method = self.screenshot_methods.get(method_name, self.screenshot_adb)
-        image = method()
-        h, w = image.shape[:2]
+        # 与 screenshot() 使用同一张方法表，auto 模式下第一次截图时测速并选择截图方式
+        frame = self.screenshot_backend.capture(self.screenshot_raw_methods)
+        h, w = frame.shape[:2]
         if (w, h) != (1280, 720):
             logger.critical(f"Screen size is {w}x{h}, required 1280x720")
             raise RequestHumanTakeover(
@@ -0,0 +1,368 @@
+"""
+截图方式自适应选择
+
+根据实测耗时在多种截图方式之间选择，失败过多的方式会被熔断一段时间，
+之后再试探性地恢复，避免一个已经失效的截图方式每一帧都要等到超时。
+
+截图函数只做单次尝试，不带 @retry。失败后的重连、重启服务由 recover 回调完成，
+在下一次使用该方式之前调用，已经回退到其他方式时不必等待重连。
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from module.exception import RequestHumanTakeover
+from module.logger import logger
+
+
+class BackendStats:
+    """单个截图方式的耗时统计和熔断状态"""
+
+    def __init__(self, name, window=50):
+        """
+        Args:
+            name (str): 截图方式
+            window (int): 保留最近多少次耗时
+        """
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.success = 0
+        self.failure = 0
+        self.consecutive_failure = 0
+        # 熔断到期时间，0 表示未熔断
+        self.open_until = 0.0
+        self.last_probe = 0.0
+        # 上一次失败的异常，下次使用前交给 recover 处理
+        self.pending_error = None
+        # 自动选择时从未成功过的方式失败后不做重连，避免为用不上的方式安装、启动服务
+        self.recoverable = True
+
+    def record(self, cost):
+        """
+        记录一次成功的截图
+
+        Args:
+            cost (float): 耗时(秒)
+        """
+        self.latencies.append(cost)
+        self.success += 1
+        self.consecutive_failure = 0
+        self.open_until = 0.0
+        self.pending_error = None
+        self.recoverable = True
+
+    def record_failure(self, threshold, cooldown):
+        """
+        记录一次失败，连续失败达到 threshold 次时熔断
+
+        Args:
+            threshold (int): 熔断前允许的连续失败次数
+            cooldown (int, float): 熔断时长(秒)
+
+        Returns:
+            bool: 是否因此熔断
+        """
+        self.failure += 1
+        self.consecutive_failure += 1
+        if self.consecutive_failure >= threshold:
+            self.open_until = time.time() + cooldown
+            return True
+        return False
+
+    def is_open(self, now=None):
+        """
+        Returns:
+            bool: 是否处于熔断中
+        """
+        if now is None:
+            now = time.time()
+        return self.open_until > now
+
+    def percentile(self, q):
+        """
+        Args:
+            q (int, float): 0 到 100
+
+        Returns:
+            float | None: 没有记录时返回 None
+        """
+        if not self.latencies:
+            return None
+        return float(np.percentile(self.latencies, q))
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+    def __repr__(self):
+        p50, p95 = self.p50, self.p95
+        p50 = "-" if p50 is None else f"{p50:.3f}s"
+        p95 = "-" if p95 is None else f"{p95:.3f}s"
+        state = "open" if self.is_open() else "closed"
+        return (
+            f"{self.name}(p50={p50}, p95={p95}, success={self.success}, "
+            f"failure={self.failure}, circuit={state})"
+        )
+
+
+class ScreenshotBackendManager:
+    """
+    截图方式管理
+
+    - adaptive=True (Emulator_ScreenshotMethod = auto):
+        benchmark=True 时第一次截图逐个测速，与 tests/test_screenshot_benchmark.py 相同，
+        取最好的几次的平均值，选择最快的方式；benchmark=False 时从 names[0] 开始。
+        之后每隔 probe_interval 秒用另一种方式截一帧（这一帧直接作为结果返回），
+        p50 明显更低时切换过去。从未成功过的方式失败时直接熔断，也不为它调用 recover。
+    - adaptive=False:
+        始终优先使用 names[0]，后面的方式只在它熔断时使用，冷却结束后切回。
+
+    连续失败 failure_threshold 次的方式熔断 cooldown 秒，期间不会被调用。
+    所有方式都失败时，等待 retry_delay 秒后再试一轮，共 retry_tries 轮，与 @retry 相同。
+    """
+
+    def __init__(
+        self,
+        names,
+        adaptive=True,
+        benchmark=True,
+        test_total=10,
+        test_best=8,
+        failure_threshold=3,
+        cooldown=60,
+        probe_interval=300,
+        switch_ratio=0.8,
+        window=50,
+        recover=None,
+        retry_tries=1,
+        retry_delay=0,
+    ):
+        """
+        Args:
+            names (list[str]): 候选截图方式，adaptive=False 时按优先级排列
+            adaptive (bool): 是否按耗时选择
+            benchmark (bool): adaptive 时是否在第一次截图前逐个测速
+            test_total (int): 测速时每种方式截图次数
+            test_best (int): 取最好的几次计算平均值
+            failure_threshold (int): 熔断前允许的连续失败次数
+            cooldown (int, float): 熔断时长(秒)
+            probe_interval (int, float): 试探其他截图方式的间隔(秒)
+            switch_ratio (float): 试探的方式 p50 低于当前方式 p50 的这个比例时切换
+            window (int): 每种方式保留最近多少次耗时
+            recover (callable): recover(name, error)，失败后下一次使用该方式前调用，
+                用于重连 ADB、重启 DroidCast 等
+            retry_tries (int): 所有方式都失败时最多尝试几轮
+            retry_delay (int, float): 两轮之间等待的秒数
+        """
+        self.names = list(names)
+        self.adaptive = adaptive
+        self.test_total = test_total
+        self.test_best = test_best
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.switch_ratio = switch_ratio
+        self.recover = recover
+        self.retry_tries = max(int(retry_tries), 1)
+        self.retry_delay = retry_delay
+        self.stats = {name: BackendStats(name, window=window) for name in self.names}
+        self.current = None if adaptive and benchmark else self.names[0]
+        if adaptive:
+            for name in self.names:
+                if name != self.current:
+                    self.stats[name].recoverable = False
+        self._last_probe = time.time()
+
+    def _run(self, name, methods):
+        """
+        调用一次截图方式并记录结果，失败时重新抛出异常
+
+        Args:
+            name (str): 截图方式
+            methods (dict): 截图方式 -> 截图函数
+        """
+        stats = self.stats[name]
+        start = time.time()
+        try:
+            error, stats.pending_error = stats.pending_error, None
+            if error is not None and self.recover is not None:
+                self.recover(name, error)
+                start = time.time()
+            result = methods[name]()
+        except Exception as e:
+            logger.error(f"Screenshot method {name} failed: {e}")
+            if stats.recoverable:
+                stats.pending_error = e
+            if stats.record_failure(self.failure_threshold, self.cooldown):
+                logger.warning(
+                    f"Screenshot method {name} failed {stats.consecutive_failure} times in a row, "
+                    f"disabled for {self.cooldown}s"
+                )
+            raise
+        stats.record(time.time() - start)
+        return result
+
+    def benchmark(self, methods):
+        """
+        逐个测速，选择平均耗时最短的截图方式
+
+        Args:
+            methods (dict): 截图方式 -> 截图函数
+
+        Returns:
+            Any: 最后一次成功截图的结果，全部失败时为 None
+        """
+        logger.hr("Screenshot benchmark", level=2)
+        result = None
+        costs = {}
+        for name in self.names:
+            record = []
+            for _ in range(self.test_total):
+                start = time.time()
+                try:
+                    result = self._run(name, methods)
+                except Exception:
+                    # 不可用的方式直接熔断，不再继续测速，也不为它重连或启动服务
+                    self.stats[name].open_until = time.time() + self.cooldown
+                    self.stats[name].pending_error = None
+                    self.stats[name].recoverable = False
+                    record = []
+                    break
+                record.append(time.time() - start)
+            if record:
+                costs[name] = float(np.mean(np.sort(record)[: self.test_best]))
+                logger.attr(name, f"{costs[name]:.3f}s")
+            else:
+                logger.attr(name, "Failed")
+
+        if costs:
+            self.current = min(costs, key=costs.get)
+            logger.info(f"Screenshot method: {self.current}")
+        self._last_probe = time.time()
+        return result
+
+    def _score(self, name):
+        """用于排序，没有耗时记录的方式排在最后"""
+        p50 = self.stats[name].p50
+        return float("inf") if p50 is None else p50
+
+    def _probe_candidate(self, now):
+        """
+        Returns:
+            str | None: 本次要试探的截图方式
+        """
+        if self.adaptive:
+            candidates = [name for name in self.names if name != self.current and not self.stats[name].is_open(now)]
+        else:
+            # 只试探比当前方式优先级更高的方式
+            index = self.names.index(self.current)
+            candidates = [name for name in self.names[:index] if not self.stats[name].is_open(now)]
+        if not candidates:
+            return None
+        # 最久没有试探过的
+        return min(candidates, key=lambda name: self.stats[name].last_probe)
+
+    def _switch(self, name, reason):
+        if name == self.current:
+            return
+        logger.info(f"Screenshot method switched: {self.current} -> {name} ({reason})")
+        self.current = name
+        self.log_stats()
+
+    def _probe(self, methods, now):
+        """
+        试探其他截图方式
+
+        Returns:
+            tuple: (是否成功, 截图结果)
+        """
+        name = self._probe_candidate(now)
+        self._last_probe = now
+        if name is None:
+            return False, None
+        self.stats[name].last_probe = now
+        try:
+            result = self._run(name, methods)
+        except Exception:
+            if not self.stats[name].success:
+                # 与测速相同，从未成功过的方式直接熔断
+                self.stats[name].open_until = time.time() + self.cooldown
+            return False, None
+
+        if not self.adaptive:
+            self._switch(name, "recovered")
+        else:
+            current = self._score(self.current)
+            if self._score(name) < current * self.switch_ratio:
+                self._switch(name, "faster")
+        return True, result
+
+    def capture(self, methods):
+        """
+        截图
+
+        Args:
+            methods (dict): 截图方式 -> 截图函数，返回完整截图或 RawFrame
+
+        Returns:
+            Any: 截图函数的返回值
+
+        Raises:
+            RequestHumanTakeover: 所有截图方式连续 retry_tries 轮都失败
+        """
+        if self.current is None:
+            result = self.benchmark(methods)
+            if self.current is not None:
+                return result
+
+        now = time.time()
+        if now - self._last_probe > self.probe_interval or (
+            not self.adaptive and self.current != self.names[0]
+            and not self.stats[self.names[0]].is_open(now)
+        ):
+            success, result = self._probe(methods, now)
+            if success:
+                return result
+
+        for attempt in range(self.retry_tries):
+            if attempt:
+                time.sleep(self.retry_delay)
+            for name in self._available():
+                try:
+                    result = self._run(name, methods)
+                except Exception:
+                    continue
+                if name != self.current:
+                    self._switch(name, "fallback")
+                return result
+
+        logger.critical(f"Screenshot failed with {self.names} after {self.retry_tries} tries")
+        raise RequestHumanTakeover
+
+    def _available(self):
+        """
+        Returns:
+            list[str]: 当前方式优先，其余按 p50 排序，熔断中的跳过
+        """
+        now = time.time()
+        order = [self.current] if self.current is not None else []
+        others = [name for name in self.names if name != self.current]
+        if self.adaptive:
+            others.sort(key=self._score)
+        order += others
+        available = [name for name in order if not self.stats[name].is_open(now)]
+        if not available:
+            # 全部熔断时仍然逐个尝试，而不是直接失败
+            available = order
+        return available
+
+    def log_stats(self):
+        """输出各截图方式的耗时统计"""
+        for name in self.names:
+            logger.attr(name, self.stats[name])
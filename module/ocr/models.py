@@ -6,6 +6,7 @@ OCR 模型配置
 import os
 from module.base.decorator import cached_property
 from module.logger import logger
+from module.ocr.torch_threads import torch_threads
 
 
 # 模型路径配置
@@ -27,10 +28,27 @@ class CnOcrEngine:
     使用预训练的 densenet_lite_136-fc 模型，无需额外训练
     """
 
-    def __init__(self, name=None, use_gpu=True, model_path=None):
+    # 识别前的预处理流程，见 _preprocess_image()
+    # - none: 不处理，直接交给 CnOCR
+    # - threshold: 灰度 + 自适应二值化
+    # - full: 二值化后再做 NL-means 去噪和锐化
+    PREPROCESS = ("none", "threshold", "full")
+    # NL-means 去噪占 full 的绝大部分耗时，小而清晰的 UI 文字可以在 Ocr 中指定 threshold。
+    # 还没有在 logs/ocr_errors 上比较过准确率 (tests/test_cnocr_preprocess_benchmark.py)，默认保持原来的流程
+    DEFAULT_PREPROCESS = "full"
+
+    def __init__(self, name=None, use_gpu=True, model_path=None, preprocess=DEFAULT_PREPROCESS):
+        """
+        Args:
+            name (str): 模型名称，用于日志
+            use_gpu (bool): CUDA 可用时使用 PyTorch GPU 后端
+            model_path (str): 自定义模型目录
+            preprocess (str): 默认的预处理流程，PREPROCESS 之一，可以在每次调用时覆盖
+        """
         self._name = name
         self._use_gpu = use_gpu
         self._model_path = model_path  # 自定义模型路径
+        self.preprocess = self._check_preprocess(preprocess)
         self._ocr = None
         self._model_loaded = False
 
@@ -40,6 +58,8 @@ class CnOcrEngine:
             return
 
         try:
+            # cnocr 的识别和前后处理都使用 torch，在它第一次计算前设置线程数
+            torch_threads.apply()
             from cnocr import CnOcr
 
             # 检测 GPU 可用性
@@ -136,17 +156,25 @@ class CnOcrEngine:
             logger.error(f"Failed to load CnOCR model: {e}")
             raise
 
-    def atomic_ocr_for_single_lines(self, img_list, cand_alphabet=None):
+    @classmethod
+    def _check_preprocess(cls, preprocess):
+        if preprocess not in cls.PREPROCESS:
+            raise ValueError(f"Unknown preprocess pipeline: {preprocess}, should be one of {cls.PREPROCESS}")
+        return preprocess
+
+    def atomic_ocr_for_single_lines(self, img_list, cand_alphabet=None, preprocess=None):
         """
         批量识别单行文本
 
         Args:
             img_list: numpy 数组列表 (预处理后的图像)
             cand_alphabet: 候选字符集 (用于过滤结果)
+            preprocess (str): 预处理流程，PREPROCESS 之一，None 表示使用 self.preprocess
 
         Returns:
             识别结果列表，每个元素是字符列表
         """
+        preprocess = self.preprocess if preprocess is None else self._check_preprocess(preprocess)
         if not self._model_loaded:
             self.init()
 
@@ -154,7 +182,7 @@ class CnOcrEngine:
         for img in img_list:
             try:
                 # 预处理图像以提高识别率
-                processed_img = self._preprocess_image(img)
+                processed_img = self._preprocess_image(img, preprocess)
                 
                 # CnOCR 识别
                 ocr_result = self._ocr.ocr(processed_img)
@@ -176,18 +204,22 @@ class CnOcrEngine:
 
         return results
     
-    def _preprocess_image(self, img):
+    def _preprocess_image(self, img, preprocess="full"):
         """
         预处理图像以提高 OCR 识别率
         
         Args:
             img: numpy 数组图像
+            preprocess (str): 预处理流程，PREPROCESS 之一
             
         Returns:
             预处理后的图像
         """
         import cv2
         import numpy as np
+
+        if preprocess == "none":
+            return img
         
         # 1. 转灰度
         if len(img.shape) == 3:
@@ -202,6 +234,9 @@ class CnOcrEngine:
             cv2.THRESH_BINARY, 
             11, 2
         )
+        # 二值图锐化后不变，只有去噪后才需要锐化
+        if preprocess == "threshold":
+            return binary
         
         # 3. 去噪
         denoised = cv2.fastNlMeansDenoising(binary, None, h=10, templateWindowSize=7, searchWindowSize=21)
@@ -235,15 +270,32 @@ class OcrModel:
         PCR 计时器识别模型 (使用自定义训练的 SimpleCNN 模型)
 
         使用自定义训练的 SimpleCNN 模型，100% 准确率
+        导出的 ONNX 模型存在且不比 .pth 旧时，使用 ONNX Runtime 推理，不需要加载 PyTorch
         """
         import os
-        from module.ocr.simple_cnn import SimpleCNNOCR
-        
+
         # 优先尝试加载微调后的模型
         finetuned_path = os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
             "module", "ocr", "timer_cnn_finetuned.pth"
         )
+        onnx_path = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            "module", "ocr", "timer_cnn.onnx"
+        )
+        if os.path.exists(onnx_path):
+            if os.path.exists(finetuned_path) and os.path.getmtime(finetuned_path) > os.path.getmtime(onnx_path):
+                logger.warning("timer_cnn.onnx is older than timer_cnn_finetuned.pth, "
+                               "re-export with: python tools/train_simple_cnn.py --export_only")
+            else:
+                try:
+                    from module.ocr.onnx_cnn import OnnxCNNOCR
+                    logger.info(f"Loading ONNX SimpleCNN model from: {onnx_path}")
+                    return OnnxCNNOCR(onnx_path, threads=torch_threads.threads or 1)
+                except ImportError:
+                    logger.info("onnxruntime not installed, using PyTorch")
+
+        from module.ocr.simple_cnn import SimpleCNNOCR
         best_path = os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
             "timer_cnn_best.pth"
@@ -258,6 +310,14 @@ class OcrModel:
             
         return SimpleCNNOCR(model_path)
 
+    @cached_property
+    def pcr_cached(self):
+        """
+        带结果缓存的 PCR 计时器模型，用于战斗中逐帧识别倒计时
+        """
+        from module.ocr.ocr_cache import CachedOcrEngine
+        return CachedOcrEngine(self.pcr, glyph=True)
+
     @cached_property
     def cnocr(self):
         """
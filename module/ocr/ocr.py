@@ -12,7 +12,7 @@ from module.base.button import Button
 from module.base.decorator import cached_property
 from module.base.utils import *
 from module.logger import logger
-from module.ocr.models import OCR_MODEL
+from module.ocr.models import OCR_MODEL, CnOcrEngine
 
 if TYPE_CHECKING:
     from module.ocr.al_ocr import PaddleOcrEngine
@@ -33,6 +33,7 @@ class Ocr:
         threshold=128,
         alphabet=None,
         name=None,
+        preprocess=None,
     ):
         """
         初始化 OCR 识别器
@@ -44,6 +45,8 @@ class Ocr:
             threshold (int): 二值化阈值
             alphabet: 候选字符白名单
             name (str): 识别器名称
+            preprocess (str): CnOCR 的预处理流程，'none' / 'threshold' / 'full'，
+                None 表示使用 CnOcrEngine.DEFAULT_PREPROCESS。其他引擎没有预处理流程，忽略该参数
         """
         self.name = str(buttons) if isinstance(buttons, Button) else name
         self._buttons = buttons
@@ -51,6 +54,7 @@ class Ocr:
         self.threshold = threshold
         self.alphabet = alphabet
         self.lang = lang
+        self.preprocess = preprocess
 
     @property
     def cnocr(self) -> "PaddleOcrEngine":
@@ -122,7 +126,11 @@ class Ocr:
         # 调试：显示输入 OCR 模型的图像
         # self.cnocr.debug(image_list)
 
-        result_list = self.cnocr.atomic_ocr_for_single_lines(image_list, self.alphabet)
+        engine = self.cnocr
+        if self.preprocess is not None and isinstance(engine, CnOcrEngine):
+            result_list = engine.atomic_ocr_for_single_lines(image_list, self.alphabet, preprocess=self.preprocess)
+        else:
+            result_list = engine.atomic_ocr_for_single_lines(image_list, self.alphabet)
         result_list = ["".join(result) for result in result_list]
         result_list = [self.after_process(result) for result in result_list]
 
@@ -152,6 +160,7 @@ class Duration(Ocr):
         threshold=128,
         alphabet="0123456789:",
         name=None,
+        preprocess=None,
     ):
         super().__init__(
             buttons,
@@ -160,6 +169,7 @@ class Duration(Ocr):
             threshold=threshold,
             alphabet=alphabet,
             name=name,
+            preprocess=preprocess,
         )
 
     def after_process(self, result):
@@ -0,0 +1,286 @@
+"""
+OCR 结果缓存
+
+战斗倒计时的裁剪图只可能显示 0:00 ~ 1:30 这 91 种字符串，
+同一秒内的几十帧几乎完全相同，却每帧都要跑一次 CNN。
+
+CachedOcrEngine 包在 OCR 引擎外面，接口与 atomic_ocr_for_single_lines 相同：
+1. 把裁剪图转灰度并量化，用它的哈希作为键查 LRU 缓存，命中时不调用模型
+2. 可选的字形模板：模型对多张不同的裁剪图给出相同结果后，按字符切开保存为样本，
+   之后的帧先逐个字符与样本比较，全部确定时不调用模型。
+   每隔若干次仍交给模型复核，不一致时删除对应字符的样本
+3. 都不命中时交给模型，模型的结果写回缓存
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from module.logger import logger
+
+
+class GlyphTemplates:
+    """
+    每个字符的样本，用于不经过模型直接识别
+
+    二值化后按列投影切分字符，每个字符缩放到固定大小，去均值归一化后与样本比较。
+    """
+
+    # 字符缩放后的尺寸 (宽, 高)
+    SIZE = (8, 12)
+    # 与最接近的样本的相似度至少为该值，且比其他字符的最高相似度高出 MARGIN
+    SIMILARITY = 0.9
+    MARGIN = 0.1
+    # 每个字符最多保存的样本数
+    EXEMPLARS = 4
+    # 同一个识别结果来自至少这么多张不同的裁剪图后才学习，模型偶尔的误识别不会成为样本
+    CONFIRM = 3
+    # 宽度小于该值的列投影片段视为噪点
+    MIN_WIDTH = 1
+
+    def __init__(self):
+        # 字符 -> 样本向量列表
+        self.exemplars = {}
+        # 识别结果 -> 给出该结果的裁剪图的键，数量达到 CONFIRM 后才学习
+        self._confirm = {}
+
+    @classmethod
+    def segment(cls, image):
+        """
+        Args:
+            image (np.ndarray): 灰度裁剪图
+
+        Returns:
+            list[np.ndarray]: 从左到右每个字符的向量
+        """
+        _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        # 文字比背景少，前景占多数时说明文字是暗色
+        if np.count_nonzero(binary) > binary.size // 2:
+            binary = 255 - binary
+        columns = np.flatnonzero(binary.any(axis=0))
+        if not len(columns):
+            return []
+        # 连续的列是同一个字符
+        breaks = np.flatnonzero(np.diff(columns) > 1)
+        starts = np.concatenate([[columns[0]], columns[breaks + 1]])
+        ends = np.concatenate([columns[breaks], [columns[-1]]]) + 1
+
+        glyphs = []
+        for x1, x2 in zip(starts, ends):
+            if x2 - x1 < cls.MIN_WIDTH:
+                continue
+            rows = np.flatnonzero(binary[:, x1:x2].any(axis=1))
+            glyph = image[rows[0]:rows[-1] + 1, x1:x2]
+            vector = cv2.resize(glyph, cls.SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+            # 字符高度也是区分 ":" 和数字的依据，附在向量最后
+            vector = np.append(vector - vector.mean(), (rows[-1] - rows[0] + 1) * 8.0)
+            norm = np.linalg.norm(vector)
+            glyphs.append(vector / norm if norm > 0 else vector)
+        return glyphs
+
+    def learn(self, image, text, key):
+        """
+        用模型的识别结果更新样本，字符数与切分结果不一致时忽略
+
+        Args:
+            image (np.ndarray): 灰度裁剪图
+            text (str): 模型识别结果
+            key: 裁剪图的键，相同的裁剪图只计一次
+        """
+        glyphs = self.segment(image)
+        if not text or len(glyphs) != len(text):
+            return
+        confirm = self._confirm.setdefault(text, set())
+        if len(confirm) < self.CONFIRM:
+            confirm.add(key)
+            if len(confirm) < self.CONFIRM:
+                return
+        for char, vector in zip(text, glyphs):
+            exemplars = self.exemplars.setdefault(char, [])
+            if len(exemplars) < self.EXEMPLARS:
+                exemplars.append(vector)
+
+    def evict(self, chars):
+        """
+        删除字符的样本，之后需要重新确认才会学习
+
+        Args:
+            chars (iterable[str]):
+        """
+        chars = set(chars)
+        for char in chars:
+            self.exemplars.pop(char, None)
+        for text in [text for text in self._confirm if chars.intersection(text)]:
+            del self._confirm[text]
+
+    def recognize(self, image):
+        """
+        Args:
+            image (np.ndarray): 灰度裁剪图
+
+        Returns:
+            str | None: 所有字符都能确定时返回结果，否则返回 None
+        """
+        if not self.exemplars:
+            return None
+        result = []
+        for vector in self.segment(image):
+            scores = sorted(
+                ((max(float(vector @ exemplar) for exemplar in exemplars), char)
+                 for char, exemplars in self.exemplars.items()),
+                reverse=True,
+            )
+            best, char = scores[0]
+            second = scores[1][0] if len(scores) > 1 else -1.0
+            if best < self.SIMILARITY or best - second < self.MARGIN:
+                return None
+            result.append(char)
+        return "".join(result) or None
+
+
+class CachedOcrEngine:
+    """
+    在 OCR 引擎前面加一层 LRU 缓存，接口与被包装的引擎相同
+    """
+
+    # 缓存条目数，倒计时只有 91 种结果，留出背景变化的余量
+    SIZE = 512
+    # 灰度量化保留的位数，越少越能容忍背景的细微变化，但不同文字碰撞的可能越大
+    QUANTIZE_BITS = 4
+    # 字形模板每识别这么多次，有一次仍交给模型复核
+    VERIFY_INTERVAL = 20
+
+    def __init__(self, engine, size=SIZE, glyph=False):
+        """
+        Args:
+            engine: 有 atomic_ocr_for_single_lines() 的 OCR 引擎
+            size (int): 缓存条目数
+            glyph (bool): 是否启用字形模板
+        """
+        self.engine = engine
+        self.size = size
+        self.glyph = GlyphTemplates() if glyph else None
+        self.lock = threading.Lock()
+        # (键, 候选字符集) -> 字符列表
+        self._cache = OrderedDict()
+        self.reset_stats()
+
+    def init(self):
+        self.engine.init()
+
+    def reset_stats(self):
+        """清空统计"""
+        self.hit = 0
+        self.glyph_hit = 0
+        self.miss = 0
+        # 字形模板交给模型复核的次数、与模型不一致的次数
+        self.verified = 0
+        self.rejected = 0
+
+    @property
+    def hit_rate(self):
+        """
+        Returns:
+            float: 不需要调用模型的比例
+        """
+        total = self.hit + self.glyph_hit + self.miss + self.verified
+        return (self.hit + self.glyph_hit) / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self._cache.clear()
+
+    @classmethod
+    def gray(cls, image):
+        image = np.asarray(image)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+
+    @classmethod
+    def key(cls, gray):
+        """
+        Args:
+            gray (np.ndarray): 灰度裁剪图
+
+        Returns:
+            bytes: 量化后图像的哈希
+        """
+        quantized = np.ascontiguousarray(gray >> (8 - cls.QUANTIZE_BITS))
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(np.array(quantized.shape, dtype=np.int32).tobytes())
+        return digest.digest()
+
+    def atomic_ocr_for_single_lines(self, img_list, cand_alphabet=None):
+        """
+        与被包装引擎的 atomic_ocr_for_single_lines 相同，只把未命中的图片交给模型
+
+        Args:
+            img_list (list[np.ndarray]):
+            cand_alphabet (str): 候选字符集
+
+        Returns:
+            list[list[str]]: 每张图片的字符列表
+        """
+        grays = [self.gray(image) for image in img_list]
+        keys = [(self.key(gray), cand_alphabet) for gray in grays]
+        results = [None] * len(img_list)
+        pending = []
+        # 需要复核的字形结果，index -> 字形模板的识别结果
+        verify = {}
+        with self.lock:
+            for index, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    results[index] = list(cached)
+                    self.hit += 1
+                    continue
+                text = self.glyph.recognize(grays[index]) if self.glyph is not None else None
+                if text is not None:
+                    if (self.glyph_hit + self.verified) % self.VERIFY_INTERVAL == 0:
+                        verify[index] = text
+                        self.verified += 1
+                        pending.append(index)
+                        continue
+                    # 字形模板的结果不写入缓存，复核发现错误时不会留在缓存里
+                    results[index] = list(text)
+                    self.glyph_hit += 1
+                    continue
+                pending.append(index)
+                self.miss += 1
+
+        if pending:
+            recognized = self.engine.atomic_ocr_for_single_lines([img_list[i] for i in pending], cand_alphabet)
+            with self.lock:
+                for index, chars in zip(pending, recognized):
+                    results[index] = list(chars)
+                    self._put(keys[index], results[index])
+                    if self.glyph is None:
+                        continue
+                    text = "".join(chars)
+                    glyph_text = verify.get(index)
+                    if glyph_text is not None and glyph_text != text:
+                        self.rejected += 1
+                        # 字形模板给出的错误字符，长度不同时无法对齐，全部删除
+                        if len(glyph_text) == len(text):
+                            wrong = {a for a, b in zip(glyph_text, text) if a != b}
+                        else:
+                            wrong = set(glyph_text)
+                        self.glyph.evict(wrong)
+                        logger.warning(f"Glyph templates read {glyph_text}, model read {text}, evicted")
+                    self.glyph.learn(grays[index], text, keys[index])
+        return results
+
+    def _put(self, key, value):
+        self._cache[key] = tuple(value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def log_stats(self):
+        """输出命中率"""
+        logger.attr("OcrCache", f"hit={self.hit}, glyph={self.glyph_hit}, miss={self.miss}, "
+                                f"verified={self.verified}, rejected={self.rejected}, "
+                                f"hit_rate={self.hit_rate:.1%}, entries={len(self._cache)}")
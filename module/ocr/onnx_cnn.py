@@ -0,0 +1,48 @@
+"""
+Timer CNN inference with ONNX Runtime on CPU.
+
+Same interface as SimpleCNNOCR, but loads the model exported by
+`python tools/train_simple_cnn.py --export onnx` and never imports torch,
+so process start only pays for creating an InferenceSession.
+
+The char mapping is stored in the ONNX model metadata (char2idx, idx2char, max_len).
+"""
+
+import json
+
+import numpy as np
+
+from module.ocr.cnn_base import TimerCnnBase
+
+
+class OnnxCNNOCR(TimerCnnBase):
+    """SimpleCNN exported to ONNX, run with onnxruntime"""
+
+    def __init__(self, model_path='module/ocr/timer_cnn.onnx', threads=1):
+        """
+        Args:
+            model_path (str): exported .onnx file
+            threads (int): intra-op threads, the model is tiny and extra threads only add
+                synchronization overhead, 0 lets onnxruntime decide
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self._set_charset(
+            json.loads(meta['char2idx']),
+            json.loads(meta['idx2char']),
+            int(meta['max_len']),
+        )
+        print(f"ONNX CNN OCR loaded from {model_path} (accuracy: {float(meta.get('val_seq_acc', 0)):.2f}%)")
+
+    def _forward(self, batch):
+        logits = self.session.run(None, {self.input_name: batch})[0]
+        return np.argmax(logits, axis=-1)
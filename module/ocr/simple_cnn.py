@@ -10,6 +10,9 @@ from PIL import Image
 import numpy as np
 from pathlib import Path
 
+from module.ocr.cnn_base import TimerCnnBase
+from module.ocr.torch_threads import torch_threads
+
 
 class SimpleCNN(nn.Module):
     """Lightweight CNN for timer OCR"""
@@ -47,19 +50,18 @@ class SimpleCNN(nn.Module):
         return x
 
 
-class SimpleCNNOCR:
+class SimpleCNNOCR(TimerCnnBase):
     """Simple CNN-based OCR for timer recognition"""
     
     def __init__(self, model_path='timer_cnn_best.pth'):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        torch_threads.apply()
         
         # Load model checkpoint
         checkpoint = torch.load(model_path, map_location=self.device)
         
         # Load char mappings
-        self.char2idx = checkpoint['char2idx']
-        self.idx2char = checkpoint['idx2char']
-        self.max_len = checkpoint['max_len']
+        self._set_charset(checkpoint['char2idx'], checkpoint['idx2char'], checkpoint['max_len'])
         
         # Initialize model
         self.model = SimpleCNN(
@@ -73,17 +75,13 @@ class SimpleCNNOCR:
         
         # Transform
         self.transform = transforms.Compose([
-            transforms.Resize((32, 64)),
+            transforms.Resize((self.INPUT_HEIGHT, self.INPUT_WIDTH)),
             transforms.ToTensor(),
             transforms.Normalize([0.5], [0.5])
         ])
         
         print(f"SimpleCNN OCR loaded (accuracy: {checkpoint['val_seq_acc']:.2f}%)")
     
-    def init(self):
-        """空的初始化方法，兼容CnOcrEngine接口"""
-        pass
-    
     def recognize(self, image):
         """
         Recognize text from image
@@ -146,23 +144,10 @@ class SimpleCNNOCR:
         
         return Image.fromarray(gray)
 
-    def atomic_ocr_for_single_lines(self, img_list, cand_alphabet=None):
-        """
-        批量识别单行文本 (兼容 CnOcrEngine接口)
-        
-        Args:
-            img_list: numpy数组列表或PIL图片列表
-            cand_alphabet: 候选字符集(忽略,SimpleCNN已优化)
-        
-        Returns:
-            识别结果列表,每个元素是字符列表
-        """
-        results = []
-        for img in img_list:
-            text = self.recognize(img)
-            # 返回字符列表格式以匹配CnOcrEngine
-            results.append(list(text))
-        return results
+    def _forward(self, batch):
+        batch = torch.from_numpy(batch).to(self.device)
+        with torch.inference_mode():
+            return torch.argmax(self.model(batch), dim=-1).cpu().numpy()
 
 
 def main():
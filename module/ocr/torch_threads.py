@@ -0,0 +1,78 @@
+"""
+PyTorch CPU 线程数
+
+torch 默认的 intra-op 线程数等于物理核心数。进程里同时还有：
+- 主线程：截图、模板匹配 (module/base/match_executor.py 的线程池和 OpenCV 内部线程)
+- AsyncOCR 的后台线程：战斗中逐帧识别倒计时
+
+倒计时 CNN 和 CnOCR 的单行识别都很小，一次前向推理拆给多个线程时，同步开销比计算还多，
+OpenMP 线程空转等待时还会和截图、模板匹配抢核心。
+这时可以把 torch 限制为少量线程，由进程内的其他线程分担剩下的核心。
+默认不修改 torch 的设置，限制后 CnOCR 在主线程的识别也会变成少量线程。
+
+set_num_interop_threads 只能在 torch 开始并行计算前调用一次，之后调用会抛出 RuntimeError，
+所以只在第一次加载模型时设置。
+"""
+
+import threading
+
+from module.logger import logger
+
+
+class TorchThreads:
+    """
+    进程级的 torch 线程设置，加载使用 torch 的 OCR 模型前调用 apply()
+    """
+
+    def __init__(self, threads=0, interop_threads=0):
+        """
+        Args:
+            threads (int): intra-op 线程数，0 表示不修改
+            interop_threads (int): inter-op 线程数，0 表示不修改
+        """
+        self.lock = threading.Lock()
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.applied = False
+
+    def configure(self, threads=0, interop_threads=0):
+        """
+        修改线程数，已经加载过模型时立即生效 (inter-op 线程数除外)
+
+        Args:
+            threads (int): intra-op 线程数，0 表示不修改
+            interop_threads (int): inter-op 线程数，0 表示不修改
+        """
+        if threads == self.threads and interop_threads == self.interop_threads:
+            return
+        self.threads = threads
+        self.interop_threads = interop_threads
+        if self.applied:
+            self.applied = False
+            self.apply()
+
+    def apply(self):
+        """
+        把线程数设置到 torch，没有安装 torch 时不做任何事
+        """
+        with self.lock:
+            if self.applied:
+                return
+            try:
+                import torch
+            except ImportError:
+                return
+            if self.threads > 0:
+                torch.set_num_threads(self.threads)
+            if self.interop_threads > 0 and torch.get_num_interop_threads() != self.interop_threads:
+                try:
+                    torch.set_num_interop_threads(self.interop_threads)
+                except RuntimeError as e:
+                    # torch 已经开始过并行计算
+                    logger.warning(f"Failed to set torch inter-op threads: {e}")
+            self.applied = True
+            logger.attr("TorchThreads", f"intra_op={torch.get_num_threads()}, "
+                                        f"inter_op={torch.get_num_interop_threads()}")
+
+
+torch_threads = TorchThreads()
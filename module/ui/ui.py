@@ -76,15 +76,19 @@ class UI(ModuleBase):
                 break
 
             # 遍历Page上所有的页面（主页、任务、商店...）
+            pages = []
             for page in Page.iter_pages():
                 if page.check_button is None:
                     logger.debug(f"Page {page.name} has no check_button")
                     continue
-                # 找每个页面的按钮
-                if self.ui_page_appear(page=page):
-                    logger.attr("UI", page.name)
-                    self.ui_current = page
-                    return page
+                pages.append(page)
+            # 找每个页面的按钮，与 ui_page_appear() 相同，多个页面并行匹配
+            index = self.appear_first([page.check_button for page in pages], offset=(30, 30))
+            if index is not None:
+                page = pages[index]
+                logger.attr("UI", page.name)
+                self.ui_current = page
+                return page
 
             # Unknown page but able to handle
             logger.info("Unknown ui page")
@@ -55,7 +55,7 @@ def scroll_detection():
 
     cv2.imwrite(
         "debug_full_screenshot.png",
-        cv2.cvtColor(module.device.image, cv2.COLOR_RGB2BGR),
+        cv2.cvtColor(module.device.image.copy(), cv2.COLOR_RGB2BGR),
     )
     logger.info("完整截图已保存到: debug_full_screenshot.png")
 
@@ -205,7 +205,7 @@ def template_matching():
 
     cv2.imwrite(
         "debug_fullscreen_match.png",
-        cv2.cvtColor(module.device.image, cv2.COLOR_RGB2BGR),
+        cv2.cvtColor(module.device.image.copy(), cv2.COLOR_RGB2BGR),
     )
     logger.info("截图已保存: debug_fullscreen_match.png")
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+CnOCR 预处理流程基准测试
+
+不需要连接设备。对 logs/ocr_errors 中保存的 OCR 错误截图 (BattleMonitor._save_debug_image)，
+分别用 CnOcrEngine 的每种预处理流程 (none / threshold / full) 识别，比较：
+- 预处理耗时
+- 预处理 + CnOCR 识别的总耗时
+- 准确率，以及与 full (原来的默认流程) 结果是否一致
+
+标注来源，按顺序：
+1. 目录中的 labels.txt，每行 "文件名\\t标注"
+2. tools/auto_label_with_verification.py 的 training_data/label_cache.db，按文件 MD5 查找
+没有标注的图片只统计耗时和一致性。文件名中的文字是当时识别错误的结果，不是标注。
+
+没有安装 cnocr 时只测试预处理耗时。
+
+Usage:
+    python tests/test_cnocr_preprocess_benchmark.py [--data_dir logs/ocr_errors] [--alphabet 0123456789:]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+import cv2
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "."))
+
+from module.logger import logger
+from module.ocr.models import CnOcrEngine
+
+console = Console()
+
+LABEL_CACHE = "./training_data/label_cache.db"
+# 预处理耗时的重复次数
+REPEAT = 20
+
+
+def load_labels(data_dir, files):
+    """
+    Returns:
+        dict[str, str]: 文件名 -> 标注
+    """
+    labels = {}
+    labels_file = os.path.join(data_dir, "labels.txt")
+    if os.path.exists(labels_file):
+        with open(labels_file, encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split("\t")
+                if len(parts) == 2:
+                    labels[os.path.basename(parts[0])] = parts[1]
+    if os.path.exists(LABEL_CACHE):
+        conn = sqlite3.connect(LABEL_CACHE)
+        try:
+            for file in files:
+                if file in labels:
+                    continue
+                with open(os.path.join(data_dir, file), "rb") as f:
+                    image_hash = hashlib.md5(f.read()).hexdigest()
+                row = conn.execute("SELECT label FROM label_cache WHERE image_hash = ?", (image_hash,)).fetchone()
+                if row:
+                    labels[file] = row[0]
+        finally:
+            conn.close()
+    return labels
+
+
+def load_samples(data_dir):
+    """
+    Returns:
+        list[tuple[str, np.ndarray, str | None]]: (文件名, 图片, 标注)
+    """
+    if not os.path.isdir(data_dir):
+        return []
+    files = sorted(file for file in os.listdir(data_dir) if file.lower().endswith(".png"))
+    labels = load_labels(data_dir, files)
+    samples = []
+    for file in files:
+        # 截图是 RGB 数组直接用 cv2.imwrite 保存的，cv2.imread 读回来就是原来的 RGB 数组
+        image = cv2.imread(os.path.join(data_dir, file))
+        if image is not None:
+            samples.append((file, image, labels.get(file)))
+    return samples
+
+
+def measure_preprocess(engine, images, preprocess):
+    """
+    Returns:
+        float: 每张图片的预处理耗时(秒)
+    """
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for image in images:
+            engine._preprocess_image(image, preprocess)
+    return (time.perf_counter() - start) / REPEAT / len(images)
+
+
+def run(data_dir, alphabet):
+    logger.hr("CnOCR Preprocess Benchmark", level=1)
+    samples = load_samples(data_dir)
+    if not samples:
+        logger.warning(f"No images in {data_dir}, OCR error samples are saved there during battles")
+        return
+    images = [image for _, image, _ in samples]
+    labels = [label for _, _, label in samples]
+    labelled = sum(label is not None for label in labels)
+    logger.info(f"Loaded {len(samples)} images from {data_dir}, {labelled} labelled")
+
+    engine = CnOcrEngine(name="cnocr", use_gpu=False)
+    try:
+        engine.init()
+        ocr_available = True
+    except Exception as e:
+        logger.warning(f"CnOCR not available, only measuring preprocessing: {e}")
+        ocr_available = False
+
+    table = Table(show_lines=True)
+    table.add_column("Pipeline", header_style="bright_cyan", style="cyan", no_wrap=True)
+    table.add_column("Preprocess", style="magenta")
+    table.add_column("Preprocess + OCR", style="magenta")
+    table.add_column("Same as full")
+    table.add_column("Accuracy")
+
+    results = {}
+    # full 是原来的默认流程，作为一致性的参照，先跑
+    pipelines = ["full"] + [preprocess for preprocess in CnOcrEngine.PREPROCESS if preprocess != "full"]
+    for preprocess in pipelines:
+        logger.hr(preprocess, level=2)
+        preprocess_time = measure_preprocess(engine, images, preprocess)
+        total, same, accuracy = "-", "-", "-"
+        if ocr_available:
+            start = time.perf_counter()
+            texts = ["".join(chars) for chars in engine.atomic_ocr_for_single_lines(images, alphabet, preprocess)]
+            total = f"{(time.perf_counter() - start) / len(images) * 1000:.2f}ms"
+            results[preprocess] = texts
+            same = f"{sum(a == b for a, b in zip(texts, results['full']))}/{len(texts)}"
+            if labelled:
+                correct = sum(text == label for text, label in zip(texts, labels) if label is not None)
+                accuracy = f"{correct / labelled:.2%}"
+        logger.attr(preprocess, f"preprocess={preprocess_time * 1000:.3f}ms, total={total}, accuracy={accuracy}")
+        table.add_row(preprocess, f"{preprocess_time * 1000:.3f}ms", total, same, accuracy)
+
+    console.print(table, justify="center")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data_dir", type=str, default="./logs/ocr_errors",
+                        help="Directory of OCR error screenshots")
+    parser.add_argument("--alphabet", type=str, default="0123456789:",
+                        help="Candidate characters, the saved errors are battle timers")
+    args = parser.parse_args()
+    run(args.data_dir, args.alphabet or None)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+倒计时 CNN 推理后端基准测试
+
+不需要连接设备。比较 PyTorch eager (SimpleCNNOCR) 与 ONNX Runtime (OnnxCNNOCR)：
+- 加载时间：在新的子进程中计时，包括 import torch / onnxruntime 和模型构建
+- 单帧延迟：与 AsyncOCR 相同，每次识别一张裁剪图
+- 批量延迟：Ocr.ocr 一次识别多个按钮时的情况
+- 两个后端的识别结果是否一致，有标注时同时统计准确率
+
+ONNX 模型需要先导出：
+    python tools/train_simple_cnn.py --export_only
+
+Usage:
+    python tests/test_ocr_backend_benchmark.py [--data_dir training_data/manual_errors]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "."))
+
+from module.base.utils import load_image
+from module.logger import logger
+
+console = Console()
+
+OCR_DIR = "./module/ocr"
+PTH_FILES = [f"{OCR_DIR}/timer_cnn_finetuned.pth", "./timer_cnn_best.pth"]
+ONNX_FILE = f"{OCR_DIR}/timer_cnn.onnx"
+# 单帧测试的次数
+REPEAT = 300
+BATCH_SIZE = 16
+
+LOAD_SCRIPT = {
+    "PyTorch": "from module.ocr.simple_cnn import SimpleCNNOCR as Engine",
+    "ONNX Runtime": "from module.ocr.onnx_cnn import OnnxCNNOCR as Engine",
+}
+
+
+def load_samples(data_dir):
+    """
+    Args:
+        data_dir (str): 包含 labels.txt 的目录，与 tools/train_simple_cnn.py 相同的格式
+
+    Returns:
+        list[tuple[np.ndarray, str | None]]: (裁剪图, 标注)，没有数据集时生成 0:00 ~ 1:30 的合成图
+    """
+    samples = []
+    labels_file = os.path.join(data_dir, "labels.txt") if data_dir else ""
+    if labels_file and os.path.exists(labels_file):
+        with open(labels_file, encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split("\t")
+                if len(parts) != 2:
+                    continue
+                path = os.path.join(data_dir, parts[0])
+                if not os.path.exists(path):
+                    path = os.path.join(data_dir, "images", parts[0])
+                image = load_image(path) if os.path.exists(path) else None
+                if image is not None:
+                    samples.append((image, parts[1]))
+    if samples:
+        logger.info(f"Loaded {len(samples)} labelled samples from {data_dir}")
+        return samples
+
+    logger.info("No labelled samples, using synthetic timer crops")
+    for second in range(91):
+        image = np.full((24, 42, 3), 40, dtype=np.uint8)
+        text = f"{second // 60}:{second % 60:02d}"
+        cv2.putText(image, text, (2, 19), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1, cv2.LINE_AA)
+        samples.append((image, None))
+    return samples
+
+
+def measure_load(backend, model_path):
+    """
+    Returns:
+        float | None: 在新进程中 import + 加载模型的耗时(秒)，失败时返回 None
+    """
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{LOAD_SCRIPT[backend]}\n"
+        f"Engine({model_path!r})\n"
+        "sys.stderr.write(repr(time.perf_counter() - start))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    try:
+        return float(result.stderr.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        logger.warning(f"{backend} load failed: {result.stderr.strip()[-200:]}")
+        return None
+
+
+def measure_latency(engine, images):
+    """
+    Returns:
+        tuple[float, float]: (单帧平均耗时, 每张图的批量平均耗时)，秒
+    """
+    engine.atomic_ocr_for_single_lines(images[:1])
+    start = time.perf_counter()
+    for index in range(REPEAT):
+        engine.atomic_ocr_for_single_lines([images[index % len(images)]])
+    single = (time.perf_counter() - start) / REPEAT
+
+    batches = [images[i:i + BATCH_SIZE] for i in range(0, len(images), BATCH_SIZE)]
+    start = time.perf_counter()
+    count = 0
+    for _ in range(max(1, REPEAT // len(batches) // 4)):
+        for batch in batches:
+            engine.atomic_ocr_for_single_lines(batch)
+            count += len(batch)
+    return single, (time.perf_counter() - start) / count
+
+
+def create_engine(backend, model_path):
+    if backend == "PyTorch":
+        from module.ocr.simple_cnn import SimpleCNNOCR
+        return SimpleCNNOCR(model_path)
+    from module.ocr.onnx_cnn import OnnxCNNOCR
+    return OnnxCNNOCR(model_path)
+
+
+def run(data_dir):
+    logger.hr("Timer OCR Backend Benchmark", level=1)
+    pth = next((path for path in PTH_FILES if os.path.exists(path)), None)
+    backends = []
+    if pth:
+        backends.append(("PyTorch", pth))
+    if os.path.exists(ONNX_FILE):
+        backends.append(("ONNX Runtime", ONNX_FILE))
+    else:
+        logger.warning(f"{ONNX_FILE} not found, export with: python tools/train_simple_cnn.py --export_only")
+    if not backends:
+        logger.error("No model found")
+        return
+
+    samples = load_samples(data_dir)
+    images = [image for image, _ in samples]
+
+    table = Table(show_lines=True)
+    table.add_column("Backend", header_style="bright_cyan", style="cyan", no_wrap=True)
+    table.add_column("Load", style="magenta")
+    table.add_column("Single frame", style="magenta")
+    table.add_column(f"Batch {BATCH_SIZE} (per image)", style="magenta")
+    table.add_column("Same as PyTorch")
+    table.add_column("Accuracy")
+
+    reference = None
+    for backend, model_path in backends:
+        logger.hr(backend, level=2)
+        load = measure_load(backend, model_path)
+        engine = create_engine(backend, model_path)
+        single, batched = measure_latency(engine, images)
+        texts = ["".join(chars) for chars in engine.atomic_ocr_for_single_lines(images)]
+        if reference is None:
+            reference = texts
+        same = sum(a == b for a, b in zip(texts, reference))
+        labelled = [(text, label) for text, (_, label) in zip(texts, samples) if label is not None]
+        accuracy = f"{sum(a == b for a, b in labelled) / len(labelled):.2%}" if labelled else "-"
+        logger.attr(backend, f"load={load}, single={single * 1000:.3f}ms, batch={batched * 1000:.3f}ms")
+        table.add_row(
+            backend,
+            f"{load * 1000:.0f}ms" if load is not None else "-",
+            f"{single * 1000:.3f}ms",
+            f"{batched * 1000:.3f}ms",
+            f"{same}/{len(texts)}",
+            accuracy,
+        )
+
+    console.print(table, justify="center")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data_dir", type=str, default="training_data/manual_errors",
+                        help="Directory containing labels.txt and images/")
+    run(parser.parse_args().data_dir)
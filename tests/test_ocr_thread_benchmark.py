@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+倒计时 CNN 的 torch 线程数基准测试
+
+不需要连接设备。SimpleCNNOCR 在不同的 torch intra-op 线程数下：
+- 单帧延迟：与 AsyncOCR 相同，每次识别一张裁剪图
+- 批量延迟：Ocr.ocr 一次识别多个按钮时的情况
+
+结果用于调整 PriconneConfig.OCR_TORCH_THREADS，默认值 0 不修改 torch 的线程数。
+
+Usage:
+    python tests/test_ocr_thread_benchmark.py [--data_dir training_data/manual_errors ...]
+"""
+
+import argparse
+import os
+import sys
+
+import torch
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "."))
+
+from module.logger import logger
+from module.ocr.simple_cnn import SimpleCNNOCR
+from module.ocr.torch_threads import torch_threads
+from tests.test_ocr_backend_benchmark import BATCH_SIZE, PTH_FILES, load_samples, measure_latency
+
+console = Console()
+
+# 加载模型前 torch 默认的线程数
+DEFAULT_THREADS = torch.get_num_threads()
+# 测试的 intra-op 线程数
+THREADS = sorted({1, 2, DEFAULT_THREADS})
+
+
+def run(data_dirs):
+    logger.hr("Timer OCR Thread Benchmark", level=1)
+    pth = next((path for path in PTH_FILES if os.path.exists(path)), None)
+    if pth is None:
+        logger.error("No model found")
+        return
+
+    samples = []
+    for data_dir in data_dirs:
+        samples += [sample for sample in load_samples(data_dir) if sample[1] is not None]
+    if not samples:
+        samples = load_samples(None)
+    images = [image for image, _ in samples]
+
+    table = Table(show_lines=True)
+    table.add_column("Threads", header_style="bright_cyan", style="cyan", no_wrap=True)
+    table.add_column("Single frame", style="magenta")
+    table.add_column(f"Batch {BATCH_SIZE} (per image)", style="magenta")
+
+    engine = SimpleCNNOCR(pth)
+    for threads in THREADS:
+        torch.set_num_threads(threads)
+        single, batched = measure_latency(engine, images)
+        logger.attr(f"threads={threads}", f"single={single * 1000:.3f}ms, batch={batched * 1000:.3f}ms")
+        table.add_row(
+            f"{threads}{' (default)' if threads == DEFAULT_THREADS else ''}",
+            f"{single * 1000:.3f}ms",
+            f"{batched * 1000:.3f}ms",
+        )
+    torch.set_num_threads(torch_threads.threads if torch_threads.threads > 0 else DEFAULT_THREADS)
+
+    console.print(table, justify="center")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data_dir", type=str, nargs="+", default=["training_data/manual_errors"],
+                        help="Directories containing labels.txt and images/")
+    run(parser.parse_args().data_dir)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+RGB565 -> RGB888 颜色转换基准测试
+
+不需要连接设备，在 1280x720 的随机 RGB565 帧上比较几种转换实现的耗时，
+并检查结果与 rgb565_to_rgb888 完全一致。
+"""
+
+import sys
+import os
+import time
+import numpy as np
+import cv2
+from rich.table import Table
+from rich.console import Console
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "."))
+
+from module.device.method.droidcast import Rgb565Converter, rgb565_to_rgb888
+from module.logger import logger
+
+console = Console()
+
+WIDTH, HEIGHT = 1280, 720
+TEST_TOTAL = 50  # 总测试次数
+TEST_BEST = 40  # 取最好的40次计算平均值
+
+
+def build_lut():
+    """
+    65536 项查找表，由 rgb565_to_rgb888 对所有 RGB565 值转换得到
+
+    Returns:
+        np.ndarray: 形状 (65536, 3)
+    """
+    values = np.arange(65536, dtype=np.uint16).reshape(256, 256)
+    return rgb565_to_rgb888(values).reshape(65536, 3)
+
+
+def build_channel_lut(lut):
+    """
+    cvtColor(COLOR_BGR5652RGB) 只做移位，低位补 0，再用按通道的 256 项查找表修正低位
+
+    Returns:
+        np.ndarray: 形状 (256, 1, 3)
+    """
+    values = np.arange(65536)
+    channel_lut = np.zeros((256, 1, 3), dtype=np.uint8)
+    channel_lut[(values >> 11) << 3, 0, 0] = lut[:, 0]
+    channel_lut[((values >> 5) & 0b111111) << 2, 0, 1] = lut[:, 1]
+    channel_lut[(values & 0b11111) << 3, 0, 2] = lut[:, 2]
+    return channel_lut
+
+
+def benchmark(func):
+    """
+    Returns:
+        float: 平均耗时（毫秒）
+    """
+    func()
+    record = []
+    for _ in range(TEST_TOTAL):
+        start = time.perf_counter()
+        func()
+        record.append(time.perf_counter() - start)
+    return float(np.mean(np.sort(record)[:TEST_BEST])) * 1000
+
+
+def run():
+    logger.hr("RGB565 Conversion Benchmark", level=1)
+    arr = np.random.randint(0, 65536, (HEIGHT, WIDTH), dtype=np.uint16)
+    dst = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    lut = build_lut()
+    channel_lut = build_channel_lut(lut)
+    converter = Rgb565Converter()
+    pairs = arr.view(np.uint8).reshape(HEIGHT, WIDTH, 2)
+
+    def lut_take():
+        return np.take(lut, arr, axis=0, out=dst)
+
+    def cvt_lut():
+        cv2.cvtColor(pairs, cv2.COLOR_BGR5652RGB, dst=dst)
+        return cv2.LUT(dst, channel_lut, dst=dst)
+
+    methods = [
+        ("rgb565_to_rgb888", lambda: rgb565_to_rgb888(arr)),
+        ("Rgb565Converter", lambda: converter.convert(arr)),
+        ("Rgb565Converter + dst", lambda: converter.convert(arr, dst=dst)),
+        ("LUT 65536 (np.take)", lut_take),
+        ("cvtColor + LUT", cvt_lut),
+    ]
+
+    expected = rgb565_to_rgb888(arr)
+    results = []
+    for name, func in methods:
+        logger.hr(name, level=2)
+        exact = np.array_equal(func(), expected)
+        cost = benchmark(func)
+        logger.attr(name, f"{cost:.3f}ms")
+        results.append((name, cost, exact))
+
+    table = Table(show_lines=True)
+    table.add_column("Method", header_style="bright_cyan", style="cyan", no_wrap=True)
+    table.add_column("Time", style="magenta")
+    table.add_column("Speedup", style="green")
+    table.add_column("Exact")
+    baseline = results[0][1]
+    for name, cost, exact in results:
+        table.add_row(
+            name,
+            f"{cost:.3f}ms",
+            f"{baseline / cost:.2f}x",
+            "[green]Yes[/]" if exact else "[red]No[/]",
+        )
+    console.print(table, justify="center")
+    logger.info(f"OpenCV threads: {cv2.getNumThreads()}, frame: {WIDTH}x{HEIGHT}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+金字塔模板匹配基准测试
+
+不需要连接设备。以 module/*/assets.py 中的 Button 为模板，
+在 assets/ 下的 1280x720 截图（Button 的来源图片）上做全屏搜索和带偏移的 Button.match，
+比较全分辨率与 1/2、1/4 金字塔的耗时，并检查每次是否匹配的判断完全一致。
+"""
+
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "."))
+
+from module.base.button import Button
+from module.base.pyramid import match_template
+from module.base.utils import crop, load_image
+from module.logger import logger
+
+console = Console()
+
+ASSET_MODULES = ["character", "ghz", "handler", "train", "ui"]
+LEVELS = [0, 1, 2]
+SIMILARITY = 0.85
+# 每个模板除自身来源截图外，再在多少张其他截图上搜索（不匹配的样本）
+NEGATIVE_SAMPLES = 3
+# Button.match 的偏移
+BUTTON_OFFSET = (60, 60)
+
+
+def load_buttons():
+    """
+    Returns:
+        list[Button]: 带模板文件的 Button
+    """
+    buttons = []
+    for name in ASSET_MODULES:
+        module = importlib.import_module(f"module.{name}.assets")
+        for value in vars(module).values():
+            if isinstance(value, Button) and value.file and not value.is_gif and os.path.exists(value.file):
+                buttons.append(value)
+    return buttons
+
+
+def load_screenshots(buttons):
+    """
+    Returns:
+        dict[str, np.ndarray]: 文件 -> 1280x720 截图
+    """
+    screenshots = {}
+    for button in buttons:
+        if button.file not in screenshots:
+            image = load_image(button.file)
+            if image is not None and image.shape[:2] == (720, 1280):
+                screenshots[button.file] = image
+    return screenshots
+
+
+def build_cases(buttons, screenshots):
+    """
+    Returns:
+        list[tuple[Button, np.ndarray]]: (模板, 搜索截图)
+    """
+    files = sorted(screenshots)
+    cases = []
+    for index, button in enumerate(buttons):
+        if button.file not in screenshots:
+            continue
+        cases.append((button, screenshots[button.file]))
+        others = [file for file in files if file != button.file]
+        for k in range(min(NEGATIVE_SAMPLES, len(others))):
+            cases.append((button, screenshots[others[(index * 7 + k) % len(others)]]))
+    return cases
+
+
+def run_fullscreen(cases, level):
+    """
+    全屏搜索，与 Template.match 相同
+
+    Returns:
+        tuple[float, list[bool]]: (总耗时(秒), 每个样本是否匹配)
+    """
+    cost = 0.0
+    decisions = []
+    for button, image in cases:
+        template = crop(load_image(button.file), button.area)
+        start = time.perf_counter()
+        sim, _ = match_template(image, template, level=level, similarity=SIMILARITY)
+        cost += time.perf_counter() - start
+        decisions.append(sim > SIMILARITY)
+    return cost, decisions
+
+
+def run_button(cases, level):
+    """
+    Button.match 带偏移搜索
+
+    Returns:
+        tuple[float, list[bool]]: (总耗时(秒), 每个样本是否匹配)
+    """
+    cost = 0.0
+    decisions = []
+    for button, image in cases:
+        button.ensure_template()
+        start = time.perf_counter()
+        decisions.append(button.match(image, offset=BUTTON_OFFSET, similarity=SIMILARITY, pyramid=level, track=False))
+        cost += time.perf_counter() - start
+    return cost, decisions
+
+
+def run():
+    logger.hr("Pyramid Template Matching Benchmark", level=1)
+    buttons = load_buttons()
+    screenshots = load_screenshots(buttons)
+    cases = build_cases(buttons, screenshots)
+    logger.info(f"Buttons: {len(buttons)}, screenshots: {len(screenshots)}, cases: {len(cases)}")
+
+    table = Table(show_lines=True)
+    table.add_column("Mode", header_style="bright_cyan", style="cyan", no_wrap=True)
+    table.add_column("Level")
+    table.add_column("Time", style="magenta")
+    table.add_column("Speedup", style="green")
+    table.add_column("Matched")
+    table.add_column("Same decisions")
+
+    for mode, func in [("Full screen", run_fullscreen), (f"Button.match {BUTTON_OFFSET}", run_button)]:
+        logger.hr(mode, level=2)
+        baseline = None
+        for level in LEVELS:
+            cost, decisions = func(cases, level)
+            if baseline is None:
+                baseline = (cost, decisions)
+            same = sum(a == b for a, b in zip(decisions, baseline[1]))
+            logger.attr(f"level {level}", f"{cost:.3f}s, matched {sum(decisions)}, same {same}/{len(cases)}")
+            table.add_row(
+                mode,
+                str(level),
+                f"{cost * 1000 / len(cases):.2f}ms",
+                f"{baseline[0] / cost:.2f}x",
+                str(sum(decisions)),
+                f"[green]{same}/{len(cases)}[/]" if same == len(cases) else f"[red]{same}/{len(cases)}[/]",
+            )
+
+    console.print(table, justify="center")
+
+
+if __name__ == "__main__":
+    run()
@@ -132,6 +132,73 @@ class SimpleCNN(nn.Module):
         return x
 
 
+# ========== Export ==========
+def export_model(checkpoint_path, formats=("onnx",), output_dir=None):
+    """
+    Export a trained checkpoint for runtimes other than eager PyTorch.
+
+    - onnx: <output_dir>/timer_cnn.onnx, char mapping stored in the model metadata,
+      loaded by module/ocr/onnx_cnn.py
+    - torchscript: <output_dir>/timer_cnn.pt, char mapping stored as extra file "charset.json",
+      loadable with torch.jit.load without the SimpleCNN class
+
+    Args:
+        checkpoint_path: .pth saved by train_model()
+        formats: any of "onnx", "torchscript"
+        output_dir: defaults to the checkpoint's directory
+
+    Returns:
+        list[Path]: exported files
+    """
+    import json
+
+    checkpoint_path = Path(checkpoint_path)
+    output_dir = Path(output_dir) if output_dir else checkpoint_path.parent
+    checkpoint = torch.load(checkpoint_path, map_location="cpu")
+    model = SimpleCNN(
+        num_classes=len(checkpoint['char2idx']) + 1,
+        seq_len=checkpoint['max_len']
+    )
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+
+    charset = {
+        'char2idx': json.dumps(checkpoint['char2idx'], ensure_ascii=False),
+        'idx2char': json.dumps({str(k): v for k, v in checkpoint['idx2char'].items()}, ensure_ascii=False),
+        'max_len': str(checkpoint['max_len']),
+        'val_seq_acc': str(checkpoint.get('val_seq_acc', 0)),
+    }
+    # Same input as SimpleCNNOCR: (N, 1, 32, 64) normalized to [-1, 1]
+    dummy = torch.zeros(1, 1, 32, 64)
+    exported = []
+
+    if "onnx" in formats:
+        import onnx
+
+        path = output_dir / "timer_cnn.onnx"
+        torch.onnx.export(
+            model, dummy, str(path),
+            input_names=["image"], output_names=["logits"],
+            dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=13,
+        )
+        onnx_model = onnx.load(str(path))
+        onnx.helper.set_model_props(onnx_model, charset)
+        onnx.save(onnx_model, str(path))
+        exported.append(path)
+
+    if "torchscript" in formats:
+        path = output_dir / "timer_cnn.pt"
+        with torch.no_grad():
+            traced = torch.jit.trace(model, dummy)
+        traced.save(str(path), _extra_files={"charset.json": json.dumps(charset, ensure_ascii=False)})
+        exported.append(path)
+
+    for path in exported:
+        print(f"Exported {path}")
+    return exported
+
+
 # ========== Training ==========
 def train_model():
     import argparse
@@ -142,10 +209,21 @@ def train_model():
     parser.add_argument("--epochs", type=int, default=1000, help="Number of epochs")
     parser.add_argument("--patience", type=int, default=100, help="Early stopping patience")
     parser.add_argument("--lr", type=float, default=0.0001, help="Learning rate")
+    parser.add_argument("--export", type=str, default="onnx",
+                        help="Comma separated export formats after training: onnx, torchscript. Empty to skip")
+    parser.add_argument("--export_only", action="store_true",
+                        help="Skip training, export module/ocr/timer_cnn_finetuned.pth (or --base_model)")
     args = parser.parse_args()
 
     # Paths
     project_root = Path(__file__).parent.parent
+    export_formats = [f.strip() for f in args.export.split(",") if f.strip()]
+    finetuned_path = project_root / 'module' / 'ocr' / 'timer_cnn_finetuned.pth'
+
+    if args.export_only:
+        source = finetuned_path if finetuned_path.exists() else project_root / args.base_model
+        export_model(source, export_formats or ["onnx"], output_dir=project_root / 'module' / 'ocr')
+        return None, None
     
     # Define data directories
     # 1. New manual errors
@@ -325,7 +403,7 @@ def train_model():
             best_val_acc = val_seq_acc
             best_epoch = epoch
             patience_counter = 0 # Reset patience
-            save_path = project_root / 'module' / 'ocr' / 'timer_cnn_finetuned.pth'
+            save_path = finetuned_path
             torch.save({
                 'epoch': epoch,
                 'model_state_dict': model.state_dict(),
@@ -348,6 +426,9 @@ def train_model():
             
     if patience_counter < args.patience:
         print(f"\nTraining complete (max epochs reached)! Best validation sequence accuracy: {best_val_acc:.2f}%")
+
+    if export_formats and finetuned_path.exists():
+        export_model(finetuned_path, export_formats)
     return model, dataset
 
 